@@ -1,5 +1,8 @@
+import json
 import logging
 import os
+import threading
+import time
 from datetime import datetime
 
 try:
@@ -9,47 +12,26 @@ except ImportError:
 
 import Pyro4 as Pyro
 
-from ics import mail
+from ics import notifiers
 from ics.environment import HOSTNAME, ICS_CLUSTER_NAME
+from ics.environment import ICS_ALERT_DB
+from ics.environment import ICS_ALERT_OUTBOX
+from ics.environment import ICS_ALERT_SPOOL
+from ics.history import AlertHistory
+from ics.levels import CRITICAL, ERROR, WARNING, INFO, NOTSET
+from ics.levels import get_level_name
+from ics.spool import Spool
 from ics.utils import alert_log_name
 from ics.utils import engine_conn
 from ics.utils import alert_conn
 
 logger = logging.getLogger(__name__)
 
-CRITICAL = 40
-ERROR = 30
-WARNING = 20
-INFO = 10
-NOTSET = 0
-
-_level_names = {
-    CRITICAL: 'CRITICAL',
-    ERROR: 'ERROR',
-    WARNING: 'WARNING',
-    INFO: 'INFO',
-    NOTSET: 'NOTSET',
-    'CRITICAL': CRITICAL,
-    'ERROR': ERROR,
-    'WARNING': WARNING,
-    'INFO': INFO,
-    'NOTSET': NOTSET
-}
-
 alert_html_template_file = os.path.dirname(__file__) + '/templates/alert.html'
 
-
-def get_level_name(level):
-    """Return the string representation of an alert level.
-
-    Args:
-        level: Alert level
-
-    Returns:
-        Alert level name.
-
-    """
-    return _level_names[level]
+# System attributes cached by the alert handler
+ALERT_SETTINGS = ['AlertLevel', 'AlertRecipients', 'AlertDedupKeys', 'AlertDedupWindow', 'AlertDigestSize',
+                  'AlertDigestInterval', 'AlertHistoryDays', 'AlertNotifiers', 'AlertWebhookURL', 'AlertScript']
 
 
 def load_html_template(filename):
@@ -72,9 +54,19 @@ def log_alert(alert):
     Args:
         alert (obj): Alert object.
 
+    """
+    log_alerts([alert])
+
+
+def log_alerts(alerts):
+    """Log multiple alerts with a single write.
+
+    Args:
+        alerts (list): Alert objects.
+
     """
     with open(alert_log_name(), 'a+') as alert_log_file:
-        alert_log_file.write(str(alert) + '\n')
+        alert_log_file.write(''.join(str(alert) + '\n' for alert in alerts))
 
 
 def create_alert(resource, msg, level):
@@ -92,6 +84,20 @@ def create_alert(resource, msg, level):
     return Alert(resource.name, resource.attr_value('Group'), level, msg)
 
 
+def alert_from_dict(alert_dict):
+    """Create alert object from alert in dict format.
+
+    Args:
+        alert_dict (dict): Alert in dict format.
+
+    Returns:
+        obj: Alert object.
+
+    """
+    return Alert(alert_dict['resource'], alert_dict['group'], alert_dict['level'], alert_dict['msg'],
+                 node=alert_dict['node'], time=alert_dict['time'], attempts=alert_dict.get('attempts', 0))
+
+
 def create_test_alert(msg, level):
     """Create alert object for testing.
 
@@ -109,12 +115,13 @@ def create_test_alert(msg, level):
 class Alert:
     """Alert object."""
 
-    def __init__(self, resource, group, level, msg, node=HOSTNAME, time=None):
+    def __init__(self, resource, group, level, msg, node=HOSTNAME, time=None, attempts=0):
         self.resource = resource
         self.group = group
         self.node = node
         self.level = level
         self.msg = msg
+        self.attempts = attempts  # Failed notification attempts, not part of the alert dict
         if time is None:
             self.time = datetime.now().strftime("%m/%d/%Y %H:%M:%S")
         else:
@@ -157,13 +164,34 @@ class Alert:
 class AlertClient:
     """Alert interface for creating alerts.
 
+    Alerts are added to a bounded outbox and sent to the alert server in batches by a background sender thread, so
+    creating an alert never waits on the alert server. When the alert server can not be reached the sender retries with
+    an increasing delay. When the outbox is full alerts are spilled to the outbox file and sent once the alert server
+    can be reached again.
+
     Attributes:
-        self.alert_server_conn(obj): Alert server pyro connection.
+        self.alert_server_conn(obj): Alert server pyro connection, created when the first alert is sent.
+        self.outbox(obj): Queue of alerts waiting to be sent.
+        self.outbox_file(str): File alerts are spilled to when the outbox is full.
+        self.sending_file(str): Outbox file being sent, removed once its alerts have been delivered.
+        self.failed_file(str): File alerts are moved to when the alert server can not accept them.
+        self.batch_size(int): Maximum number of alerts sent in a single request.
+        self.retries(int): Number of times sending alerts is retried before they are spilled to the outbox file.
+        self.max_retry_delay(int): Maximum delay (in seconds) between attempts to send alerts.
 
     """
 
-    def __init__(self):
-        self.alert_server_conn = alert_conn()
+    def __init__(self, outbox_size=1000, outbox_file=ICS_ALERT_OUTBOX, batch_size=100, retries=5, max_retry_delay=60):
+        self.alert_server_conn = None
+        self.outbox = queue.Queue(maxsize=outbox_size)
+        self.outbox_file = outbox_file
+        self.sending_file = outbox_file + '.sending'
+        self.failed_file = outbox_file + '.failed'
+        self.batch_size = batch_size
+        self.retries = retries
+        self.max_retry_delay = max_retry_delay
+        self._sender_thread = None
+        self._lock = threading.Lock()
 
     def critical(self, resource, msg):
         """Send alert with critical level.
@@ -213,7 +241,7 @@ class AlertClient:
         self.send_alert(alert)
 
     def send_alert(self, alert):
-        """Send alert to ICS alert server.
+        """Add alert to the outbox to be sent to ICS alert server.
 
             Note: The alert must be sent as a dict, due to pyro not being able to send a serialized custom class.
 
@@ -221,108 +249,713 @@ class AlertClient:
             alert (obj): Alert object.
 
         """
-        self.alert_server_conn.add_alert(alert.asdict())
+        self.start_sender()
+        try:
+            self.outbox.put_nowait(alert.asdict())
+        except queue.Full:
+            logger.warning('Alert outbox full, spilling alert to ' + self.outbox_file)
+            self.spill([alert.asdict()])
+
+    def spill(self, alerts):
+        """Append alerts to the outbox file.
+
+        Args:
+            alerts (list): Alerts in dict format.
+
+        """
+        with self._lock:
+            try:
+                with open(self.outbox_file, 'a') as f:
+                    for alert_dict in alerts:
+                        f.write(json.dumps(alert_dict) + '\n')
+            except IOError as err:
+                logger.error('Unable to spill alerts to outbox file, {} alerts lost: {}'.format(len(alerts), err))
+
+    def unspill(self):
+        """Read alerts from the outbox file.
+
+        The outbox file is renamed to the sending file before it is read, so alerts spilled while these alerts are
+        delivered go to a new outbox file. The sending file is only removed by unspill_done once the alerts have been
+        delivered. A sending file left behind by a sender which did not complete is read again.
+
+        Returns:
+            list: Alerts in dict format.
+
+        """
+        with self._lock:
+            alerts = []
+            try:
+                if not os.path.isfile(self.sending_file):
+                    if not os.path.isfile(self.outbox_file):
+                        return alerts
+                    os.replace(self.outbox_file, self.sending_file)
+                with open(self.sending_file, 'r') as f:
+                    for line in f:
+                        try:
+                            alerts.append(json.loads(line))
+                        except ValueError:
+                            logger.error('Skipping invalid alert in outbox file: ' + line.strip())
+            except (IOError, OSError) as err:
+                logger.error('Unable to read outbox file: {}'.format(err))
+            return alerts
+
+    def unspill_done(self):
+        """Remove the sending file once its alerts have been delivered."""
+        with self._lock:
+            try:
+                os.remove(self.sending_file)
+            except FileNotFoundError:
+                pass
+            except OSError as err:
+                logger.error('Unable to remove outbox file: {}'.format(err))
+
+    def quarantine(self, alerts):
+        """Append alerts which the alert server can not accept to the failed file, so they do not block later alerts.
+
+        Args:
+            alerts (list): Alerts in dict format.
+
+        """
+        with self._lock:
+            try:
+                with open(self.failed_file, 'a') as f:
+                    for alert_dict in alerts:
+                        f.write(json.dumps(alert_dict, default=repr) + '\n')
+            except (IOError, OSError, ValueError) as err:
+                logger.error('Unable to write failed alerts file, {} alerts lost: {}'.format(len(alerts), err))
+
+    def start_sender(self):
+        """Start the sender thread if it is not already running."""
+        with self._lock:
+            if self._sender_thread is None or not self._sender_thread.is_alive():
+                self._sender_thread = threading.Thread(name='alert sender', target=self.sender)
+                self._sender_thread.daemon = True
+                self._sender_thread.start()
+
+    def sender(self):
+        """Continuously send alerts from the outbox and outbox file to the alert server.
+
+        When no new alert arrives within max_retry_delay seconds, alerts spilled to the outbox file are sent again.
+        """
+        while True:
+            try:
+                alerts = [self.outbox.get(timeout=self.max_retry_delay)]  # Blocking until new alert available.
+            except queue.Empty:
+                alerts = []
+            while alerts and len(alerts) < self.batch_size:
+                try:
+                    alerts.append(self.outbox.get_nowait())
+                except queue.Empty:
+                    break
+
+            if alerts and not self.deliver(alerts):
+                self.spill(alerts)
+            else:
+                # Alerts spilled while the alert server was unreachable
+                spilled_alerts = self.unspill()
+                if spilled_alerts:
+                    self.deliver_spilled(spilled_alerts)
+
+            for _ in alerts:
+                self.outbox.task_done()
+
+    def deliver_spilled(self, alerts):
+        """Send alerts read from the outbox file and remove the sending file once they have been delivered.
+
+        Args:
+            alerts (list): Alerts in dict format.
+
+        """
+        for index in range(0, len(alerts), self.batch_size):
+            if not self.deliver(alerts[index:index + self.batch_size]):
+                self.spill(alerts[index:])
+                break
+        self.unspill_done()
+
+    def deliver(self, alerts):
+        """Send alerts to the alert server, retrying while it is unreachable.
+
+        Alerts which can not be serialized or are rejected by the alert server are not retried, they are moved to
+        the failed file.
+
+        Args:
+            alerts (list): Alerts in dict format.
+
+        Returns:
+            bool: True if the alerts have been sent or moved to the failed file, False if the alert server was still
+                unreachable after the retries.
+
+        """
+        retry_delay = 1
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, self.max_retry_delay)
+            try:
+                if self.alert_server_conn is None:
+                    self.alert_server_conn = alert_conn()
+                self.alert_server_conn.add_alerts(alerts)
+                return True
+            except Pyro.errors.SerializeError as err:
+                logger.error('Unable to serialize {} alerts, moving them to {}: {}'.format(
+                    len(alerts), self.failed_file, err))
+            except Pyro.errors.CommunicationError as err:
+                self.alert_server_conn = None  # Reconnect on next attempt in case server has restarted
+                logger.error('Unable to send {} alerts (attempt {} of {}): {}'.format(
+                    len(alerts), attempt + 1, self.retries + 1, err))
+                continue
+            except Exception:
+                logger.exception('Alert server rejected {} alerts, moving them to {}'.format(
+                    len(alerts), self.failed_file))
+            self.quarantine(alerts)
+            return True
+        return False
+
+    def flush(self, timeout=None):
+        """Wait for alerts in the outbox to be sent.
+
+        Args:
+            timeout (int, opt): Maximum time (in seconds) to wait.
+
+        Returns:
+            bool: True if all alerts have been sent.
+
+        """
+        end_time = None if timeout is None else time.time() + timeout
+        while self.outbox.unfinished_tasks:
+            if end_time is not None and time.time() >= end_time:
+                return False
+            time.sleep(0.05)
+        return True
 
 
 class AlertHandler:
-    """Handle alerts in queue.
+    """Handle alerts in spool.
+
+    Alerts are written to a persistent spool when they are added, so they are not lost when the alert server is
+    restarted. Alerts are removed from the spool once they have been handled by one of the alert workers.
+
+    Duplicate alerts, identified by the AlertDedupKeys fields, are not notified again within AlertDedupWindow seconds.
+    When the window of an alert expires, the number of duplicates suppressed within it is notified as a summary alert.
+    When AlertDigestSize is greater than 1 alerts are collected and notified together once the digest is full or the
+    oldest alert in the digest has waited AlertDigestInterval seconds.
+
+    Alert settings are cached, the engine pushes changes with update_settings and the settings are retrieved from the
+    engine again when they have not been updated within the refresh interval. Alerts stay in the spool until the
+    settings have been received from the engine for the first time, so they are not notified without recipients.
 
     Attributes:
-        alert_queue(obj): Alert object queue
+        alert_spool(obj): Alert spool.
+        alert_history(obj): Indexed alert history.
+        history_queue(obj): Alerts waiting to be written to the alert log and history.
+        history_batch_size(int): Maximum number of alerts written to the alert log and history at once.
+        history_days(int): Maximum age (in days) of alerts kept in the alert history, 0 for no limit.
+        prune_interval(int): Time (in seconds) between removals of old alerts from the alert history.
         alert_level(int): Alert level in integer format.
+        settings_time(float): Time alert settings were last updated.
+        settings_loaded(obj): Event set once alert settings have been received from the engine.
+        refresh_interval(int): Time (in seconds) after which alert settings are retrieved from the engine.
+        dedup_keys(list): Alert fields used to identify duplicate alerts.
+        dedup_window(int): Time (in seconds) duplicate alerts are suppressed.
+        digest_size(int): Number of alerts in a digest.
+        digest_interval(int): Maximum time (in seconds) an alert waits in the digest.
+        notify_retries(int): Number of times an alert which could not be notified is added to the spool again.
         html_template(str): Alert email html template text
-        engine_conn(obj): Engine server pyro connection
+        notifiers(dict): Notifiers by name.
+        notifier_names(list): Names of enabled notifiers.
+        counters(dict): Alert handler statistics.
 
     """
 
-    def __init__(self):
-        self.alert_queue = queue.Queue()
+    def __init__(self, spool_dir=ICS_ALERT_SPOOL, history_file=ICS_ALERT_DB):
+        self.alert_spool = Spool(spool_dir)
+        self.alert_history = AlertHistory(history_file)
+        self.history_queue = queue.Queue()
+        self.history_batch_size = 500
+        self.history_days = 90
+        self.prune_interval = 3600
         self.alert_level = NOTSET
+        self.settings_time = 0
+        self.settings_loaded = threading.Event()
+        self.refresh_interval = 60
+        self.dedup_keys = ['node', 'group', 'resource', 'msg']
+        self.dedup_window = 0
+        self.digest_size = 1
+        self.digest_interval = 60
+        self.notify_retries = 3
         self.html_template = load_html_template(alert_html_template_file)
-        self.engine_conn = engine_conn()
-
-    def update_alert_level(self):
-        """Get alert level threshold of handler."""
+        self.notifiers = {name: notifier_type() for name, notifier_type in notifiers.notifier_types.items()}
+        self.notifier_names = ['mail']
+        self.counters = {
+            'received': 0,
+            'notified': 0,
+            'suppressed': 0,
+            'digests': 0,
+            'failed': 0
+        }
+        self.suppressed = {}
+        self._last_notified = {}
+        self._suppressed_alerts = {}
+        self._summaries = []
+        self._digest = []
+        self._digest_start = None
+        self._lock = threading.Lock()
+        self._settings_lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def engine_conn(self):
+        """obj: Engine server pyro connection of the calling thread."""
+        if not hasattr(self._local, 'engine_conn'):
+            self._local.engine_conn = engine_conn()
+        return self._local.engine_conn
+
+    def update_alert_settings(self):
+        """Get alert settings from engine."""
         try:
-            new_alert_level = self.engine_conn.node_value('AlertLevel')
-            logger.debug('Updated alert level from engine: ' + str(new_alert_level))
-            new_alert_level_int = get_level_name(new_alert_level)
-            if new_alert_level_int != self.alert_level:
-                logger.info('Alert level changed from {} to {}'.format(get_level_name(self.alert_level),
-                                                                       get_level_name(new_alert_level_int)))
-            self.alert_level = new_alert_level_int
-        except KeyError as err:
-            logger.error('Alert level received from engine is invalid: ' + str(err))
+            batch = Pyro.batch(self.engine_conn)
+            for attr_name in ALERT_SETTINGS:
+                batch.node_value(attr_name)
+            settings = dict(zip(ALERT_SETTINGS, batch()))
         except Pyro.errors.CommunicationError:
-            logger.error("Unable to connect to ICS engine to retrieve alert level")
+            logger.error("Unable to connect to ICS engine to retrieve alert settings")
+            return
+        except Exception as err:
+            logger.error('Unable to retrieve alert settings from engine: ' + str(err))
+            return
+        self.apply_settings(settings)
 
-    def recipients(self):
-        """Get Alert recipients email addressees.
+    def wait_for_settings(self, retry_interval=5):
+        """Wait until alert settings have been received from the engine, retrieving them every retry interval.
+
+        Args:
+            retry_interval (int, opt): Time (in seconds) between attempts to retrieve the settings.
 
-        Returns:
-            list: Alert recipients email addressees.
         """
+        while not self.settings_loaded.is_set():
+            with self._settings_lock:
+                if not self.settings_loaded.is_set():
+                    self.update_alert_settings()
+            self.settings_loaded.wait(retry_interval)
+
+    def refresh_settings(self):
+        """Get alert settings from engine if they have not been updated within the refresh interval."""
+        if time.time() - self.settings_time >= self.refresh_interval:
+            self.settings_time = time.time()  # Do not retry on every alert when engine is unavailable
+            self.update_alert_settings()
+
+    @Pyro.expose
+    def update_settings(self, settings):
+        """Update cached alert settings, called by the engine when an alert setting is modified.
+
+        Args:
+            settings (dict): Alert setting attribute names and values.
+
+        """
+        logger.debug('Alert settings pushed from engine: ' + str(settings))
+        self.apply_settings(settings)
+
+    def apply_settings(self, settings):
+        """Apply alert settings.
+
+        Args:
+            settings (dict): Alert setting attribute names and values.
+
+        """
+        self.settings_time = time.time()
+        if 'AlertLevel' in settings:
+            try:
+                new_alert_level_int = get_level_name(settings['AlertLevel'])
+                if new_alert_level_int != self.alert_level:
+                    logger.info('Alert level changed from {} to {}'.format(get_level_name(self.alert_level),
+                                                                           get_level_name(new_alert_level_int)))
+                self.alert_level = new_alert_level_int
+            except KeyError as err:
+                logger.error('Alert level received from engine is invalid: ' + str(err))
+
+        if 'AlertNotifiers' in settings:
+            unknown_names = [name for name in settings['AlertNotifiers'] if name not in self.notifiers]
+            if unknown_names:
+                logger.error('Unknown alert notifiers: ' + ', '.join(unknown_names))
+            self.notifier_names = [name for name in settings['AlertNotifiers'] if name in self.notifiers]
+        for notifier in self.notifiers.values():
+            notifier.configure(settings)
+
         try:
-            emails = self.engine_conn.node_value('AlertRecipients')
-        except Pyro.errors.CommunicationError:
-            logger.error("Unable to connect to ICS engine to retrieve alert recipients")
-            emails = []
+            self.dedup_keys = settings.get('AlertDedupKeys', self.dedup_keys)
+            self.dedup_window = int(settings.get('AlertDedupWindow', self.dedup_window))
+            self.digest_size = max(int(settings.get('AlertDigestSize', self.digest_size)), 1)
+            self.digest_interval = int(settings.get('AlertDigestInterval', self.digest_interval))
+            self.history_days = int(settings.get('AlertHistoryDays', self.history_days))
+        except ValueError as err:
+            logger.error('Alert digest settings received from engine are invalid: ' + str(err))
+        self.settings_loaded.set()
+
+    @Pyro.expose
+    def add_alerts(self, alert_dicts):
+        """Add multiple alerts to alert handler spool.
 
-        return emails
+        Args:
+            alert_dicts(list): Alerts in dict format.
+
+        """
+        for alert_dict in alert_dicts:
+            logger.info('Alert generated ' + str(alert_from_dict(alert_dict)))
+        self.alert_spool.put(alert_dicts)
 
     @Pyro.expose
     def add_alert(self, alert_dict):
-        """Add alert to alert handler queue.
+        """Add alert to alert handler spool.
 
         Args:
             alert_dict(dict): Alert in dict format.
 
         """
-        alert = Alert(alert_dict['resource'], alert_dict['group'], alert_dict['level'], alert_dict['msg'],
-                      node=alert_dict['node'], time=alert_dict['time'])
+        self.add_alerts([alert_dict])
 
-        logger.info('Alert generated ' + str(alert))
-        self.alert_queue.put(alert)
+    @Pyro.expose
+    def history(self, resource=None, group=None, since=None, limit=1000):
+        """Find alerts in alert history, newest alerts are returned first.
 
-    def mail_alert(self, alert, template):
-        """Mail alert.
+        Args:
+            resource (str, opt): Resource name.
+            group (str, opt): Group name.
+            since (float, opt): Only alerts at or after this timestamp.
+            limit (int, opt): Maximum number of alerts.
+
+        Returns:
+            list: Alerts in dict format.
+
+        """
+        return self.alert_history.query(resource=resource, group=group, since=since, limit=limit)
+
+    def record_alert(self, alert):
+        """Add alert to be written to the alert log and history by the history writer.
+
+        Args:
+            alert (obj): Alert object.
+
+        """
+        self.history_queue.put(alert)
+
+    def prune_history(self):
+        """Remove alerts older than AlertHistoryDays from the alert history."""
+        if self.history_days <= 0:
+            return
+        try:
+            removed = self.alert_history.prune(time.time() - self.history_days * 86400)
+        except Exception as err:
+            logger.exception('Unable to remove old alerts from alert history: ' + str(err))
+            return
+        if removed:
+            logger.info('Removed {} alerts older than {} days from alert history'.format(removed, self.history_days))
+
+    def history_writer(self):
+        """Continuously write alerts from the history queue in batches, and remove old alerts from the history."""
+        prune_time = 0
+        while True:
+            if time.time() - prune_time >= self.prune_interval:
+                prune_time = time.time()
+                self.prune_history()
+            try:
+                alerts = [self.history_queue.get(timeout=self.prune_interval)]  # Blocking until new alert available.
+            except queue.Empty:
+                continue
+            while len(alerts) < self.history_batch_size:
+                try:
+                    alerts.append(self.history_queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                log_alerts(alerts)
+            except IOError as err:
+                logger.error('Unable to write alert log: {}'.format(err))
+            try:
+                self.alert_history.add([alert.asdict() for alert in alerts])
+            except Exception as err:
+                logger.exception('Unable to write alert history: ' + str(err))
+
+    @Pyro.expose
+    def stats(self):
+        """Alert handler statistics.
+
+        Returns:
+            dict: Alert counters, suppressed alert counts by dedup key, number of alerts waiting in digest and
+                statistics of enabled notifiers.
+
+        """
+        with self._lock:
+            data = dict(self.counters)
+            data['suppressed_alerts'] = dict(self.suppressed)
+            data['digest_pending'] = len(self._digest)
+        data['spool_backlog'] = self.alert_spool.backlog()
+        data['notifiers'] = {name: self.notifiers[name].stats() for name in self.notifier_names}
+        return data
+
+    def notify(self, alerts, subject, html, callback=None):
+        """Send notification to all enabled notifiers.
+
+        Args:
+            alerts (list): Alert objects.
+            subject (str): Notification subject.
+            html (str): Rendered HTML body, shared by all notifiers.
+            callback (func, opt): Called once every notifier has sent the notification or failed, with True when
+                every notifier has sent it.
+
+        """
+        notifier_names = list(self.notifier_names)
+        if not notifier_names:
+            logger.warning('No alert notifiers enabled, no alerts sent')
+            if callback is not None:
+                callback(True)
+            return
+
+        notification = notifiers.Notification([alert.asdict() for alert in alerts], subject, html)
+        remaining = [len(notifier_names), True]
+        remaining_lock = threading.Lock()
+
+        def notifier_done(sent):
+            with remaining_lock:
+                remaining[0] -= 1
+                remaining[1] = remaining[1] and sent
+                done = remaining[0] == 0
+            if done and callback is not None:
+                callback(remaining[1])
+
+        for name in notifier_names:
+            self.notifiers[name].notify(notification, callback=notifier_done)
+
+    def notify_alert(self, alert, template, callback=None):
+        """Send notification of alert.
 
         Args:
             alert (obj): Alert object.
             template (str): HTML template.
+            callback (func, opt): Called once the notification has been sent or failed, see notify.
+
+        """
+        subject = 'ICS {} Alert - {}'.format('Warning', alert.resource)
+        self.notify([alert], subject, alert.html(template), callback=callback)
+
+    def notify_digest(self, alerts, template, callback=None):
+        """Send multiple alerts in a single notification.
+
+        Args:
+            alerts (list): Alert objects.
+            template (str): HTML template.
+            callback (func, opt): Called once the notification has been sent or failed, see notify.
+
+        """
+        subject = 'ICS Alert Digest - {} alerts'.format(len(alerts))
+        self.notify(alerts, subject, '\n<hr>\n'.join(alert.html(template) for alert in alerts), callback=callback)
+
+    def is_duplicate(self, alert):
+        """Check if an identical alert was notified within the dedup window.
+
+            Note: Must be called while holding the handler lock.
+
+        Args:
+            alert (obj): Alert object.
+
+        Returns:
+            bool: True if alert should be suppressed.
+
+        """
+        if self.dedup_window <= 0:
+            return False
+
+        alert_dict = alert.asdict()
+        dedup_key = ' '.join(str(alert_dict.get(key, '')) for key in self.dedup_keys)
+        now = time.time()
+        last_notified = self._last_notified.get(dedup_key)
+        if last_notified is not None and now - last_notified < self.dedup_window:
+            self.counters['suppressed'] += 1
+            self.suppressed[dedup_key] = self.suppressed.get(dedup_key, 0) + 1
+            self._suppressed_alerts[dedup_key] = alert
+            return True
+
+        self.expire_dedup_keys(now)
+        self._last_notified[dedup_key] = now
+        return False
+
+    def expire_dedup_keys(self, now):
+        """Remove dedup keys whose window has expired, so the table does not grow while alerts keep changing.
+
+        A summary alert with the number of suppressed duplicates is added for each expired key with suppressed alerts,
+        to be notified by notify_summaries.
+
+            Note: Must be called while holding the handler lock.
+
+        Args:
+            now (float): Current time.
 
         """
-        recipients = self.recipients()
-        logger.debug('Recipient list: ' + str(recipients))
-        if not recipients:
-            logger.warning('Alert recipient list is empty, no alerts sent')
+        for key in [key for key, notified in self._last_notified.items() if now - notified >= self.dedup_window]:
+            del self._last_notified[key]
+            count = self.suppressed.pop(key, 0)
+            alert = self._suppressed_alerts.pop(key, None)
+            if count and alert is not None:
+                msg = '{} duplicate alert{} suppressed: {}'.format(count, '' if count == 1 else 's', alert.msg)
+                self._summaries.append(Alert(alert.resource, alert.group, alert.level, msg, node=alert.node))
+
+    def notify_summaries(self):
+        """Record and notify summaries of suppressed duplicate alerts."""
+        with self._lock:
+            summaries = self._summaries
+            self._summaries = []
+            self.counters['notified'] += len(summaries)
+        for summary in summaries:
+            logger.info('Alert generated ' + str(summary))
+            self.record_alert(summary)
+            self.notify_alert(summary, self.html_template)
+
+    def take_digest(self, force=False):
+        """Remove alerts from digest if it is full or has waited the digest interval.
+
+        Args:
+            force (bool, opt): Take digest regardless of size and age.
+
+        Returns:
+            list: Alert positions and alert objects, empty when digest is not ready.
+
+        """
+        with self._lock:
+            if not self._digest:
+                return []
+            if (force or len(self._digest) >= self.digest_size or
+                    time.time() - self._digest_start >= self.digest_interval):
+                digest = self._digest
+                self._digest = []
+                self._digest_start = None
+                return digest
+            return []
+
+    def notify_pending_digest(self, force=False):
+        """Send digest if it is ready and acknowledge its alerts once they have been sent.
+
+        Args:
+            force (bool, opt): Send digest regardless of size and age.
+
+        """
+        digest = self.take_digest(force)
+        if not digest:
+            return
+        alerts = [alert for _, alert in digest]
+
+        def digest_notified(sent):
+            self.notified(digest, sent)
+
+        try:
+            if len(alerts) == 1:
+                self.notify_alert(alerts[0], self.html_template, callback=digest_notified)
+            else:
+                self.notify_digest(alerts, self.html_template, callback=digest_notified)
+        except Exception as err:
+            logger.exception("Unknown exception occurred: " + str(err))
+            digest_notified(False)
+        with self._lock:
+            self.counters['notified'] += len(alerts)
+            self.counters['digests'] += 1
+
+    def handle_alert(self, alert, position=None):
+        """Log and notify alert if alert level threshold is met.
+
+        Args:
+            alert (obj): Alert object.
+            position (tuple, opt): Spool position of alert, acknowledged once alert is handled.
+
+        """
+        self.refresh_settings()
+        logger.debug('Alert level: ' + str(self.alert_level))
+        retry = alert.attempts > 0  # Already filtered and recorded when it was first handled
+        if not retry:
+            with self._lock:
+                self.counters['received'] += 1
+            if alert.level < self.alert_level:
+                self.ack(position)
+                return
+            self.record_alert(alert)
+
+        with self._lock:
+            if not retry and self.is_duplicate(alert):
+                logger.info('Suppressed duplicate alert ' + str(alert))
+                self.ack(position)
+                return
+            if self.digest_size > 1:
+                self._digest.append((position, alert))
+                if self._digest_start is None:
+                    self._digest_start = time.time()
+                digest = True
+            else:
+                self.counters['notified'] += 1
+                digest = False
+
+        self.notify_summaries()
+        if digest:
+            self.notify_pending_digest()
         else:
-            for recipient in recipients:
-                logger.info('Sending alert to {}'.format(recipient))
-                sender = 'ics@' + HOSTNAME
-                subject = 'ICS {} Alert - {}'.format('Warning', alert.resource)
-                body = alert.html(template)
+            self.notify_alert(alert, self.html_template,
+                              callback=lambda sent: self.notified([(position, alert)], sent))
+
+    def notified(self, digest, sent):
+        """Acknowledge alerts once they have been notified.
+
+        Alerts which could not be sent by every notifier are added to the spool again, so they are notified again by
+        the alert workers, until they have failed notify_retries times. When they can not be added to the spool they
+        are not acknowledged, so they are notified again when the alert server is restarted.
+
+        Args:
+            digest (list): Spool positions and alert objects, positions are None for alerts which are not in the spool.
+            sent (bool): True if the alerts have been sent by every enabled notifier.
+
+        """
+        if not sent:
+            retry_alerts = [alert for _, alert in digest if alert.attempts < self.notify_retries]
+            failed = len(digest) - len(retry_alerts)
+            if retry_alerts:
+                logger.error('Unable to notify {} alerts, adding them to the alert spool again'.format(
+                    len(retry_alerts)))
                 try:
-                    mail.send_html(recipient, sender, subject, body)
-                except ConnectionRefusedError as err:
-                    logger.error('Unable to send mail: {}'.format(err))
-                except Exception as err:
-                    logger.exception('Unknown exception occurred: ' + str(err))
+                    self.alert_spool.put([dict(alert.asdict(), attempts=alert.attempts + 1) for alert in retry_alerts])
+                except (IOError, OSError) as err:
+                    logger.error('Unable to add alerts to the alert spool, keeping them pending: {}'.format(err))
+                    return
+            if failed:
+                logger.error('Unable to notify {} alerts after {} attempts, alerts dropped'.format(
+                    failed, self.notify_retries + 1))
+                with self._lock:
+                    self.counters['failed'] += failed
+        for position, _ in digest:
+            self.ack(position)
+
+    def ack(self, position):
+        """Acknowledge alert in spool.
+
+        Args:
+            position (tuple): Spool position of alert or None.
+
+        """
+        if position is not None:
+            self.alert_spool.ack(position)
 
     def run(self):
-        """Continuously read and execute alerts from alert queue."""
+        """Continuously read and execute alerts from alert spool.
+
+            Note: Multiple threads can run alert workers at the same time.
+
+        """
+        self.wait_for_settings()
         while True:
-            alert = self.alert_queue.get()  # Blocking until new alert available.
-            self.update_alert_level()
-            logger.debug('Alert level: ' + str(self.alert_level))
-            if alert.level >= self.alert_level:
-                log_alert(alert)
-                try:
-                    self.mail_alert(alert, self.html_template)
-                except Exception as err:
-                    logger.exception("Unknown exception occurred: " + str(err))
-                    continue
-            del alert
-            queue_size = self.alert_queue.qsize()
-            if queue_size > 0:
-                logger.debug('Remaining events in alert queue ({})'.format(queue_size))
+            next_alert = self.alert_spool.get(timeout=1)
+            if next_alert is None:
+                self.notify_pending_digest()  # Digest which has waited the digest interval
+                with self._lock:
+                    self.expire_dedup_keys(time.time())
+                self.notify_summaries()
+                continue
+            position, alert_dict = next_alert
+            try:
+                self.handle_alert(alert_from_dict(alert_dict), position)
+            except Exception as err:
+                logger.exception("Unknown exception occurred: " + str(err))
+                self.ack(position)
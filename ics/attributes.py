@@ -1,4 +1,5 @@
 import logging
+import threading
 from copy import deepcopy
 
 from ics.errors import ICSError
@@ -10,20 +11,33 @@ class AttributeObject(object):  # Inherits from object to enabling super() in py
     """Base class for for objects with attributes.
 
     Class Attributes:
-        update_flag (bool): Global flag that shows when a attribute has changed for any instance.
+        change_seq (int): Sequence number of the latest change to any instance, increases with every change.
+        change_journal (obj): Config journal attribute changes are recorded in, None when changes are not recorded.
+        config_type (str): Config section of the object, None for objects which are not saved in the config.
 
     Attributes:
         name (str): Object name.
         default_attr (dict): Dictionary of default attribute values.
+        validators (dict): Compiled validator of each attribute.
+        seq (int): Change sequence number of the latest change to the object, 0 when unchanged since it was loaded.
+        created_seq (int): Change sequence number of the object creation, 0 when it was loaded from config.
+        change_seqs (dict): Change sequence number of the latest change to each changed attribute.
 
     """
 
-    update_flag = False
+    change_seq = 0
+    change_journal = None
+    config_type = None
+    _seq_lock = threading.Lock()
 
     def __init__(self):
         self.name = None
         self._attr = {}
         self.default_attr = None
+        self.validators = {}
+        self.seq = 0
+        self.created_seq = 0
+        self.change_seqs = {}
 
     def init_attr(self, default_attributes):
         """Initialize attributes with defaults.
@@ -33,6 +47,7 @@ class AttributeObject(object):  # Inherits from object to enabling super() in py
 
         """
         self.default_attr = default_attributes
+        self.validators = compile_validators(default_attributes)
         for attribute in default_attributes:
             default_value = default_attributes[attribute]['default']
             if isinstance(default_value, list):
@@ -76,25 +91,53 @@ class AttributeObject(object):  # Inherits from object to enabling super() in py
             value (str): Value to set attribute.
 
         Raises:
-            ICSError: When given attribute does not exist.
+            ICSError: When given attribute does not exist or the value is not valid for the attribute.
 
         """
-        if attr not in self._attr:
-            raise ICSError('{}({}) Attribute {} does not exist'.format(self.__class__.__name__, self.name, attr))
-
-        if self.attr_type(attr) == 'list':
-            if not isinstance(value, list):
-                raise ICSError('{}({}) Value {} is not of list type for attribute {}'.format(self.__class__.__name__, self.name, value, attr))
+        self.validate_attr(attr, value)
 
         if self._attr[attr] == "":
             previous_value = '<empty>'
         else:
             previous_value = self._attr[attr]
         self._attr[attr] = value
-        AttributeObject.update_flag = True
+        self.attr_changed(attr)
         logger.info('{}({}) attribute {} changed from {} to {}'.format(self.__class__.__name__, self.name, attr,
                                                                        previous_value, value))
 
+    def load_attr(self, attributes):
+        """Set attribute values loaded from config, without logging or recording each change.
+
+        Args:
+            attributes (dict): Attribute names and values.
+
+        Raises:
+            ICSError: When a given attribute does not exist or a value is not valid for the attribute.
+
+        """
+        for attr, value in attributes.items():
+            self.validate_attr(attr, value)
+            self._attr[attr] = value
+
+    def validate_attr(self, attr, value):
+        """Check an attribute value with the compiled validator of the attribute.
+
+        Args:
+            attr (str): Attribute name.
+            value (obj): Attribute value.
+
+        Raises:
+            ICSError: When given attribute does not exist or the value is not valid for the attribute.
+
+        """
+        validator = self.validators.get(attr)
+        if validator is None:
+            raise ICSError('{}({}) Attribute {} does not exist'.format(self.__class__.__name__, self.name, attr))
+        error = validator(value)
+        if error is not None:
+            raise ICSError('{}({}) Value {} {} for attribute {}'.format(self.__class__.__name__, self.name, value,
+                                                                      error, attr))
+
     def attr_append_value(self, attr, value):
         """Append item to list type attribute.
 
@@ -116,9 +159,10 @@ class AttributeObject(object):  # Inherits from object to enabling super() in py
         if value in self.attr_value(attr):
             raise ICSError('{}({}) Value {} already exists in attribute {}'.format(self.__class__.__name__,
                                                                                    self.name, value, attr))
+        self.validate_attr(attr, self._attr[attr] + [value])
 
         self._attr[attr].append(value)
-        AttributeObject.update_flag = True
+        self.attr_changed(attr)
 
     def attr_remove_value(self, attr, value):
         """Remove item from list type attribute.
@@ -143,7 +187,59 @@ class AttributeObject(object):  # Inherits from object to enabling super() in py
         except ValueError:
             raise ICSError(('{}({}) Value {} is not in attribute list {}'.format(self.__class__.__name__, self.name,
                                                                                  value, attr)))
-        AttributeObject.update_flag = True
+        self.attr_changed(attr)
+
+    @staticmethod
+    def next_change_seq():
+        """Allocate the next change sequence number.
+
+        Returns:
+            int: Change sequence number.
+
+        """
+        with AttributeObject._seq_lock:
+            AttributeObject.change_seq += 1
+            return AttributeObject.change_seq
+
+    def mark_changed(self, attr=None):
+        """Record a change to the object with a new change sequence number.
+
+        Args:
+            attr (str, opt): Name of the changed attribute, None for changes which are not attribute changes.
+
+        Returns:
+            int: Change sequence number.
+
+        """
+        seq = self.next_change_seq()
+        self.seq = seq
+        if attr is not None:
+            self.change_seqs[attr] = seq
+        return seq
+
+    def changed_since(self, seq):
+        """Attributes changed after a change sequence number.
+
+        Args:
+            seq (int): Change sequence number.
+
+        Returns:
+            dict: Changed attribute names and their current values.
+
+        """
+        return {attr: deepcopy(self._attr[attr]) for attr, attr_seq in self.change_seqs.items() if attr_seq > seq}
+
+    def attr_changed(self, attr):
+        """Record attribute change with a change sequence number and in the config journal.
+
+        Args:
+            attr (str): Attribute name.
+
+        """
+        self.mark_changed(attr)
+        if AttributeObject.change_journal is not None and self.config_type is not None:
+            AttributeObject.change_journal.append([{'op': 'set', 'type': self.config_type, 'name': self.name,
+                                                    'attr': attr, 'value': self._attr[attr]}])
 
     def attr_value(self, attr):
         """Retrieve value of attribute.
@@ -176,6 +272,94 @@ class AttributeObject(object):  # Inherits from object to enabling super() in py
         return attr_list
 
 
+def _check_string(value):
+    if not isinstance(value, str):
+        return 'is not a string'
+
+
+def _check_int(value):
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        return 'is not an integer'
+    try:
+        int(value)
+    except ValueError:
+        return 'is not an integer'
+
+
+def _check_boolean(value):
+    if value != 'true' and value != 'false':
+        return 'is not true or false'
+
+
+def _check_list(value):
+    if not isinstance(value, list):
+        return 'is not of list type'
+    for item in value:
+        if not isinstance(item, str):
+            return 'has an item which is not a string'
+
+
+# Value checks for each attribute type, returning an error message or None for a valid value
+type_checks = {
+    'string': _check_string,
+    'int': _check_int,
+    'integer': _check_int,
+    'boolean': _check_boolean,
+    'list': _check_list
+}
+
+_compiled_validators = {}
+
+
+def compile_validator(definition):
+    """Compile an attribute definition into a validator.
+
+    Args:
+        definition (dict): Attribute definition with its type and optionally the allowed values.
+
+    Returns:
+        func: Validator, which returns an error message for an invalid value or None for a valid value.
+
+    Raises:
+        ICSError: When the attribute type is unknown.
+
+    """
+    try:
+        check = type_checks[definition['type']]
+    except KeyError:
+        raise ICSError('Unknown attribute type {}'.format(definition.get('type')))
+    if 'values' not in definition:
+        return check
+
+    values = frozenset(definition['values'])
+    error_message = 'is not one of ' + ', '.join(definition['values'])
+
+    def check_values(value):
+        error = check(value)
+        if error is None and value not in values:
+            return error_message
+        return error
+    return check_values
+
+
+def compile_validators(default_attributes):
+    """Compile the attribute definitions of an object type into validators, compiled once for each definition dict.
+
+    Args:
+        default_attributes (dict): Attribute definitions.
+
+    Returns:
+        dict: Validator of each attribute.
+
+    """
+    compiled = _compiled_validators.get(id(default_attributes))
+    if compiled is None or compiled[0] is not default_attributes:
+        compiled = (default_attributes, {attr: compile_validator(definition)
+                                         for attr, definition in default_attributes.items()})
+        _compiled_validators[id(default_attributes)] = compiled
+    return compiled[1]
+
+
 resource_attributes = {
     "Group": {
         "default": "none",
@@ -274,6 +458,11 @@ group_attributes = {
         "type": "boolean",
         "description": "Indicates weather a service group is automatically started when system starts"
     },
+    "Priority": {
+        "default": "0",
+        "type": "int",
+        "description": "Order in which groups are probed at startup, groups with a higher priority are probed first"
+    },
     "IgnoreDisabled": {
         "default": "true",
         "type": "boolean",
@@ -283,6 +472,12 @@ group_attributes = {
         "default": "false",
         "type": "boolean",
         "description": ""
+    },
+    "AutoFailover": {
+        "default": "true",
+        "type": "boolean",
+        "description": "Indicates whether a service group is automatically started on another node in the SystemList\
+                        when the node it is online on is lost"
     }
 
 }
@@ -318,14 +513,113 @@ system_attributes = {
         "type": "int",
         "description": ""
     },
+    "MutationLogSize": {
+        "default": "1000",
+        "type": "int",
+        "description": "Number of recent config mutations kept for nodes catching up, nodes further behind are sent "
+                       "the complete config"
+    },
+    "StateSaveInterval": {
+        "default": "60",
+        "type": "int",
+        "description": "Time (in seconds) between saving resource states used for a warm restart"
+    },
+    "WarmRestartAge": {
+        "default": "600",
+        "type": "int",
+        "description": "Maximum age (in seconds) of a saved resource poll for its state to be reused at startup, "
+                       "0 to always probe all resources before accepting requests"
+    },
+    "GroupConfigFiles": {
+        "default": "false",
+        "type": "boolean",
+        "description": "Write each group with its resources to its own config file, so only changed groups are "
+                       "rewritten, with main.cf holding the system attributes"
+    },
+    "ConfigSnapshot": {
+        "default": "true",
+        "type": "boolean",
+        "description": "Write a binary snapshot of the config next to main.cf, used for faster startup"
+    },
+    "BackupRetentionCount": {
+        "default": "100",
+        "type": "int",
+        "description": "Maximum number of config backups kept, 0 for no limit"
+    },
+    "BackupRetentionDays": {
+        "default": "30",
+        "type": "int",
+        "description": "Maximum age (in days) of config backups kept, 0 for no limit"
+    },
+    "LogRetentionDays": {
+        "default": "14",
+        "type": "int",
+        "description": "Maximum age (in days) of resource and alert log files kept, 0 for no limit"
+    },
+    "LogRetentionSize": {
+        "default": "1024",
+        "type": "int",
+        "description": "Maximum total size (in MB) of each of the resource and alert logs, 0 for no limit"
+    },
+    "RetentionInterval": {
+        "default": "60",
+        "type": "int",
+        "description": "Time (in minutes) between removing and compressing old log files and config backups"
+    },
+    "HeartbeatTimeout": {
+        "default": "5",
+        "type": "int",
+        "description": "Time (in seconds) without a heartbeat from a remote node before the node is declared lost"
+    },
     "AlertRecipients": {
         "default": [],
         "type": "list",
         "description": ""
     },
+    "AlertNotifiers": {
+        "default": ["mail"],
+        "type": "list",
+        "description": "Alert notification channels (mail, syslog, webhook, script)"
+    },
+    "AlertWebhookURL": {
+        "default": "",
+        "type": "string",
+        "description": "URL alerts are posted to as JSON by the webhook notifier"
+    },
+    "AlertScript": {
+        "default": "",
+        "type": "string",
+        "description": "Command run with alerts as JSON on standard input by the script notifier"
+    },
+    "AlertDedupKeys": {
+        "default": ["node", "group", "resource", "msg"],
+        "type": "list",
+        "description": "Alert fields used to identify duplicate alerts"
+    },
+    "AlertDedupWindow": {
+        "default": "0",
+        "type": "int",
+        "description": "Time (in seconds) duplicate alerts are not mailed after an alert is mailed, 0 to disable"
+    },
+    "AlertDigestSize": {
+        "default": "1",
+        "type": "int",
+        "description": "Number of alerts combined into a single mail, 1 to disable"
+    },
+    "AlertDigestInterval": {
+        "default": "60",
+        "type": "int",
+        "description": "Maximum time (in seconds) an alert waits for a digest to fill before it is mailed"
+    },
+    "AlertHistoryDays": {
+        "default": "90",
+        "type": "int",
+        "description": "Maximum age (in days) of alerts kept in the alert history, 0 for no limit"
+    },
     "AlertLevel": {
         "default": "WARNING",
-        "type": "string"
-        "description"
+        "type": "string",
+        "values": ["CRITICAL", "ERROR", "WARNING", "INFO", "NOTSET"],
+        "description": "Minimum level of alerts which are sent"
     }
 }
@@ -1,21 +1,40 @@
 import argparse
 import json
+import os
+import shlex
 import sys
 import time
+from datetime import datetime
 from getpass import getuser
 
 import Pyro4 as Pyro
 
 from ics.alerts import AlertClient
+from ics.alerts import get_level_name
+from ics.environment import ICS_CONF_FILE
 from ics.errors import ICSError
 from ics.tabular import print_table
+from ics.utils import alert_conn
 from ics.utils import daemon_conn
 from ics.utils import engine_conn
+from ics.utils import group_layout, read_config, read_group_configs
 from ics.utils import ics_version
+from ics.utils import OperationBatch
+from ics.utils import restore_backup
 from ics.utils import setup_signal_handler, hostname
+from ics.validation import check_config
 
 epilog_text = ''
 
+batch_size = 100  # Maximum number of commands sent to the server in a single request
+
+# Cluster methods with a bulk equivalent that takes a list of argument lists
+bulk_method_map = {
+    'clus_res_add': 'clus_res_add_many',
+    'clus_res_modify': 'clus_res_modify_many',
+    'clus_res_link': 'clus_res_link_many',
+}
+
 
 def icsstart():
     execute_command('icsstart')
@@ -45,11 +64,319 @@ def icsdump():
     execute_command('icsdump')
 
 
-def comamnd_log(conn, command_name):
+def icsconfig():
+    execute_command('icsconfig')
+
+
+def command_message(command_name, batch_count=None):
     command_args = sys.argv
     command_args.pop(0)
     message = "Host: {}, User: {}, Command: {} {}".format(hostname(), getuser(), command_name, ' '.join(command_args))
-    conn.clus_log_command(message)
+    if batch_count is not None:
+        message += ' ({} batch commands)'.format(batch_count)
+    return message
+
+
+def comamnd_log(conn, command_name, batch_count=None):
+    conn.clus_log_command(command_message(command_name, batch_count=batch_count))
+
+
+# Read operations which are sent in a single request with the command log message
+read_operations = {
+    'clus_node_state', 'node_list', 'node_attr', 'node_value', 'dump',
+    'clus_grp_state', 'clus_grp_state_all', 'clus_grp_resources', 'clus_grp_list', 'clus_grp_attr', 'clus_grp_value',
+    'clus_res_state', 'clus_res_state_many', 'clus_res_dep', 'clus_res_list', 'clus_res_attr', 'clus_res_value',
+    'clus_res_output', 'clus_res_provisional',
+}
+
+
+class CommandConnection:
+    """Engine connection which logs the command with its first operation.
+
+    When the first operation is a read operation it is sent in a single OperationBatch request with the command log
+    message, so a read command makes one round trip to the engine instead of two. Other operations are run after the
+    log message has been sent, as before.
+
+    Attributes:
+        conn (obj): Engine Pyro connection.
+        message (str): Command log message, None once it has been sent.
+
+    """
+
+    def __init__(self, conn, message):
+        self.conn = conn
+        self.message = message
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if self.message is None:
+            return getattr(self.conn, name)
+
+        def run(*args, **kwargs):
+            batch = OperationBatch(self.conn)
+            batch.clus_log_command(self.message)
+            self.message = None
+            if name not in read_operations:
+                batch.results()
+                return getattr(self.conn, name)(*args, **kwargs)
+            getattr(batch, name)(*args, **kwargs)
+            return batch.results()[-1]
+        return run
+
+
+# Batch command options mapped to cluster method and number of positional arguments
+batch_command_map = {
+    'icsgrp': {
+        '-add': ('clus_grp_add', 1),
+        '-delete': ('clus_grp_delete', 1),
+        '-enable': ('clus_grp_enable', 1),
+        '-disable': ('clus_grp_disable', 1),
+        '-enableresources': ('clus_grp_enable_resources', 1),
+        '-disableresources': ('clus_grp_disable_resources', 1),
+        '-online': ('clus_grp_online', 1),
+        '-offline': ('clus_grp_offline', 1),
+        '-clear': ('clus_grp_clear', 2),
+        '-flush': ('clus_grp_flush', 2),
+        '-modify': ('clus_grp_modify', 2),
+    },
+    'icsres': {
+        '-add': ('clus_res_add', 2),
+        '-delete': ('clus_res_delete', 1),
+        '-online': ('clus_res_online', 1),
+        '-offline': ('clus_res_offline', 1),
+        '-link': ('clus_res_link', 2),
+        '-unlink': ('clus_res_unlink', 2),
+        '-clear': ('clus_res_clear', 1),
+        '-probe': ('clus_res_probe', 1),
+        '-modify': ('clus_res_modify', 2),
+    }
+}
+
+
+def parse_batch_line(line, command_name):
+    """Parse a batch file line into a cluster method call.
+
+    A line has the same arguments as the command line tool, optionally starting with the command name. For example:
+        icsres -add proc-a1 group-a
+        -modify proc-a1 StartProgram /opt/app/bin/start.sh
+
+    Args:
+        line (str): Batch file line.
+        command_name (str): Default command name when the line does not start with one.
+
+    Returns:
+        tuple: Method name, list of positional arguments and dict of keyword arguments.
+
+    Raises:
+        ICSError: When the line is not a valid batch command.
+
+    """
+    try:
+        words = shlex.split(line)
+    except ValueError as err:
+        raise ICSError('Unable to parse line, {}'.format(str(err)))
+
+    if words and words[0] in batch_command_map:
+        command_name = words.pop(0)
+
+    if not words or words[0] not in batch_command_map[command_name]:
+        raise ICSError('Invalid batch command for {}: {}'.format(command_name, line))
+
+    option = words.pop(0)
+    method, arg_count = batch_command_map[command_name][option]
+
+    # Pull out secondary options, resource modify values are taken as is
+    secondary_args = {}
+    for secondary_option in ['-sys', '-append', '-remove']:
+        if option == '-modify' and command_name == 'icsres':
+            break
+        if secondary_option in words:
+            index = words.index(secondary_option)
+            if index + 1 >= len(words):
+                raise ICSError('Argument {} expected 1 argument'.format(secondary_option))
+            secondary_args[secondary_option[1:]] = words[index + 1]
+            del words[index:index + 2]
+
+    kwargs = {}
+    if option == '-modify':
+        list_action = [action for action in ['append', 'remove'] if action in secondary_args]
+        if list_action:
+            if command_name != 'icsgrp' or len(words) != arg_count:
+                raise ICSError('Invalid use of -{} with -modify: {}'.format(list_action[0], line))
+            args = words + [secondary_args[list_action[0]]]
+            kwargs[list_action[0]] = True
+        elif len(words) <= arg_count:
+            raise ICSError('Argument -modify expected {} arguments'.format(arg_count + 1))
+        else:
+            args = words[:arg_count] + [' '.join(words[arg_count:])]
+    elif len(words) != arg_count:
+        raise ICSError('Argument {} expected {} argument(s)'.format(option, arg_count))
+    elif option in ['-online', '-offline'] and command_name == 'icsres':
+        if 'sys' not in secondary_args:
+            raise ICSError('System must be specified')
+        args = words + [secondary_args['sys']]
+    elif option in ['-online', '-offline'] and 'sys' in secondary_args:
+        args = words
+        kwargs['node'] = secondary_args['sys']
+    else:
+        args = words
+
+    return method, args, kwargs
+
+
+def read_batch_file(filename, command_name):
+    """Read and parse batch commands from a file.
+
+    Args:
+        filename (str): Batch filename, or - for standard input.
+        command_name (str): Default command name.
+
+    Returns:
+        tuple: List of parsed commands and list of parse errors, each with the line number and line.
+
+    """
+    if filename == '-':
+        lines = sys.stdin.readlines()
+    else:
+        try:
+            with open(filename, 'r') as f:
+                lines = f.readlines()
+        except IOError as err:
+            raise ICSError('Unable to read batch file: {}'.format(str(err)))
+
+    commands = []
+    parse_errors = []
+    for line_num, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            method, args, kwargs = parse_batch_line(line, command_name)
+        except ICSError as err:
+            parse_errors.append((line_num, line, str(err)))
+        else:
+            commands.append((line_num, line, method, args, kwargs))
+
+    return commands, parse_errors
+
+
+def bulk_batch_commands(commands):
+    """Combine consecutive commands that have a bulk method into a single bulk command.
+
+    Args:
+        commands (list): Parsed commands with the line number and line.
+
+    Returns:
+        list: Commands, where combined commands are replaced by a tuple of bulk method name and commands.
+
+    """
+    combined = []
+    for command in commands:
+        method, kwargs = command[2], command[4]
+        if method in bulk_method_map and not kwargs:
+            previous = combined[-1] if combined else None
+            if isinstance(previous, tuple) and len(previous) == 2 and previous[0] == bulk_method_map[method]:
+                previous[1].append(command)
+                continue
+            combined.append((bulk_method_map[method], [command]))
+        else:
+            combined.append(command)
+
+    # Bulk commands with a single command are sent as is
+    return [item[1][0] if len(item) == 2 and len(item[1]) == 1 else item for item in combined]
+
+
+def run_batch(cluster, commands):
+    """Run batch commands over a single connection.
+
+    Consecutive resource add, modify and link commands are combined into a single bulk call. Commands are sent to the
+    server in groups of batch_size and run in order, stopping at the first failed command so the remaining commands are
+    sent again in the next group. When a bulk call fails none of its changes are made, so its commands are sent again
+    one at a time to find the failed lines.
+
+    Args:
+        cluster (obj): Engine Pyro connection.
+        commands (list): Parsed commands with the line number and line.
+
+    Returns:
+        list: Failed commands with the line number, line and error message.
+
+    """
+    command_errors = []
+    pending = bulk_batch_commands(commands)
+    while pending:
+        batch = OperationBatch(cluster)
+        for item in pending[:batch_size]:
+            if len(item) == 2:
+                bulk_method, bulk_commands = item
+                getattr(batch, bulk_method)([command[3] for command in bulk_commands])
+            else:
+                line_num, line, method, args, kwargs = item
+                getattr(batch, method)(*args, **kwargs)
+
+        results = batch.execute(stop_on_error=True)
+        completed = len(results)
+        if 'error' in results[-1]:
+            completed -= 1
+            failed = pending[completed]
+            if len(failed) == 2:
+                pending = pending[:completed] + failed[1] + pending[completed + 1:]
+            else:
+                command_errors.append((failed[0], failed[1], results[-1]['error']))
+                completed += 1
+
+        pending = pending[completed:]
+
+    return command_errors
+
+
+def command_batch(command_name, filename):
+    """Run commands from a batch file and exit.
+
+    Args:
+        command_name (str): Default command name.
+        filename (str): Batch filename, or - for standard input.
+
+    """
+    commands, batch_errors = read_batch_file(filename, command_name)
+
+    if commands:
+        cluster = engine_conn()
+        comamnd_log(cluster, command_name, batch_count=len(commands))
+        batch_errors += run_batch(cluster, commands)
+
+    for line_num, line, error in sorted(batch_errors):
+        print('ERROR: line {}: {}: {}'.format(line_num, error, line))
+
+    if batch_errors:
+        sys.exit(1)
+    sys.exit(0)
+
+
+def parse_since(since):
+    """Parse time given to the -since option.
+
+    Args:
+        since (str): Relative time (30m, 2h, 1d) or date and time (YYYY-MM-DD [HH:MM[:SS]]).
+
+    Returns:
+        float: Seconds since epoch.
+
+    Raises:
+        ICSError: When time format is invalid.
+
+    """
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    if since[-1:] in units and since[:-1].isdigit():
+        return time.time() - int(since[:-1]) * units[since[-1]]
+
+    for time_format in ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d']:
+        try:
+            return time.mktime(datetime.strptime(since, time_format).timetuple())
+        except ValueError:
+            pass
+    raise ICSError('Invalid time: {}'.format(since))
 
 
 def command_icsstart():
@@ -86,6 +413,8 @@ def command_icssys():
     group.add_argument('-modify', nargs='*', metavar='<attr> <value>',
                        help='modify system attribute')
     group.add_argument('-version', action='store_true', help='print ICS version')
+    group.add_argument('-reload', nargs='?', const='', metavar='<file>',
+                       help='apply changes in config file (default main.cf) without restarting')
     first_args = parser.parse_known_args()
     args = first_args[0]
 
@@ -98,8 +427,7 @@ def command_icssys():
     secondary_parser.add_argument('-remove', nargs=1)
     secondary_args = secondary_parser.parse_args(first_args[1])
 
-    cluster = engine_conn()
-    comamnd_log(cluster, 'icssys')
+    cluster = CommandConnection(engine_conn(), command_message('icssys'))
 
     if args.add is not None:
         cluster.add_node(args.add[0])
@@ -157,6 +485,13 @@ def command_icssys():
     elif args.version:
         print(ics_version())
 
+    elif args.reload is not None:
+        filename = os.path.abspath(args.reload) if args.reload else None
+        applied = cluster.reload_config(filename)
+        for line in applied:
+            print(line)
+        print('{} changes applied'.format(len(applied)))
+
     else:
         parser.print_help()
 
@@ -185,6 +520,7 @@ def command_icsgrp():
                        help='modify group attribute')
     group.add_argument('-wait', nargs=2, metavar=('<group>', '<state> [ -timeout <timeout> ] [ -sys <sys> | -all ]'),
                        help='wait for group to change state')
+    group.add_argument('-f', nargs=1, metavar='<file>', help='run commands from a batch file, - for standard input')
 
     primary_args = parser.parse_known_args()
     args = primary_args[0]
@@ -201,8 +537,10 @@ def command_icsgrp():
     secondary_parser.add_argument('-timeout', nargs=1)
     secondary_args = secondary_parser.parse_args(primary_args[1])
 
-    cluster = engine_conn()
-    comamnd_log(cluster, 'icsgrp')
+    if args.f is not None:
+        command_batch('icsgrp', args.f[0])
+
+    cluster = CommandConnection(engine_conn(), command_message('icsgrp'))
 
     if args.online is not None:
         group_name = args.online[0]
@@ -382,6 +720,10 @@ def command_icsres():
                        help='modify resource attribute')
     group.add_argument('-wait', nargs=2, metavar=('<res>', '<state> [ -timeout <timeout> ] [ -sys <sys> | -all ]'),
                        help='wait for resource to change state')
+    group.add_argument('-output', nargs=1, metavar='<res> [ -sys <sys> ]', help='print recent command output')
+    group.add_argument('-provisional', nargs=1, metavar='<res>',
+                       help='print whether the resource state was restored at startup and not polled yet')
+    group.add_argument('-f', nargs=1, metavar='<file>', help='run commands from a batch file, - for standard input')
 
     primary_args = parser.parse_known_args()
     args = primary_args[0]
@@ -398,8 +740,10 @@ def command_icsres():
     secondary_parser.add_argument('-timeout', nargs=1)
     secondary_args = secondary_parser.parse_args(primary_args[1])
 
-    cluster = engine_conn()
-    comamnd_log(cluster, 'icsres')
+    if args.f is not None:
+        command_batch('icsres', args.f[0])
+
+    cluster = CommandConnection(engine_conn(), command_message('icsres'))
 
     if args.online is not None:
         resource_name = args.online[0]
@@ -493,6 +837,17 @@ def command_icsres():
 
         cluster.clus_res_modify(resource_name, attr, value)
 
+    elif args.output is not None:
+        resource_name = args.output[0]
+        node = secondary_args.sys[0] if secondary_args.sys is not None else None
+        for line in cluster.clus_res_output(resource_name, node=node):
+            print(line)
+
+    elif args.provisional is not None:
+        resource_name = args.provisional[0]
+        provisional = cluster.clus_res_provisional(resource_name)
+        print_table([(resource_name, node, str(provisional[node]).lower()) for node in provisional])
+
     elif args.wait is not None:
         resource_name, state_name = args.wait
 
@@ -540,6 +895,13 @@ def command_icsalert():
     group = parser.add_mutually_exclusive_group()
     group.add_argument('-level', nargs=1, metavar='<level>', help='Set system log level')
     group.add_argument('-test', action='store_true', help='')
+    group.add_argument('-stats', action='store_true', help='Show alert handler statistics')
+    group.add_argument('-history', action='store_true', help='Show alert history')
+    parser.add_argument('-resource', metavar='<resource>', help='Only show alerts of resource')
+    parser.add_argument('-group', metavar='<group>', help='Only show alerts of group')
+    parser.add_argument('-since', metavar='<time>',
+                        help='Only show alerts since time (30m, 2h, 1d or YYYY-MM-DD HH:MM)')
+    parser.add_argument('-limit', type=int, default=1000, metavar='<count>', help='Maximum number of alerts to show')
     args = parser.parse_args()
 
     if len(sys.argv) <= 1:
@@ -553,6 +915,32 @@ def command_icsalert():
     elif args.test:
         alert = AlertClient()
         alert.test("This is a test alert.")
+        if not alert.flush(timeout=10):
+            print('ERROR: Unable to send test alert to ICS alert server')
+            sys.exit(1)
+    elif args.stats:
+        stats = alert_conn().stats()
+        suppressed_alerts = stats.pop('suppressed_alerts')
+        notifier_stats = stats.pop('notifiers')
+        print_table(stats.items())
+        if notifier_stats:
+            print('')
+            table = [(name, data['sent'], data['failed'], data['dropped'], data['queued'],
+                      '{:.3f}'.format(data['send_time'])) for name, data in notifier_stats.items()]
+            print_table(table, header=['NOTIFIER', 'SENT', 'FAILED', 'DROPPED', 'QUEUED', 'SEND TIME'])
+        if suppressed_alerts:
+            print('')
+            print_table(suppressed_alerts.items(), header=['SUPPRESSED ALERT', 'COUNT'])
+    elif args.history:
+        try:
+            since = parse_since(args.since) if args.since is not None else None
+        except ICSError as err:
+            print('ERROR: {}'.format(err))
+            sys.exit(1)
+        alerts = alert_conn().history(resource=args.resource, group=args.group, since=since, limit=args.limit)
+        table = [(index, alert['time'], get_level_name(alert['level']), alert['node'], alert['group'],
+                  alert['resource'], alert['msg']) for index, alert in enumerate(reversed(alerts))]
+        print_table(table, header=['#', 'TIME', 'LEVEL', 'NODE', 'GROUP', 'RESOURCE', 'MESSAGE'])
     else:
         parser.print_help()
 
@@ -564,8 +952,7 @@ def command_icsdump():
     parser.add_argument('-pretty', action='store_true', help='Print pretty')
     args = parser.parse_args()
 
-    cluster = engine_conn()
-    comamnd_log(cluster, 'icsdump')
+    cluster = CommandConnection(engine_conn(), command_message('icsdump'))
     data = cluster.dump()
 
     if args.pretty:
@@ -574,6 +961,53 @@ def command_icsdump():
         print(json.dumps(data))
 
 
+def command_icsconfig():
+    setup_signal_handler()
+    description_text = 'Check and restore ICS configuration files without a running server'
+    parser = argparse.ArgumentParser(description=description_text, epilog=epilog_text, allow_abbrev=False)
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('-check', nargs='?', const=ICS_CONF_FILE, metavar='<file>',
+                       help='check config file (default main.cf) and its group config files')
+    group.add_argument('-restore', nargs=1, metavar='<backup>',
+                       help='restore config files from a main.cf backup, such as main.cf.210101_120000.gz, while the '
+                            'server is stopped')
+    args = parser.parse_args()
+
+    if args.restore is not None:
+        try:
+            filename = restore_backup(args.restore[0])
+        except ICSError as err:
+            print('{}: {}'.format(args.restore[0], err))
+            sys.exit(1)
+        print('Restored {} from {}'.format(filename, args.restore[0]))
+        sys.exit(0)
+
+    if args.check is None:
+        parser.print_help()
+        sys.exit(1)
+
+    filename = args.check
+    try:
+        data = read_config(filename, verify=False)
+        if not isinstance(data, dict):
+            raise ICSError('top level is not an object')
+        if group_layout(data):
+            read_group_configs(os.path.join(os.path.dirname(os.path.abspath(filename)), 'groups'), data, verify=False)
+    except FileNotFoundError:
+        print('{}: file not found'.format(filename))
+        sys.exit(1)
+    except ICSError as err:
+        print('{}: {}'.format(filename, err))
+        sys.exit(1)
+    errors = check_config(data)
+    for location, message in errors:
+        print('{}: {}: {}'.format(filename, location, message))
+    if errors:
+        print('{} error{} found'.format(len(errors), '' if len(errors) == 1 else 's'))
+        sys.exit(1)
+    print('Config valid: {} groups, {} resources'.format(len(data['groups']), len(data['resources'])))
+
+
 command_map = {
     'icsstart': command_icsstart,
     'icsstop': command_icsstop,
@@ -581,7 +1015,8 @@ command_map = {
     'icsgrp': command_icsgrp,
     'icsres': command_icsres,
     'icsalert': command_icsalert,
-    'icsdump': command_icsdump
+    'icsdump': command_icsdump,
+    'icsconfig': command_icsconfig
 }
 
 
@@ -8,20 +8,30 @@ DEFAULT_ICS_UDS = '/var/opt/ics/uds'
 
 # Global configuration variables
 HOSTNAME = os.uname()[1]
+ICS_NODE_NAME = os.getenv('ICS_NODE_NAME', HOSTNAME)
 ICS_LOG = os.getenv('ICS_LOG', DEFAULT_ICS_LOG)
 ICS_CONF = os.getenv('ICS_CONF', DEFAULT_ICS_CONF)
 ICS_VAR = os.getenv('ICS_VAR', DEFAULT_ICS_VAR)
 ICS_UDS = os.getenv('ICS_UDS', DEFAULT_ICS_UDS)
 
 ICS_CONF_FILE = ICS_CONF + '/main.cf'
+ICS_CONF_JOURNAL = ICS_CONF + '/main.cf.journal'
+ICS_CONF_SNAPSHOT = ICS_CONF + '/main.cf.snapshot'
+ICS_CONF_GROUPS = ICS_CONF + '/groups'
 ICS_UDS_FILE = ICS_UDS + '/uds_socket'
+ICS_ALERT_UDS_FILE = ICS_UDS + '/alert_socket'
 ICS_ALERT_LOG = ICS_LOG + '/alerts.log'
+ICS_ALERT_DB = ICS_VAR + '/alerts.db'
 ICS_RES_LOG = ICS_LOG + '/resource.log'
+ICS_RES_OUTPUT = ICS_LOG + '/output'
+ICS_ALERT_OUTBOX = ICS_VAR + '/alert_outbox'
+ICS_ALERT_SPOOL = ICS_VAR + '/alert_spool'
+ICS_STATE_FILE = ICS_VAR + '/resource_states.json'
 
 ICS_CLUSTER_NAME = HOSTNAME  # Temporary
-ICS_ALERT_RECIPIENTS = ["raleigh.waters@intelsat.com"]
 ICS_ALERT_LEVEL = 'NOTSET'
+ICS_ALERT_WORKERS = int(os.getenv('ICS_ALERT_WORKERS', 4))
 
-ICS_DAEMON_PORT = 9090
-ICS_ENGINE_PORT = 9091
-ICS_ALERT_PORT = 9092
+ICS_DAEMON_PORT = int(os.getenv('ICS_DAEMON_PORT', 9090))
+ICS_ENGINE_PORT = int(os.getenv('ICS_ENGINE_PORT', 9091))
+ICS_ALERT_PORT = int(os.getenv('ICS_ALERT_PORT', 9092))
@@ -21,7 +21,7 @@ def trigger_event(event):
         event (obj): Event like object.
 
     """
-    logger.debug('Resource({}) event triggered {}'.format(event.resource.name, event))
+    logger.debug('Resource(%s) event triggered %s', event.resource.name, event)
     event_queue.put(event)
 
 
@@ -30,9 +30,9 @@ def event_handler():
     while True:
         queue_size = event_queue.qsize()
         if queue_size > 0:
-            logger.debug('Remaining events in event queue ({})'.format(queue_size))
+            logger.debug('Remaining events in event queue (%s)', queue_size)
         event = event_queue.get()
-        logger.debug('Running event ({})'.format(event))
+        logger.debug('Running event (%s)', event)
 
         # Catch and log all exceptions that occur and continue to process events
         try:
@@ -100,13 +100,13 @@ class ResourceOfflineEvent(ResourceStateEvent):
         if self.last_state in ONLINE_STATES:
             self.resource.fault_count += 1
             restart_limit = int(self.resource.attr_value('RestartLimit'))
-            logger.info('Resource({}) Fault detected ({} of {})'.format(self.resource.name,
-                                                                        self.resource.fault_count, restart_limit))
-            logger.debug('Resource({}) last state: {}'.format(self.resource.name, self.last_state))
+            logger.info('Resource(%s) Fault detected (%s of %s)',
+                        self.resource.name, self.resource.fault_count, restart_limit)
+            logger.debug('Resource(%s) last state: %s', self.resource.name, self.last_state)
 
             if self.resource.fault_count >= restart_limit:
-                logger.info('Resource({}) reached max fault count ({})'.format(self.resource.name,
-                                                                               self.resource.attr_value('RestartLimit')))
+                logger.info('Resource(%s) reached max fault count (%s)',
+                            self.resource.name, self.resource.attr_value('RestartLimit'))
                 self.resource.change_state(ResourceStates.FAULTED)
             #elif self.resource.attr_value('AutoRestart') == 'true':
             else:
@@ -115,7 +115,7 @@ class ResourceOfflineEvent(ResourceStateEvent):
             self.resource.propagate = False  # Resource has successfully propagated from parent
             for parent in self.resource.parents:
                 if parent.offline_ready():
-                    logger.info('Resource({}) propagating offline to {} '.format(self.resource.name, parent.name))
+                    logger.info('Resource(%s) propagating offline to %s ', self.resource.name, parent.name)
                     parent.propagate = True
                     if parent.state is ResourceStates.ONLINE:
                         parent.change_state(ResourceStates.STOPPING)
@@ -125,8 +125,7 @@ class ResourceOfflineEvent(ResourceStateEvent):
                         parent.change_state(ResourceStates.OFFLINE, force=True)
                     # TODO: to be more robust, add cases for when state is other than online or offline
                 else:
-                    logger.debug('Resource({}) Unable to stop, waiting for children to become offline'
-                                 .format(parent.name))
+                    logger.debug('Resource(%s) Unable to stop, waiting for children to become offline', parent.name)
 
 
 class ResourceStoppingEvent(ResourceStateEvent):
@@ -143,7 +142,7 @@ class ResourceOnlineEvent(ResourceStateEvent):
             self.resource.propagate = False  # Resource has successfully propagated from children
             for child in self.resource.children:
                 if child.online_ready():
-                    logger.info('Resource({}) propagating online to {} '.format(self.resource.name, child.name))
+                    logger.info('Resource(%s) propagating online to %s ', self.resource.name, child.name)
                     child.propagate = True
                     if child.state in ResourceStates.OFFLINE:
                         child.change_state(ResourceStates.STARTING)
@@ -153,8 +152,7 @@ class ResourceOnlineEvent(ResourceStateEvent):
                         child.change_state(ResourceStates.ONLINE, force=True)
                     # TODO: to be more robust, add cases for when state is other than online or offline
                 else:
-                    logger.debug('Resource({}) Unable to start, waiting for parents '
-                                 'to become online'.format(child.name))
+                    logger.debug('Resource(%s) Unable to start, waiting for parents to become online', child.name)
 
 
 class ResourceStartingEvent(ResourceStateEvent):
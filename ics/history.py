@@ -0,0 +1,138 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+ALERT_TIME_FORMAT = '%m/%d/%Y %H:%M:%S'
+
+_schema = [
+    '''CREATE TABLE IF NOT EXISTS alerts (
+        id INTEGER PRIMARY KEY,
+        timestamp REAL NOT NULL,
+        time TEXT NOT NULL,
+        level INTEGER NOT NULL,
+        node TEXT,
+        group_name TEXT,
+        resource TEXT,
+        msg TEXT
+    )''',
+    'CREATE INDEX IF NOT EXISTS alerts_timestamp ON alerts (timestamp)',
+    'CREATE INDEX IF NOT EXISTS alerts_resource ON alerts (resource, timestamp)',
+    'CREATE INDEX IF NOT EXISTS alerts_group ON alerts (group_name, timestamp)'
+]
+
+
+def alert_timestamp(alert_time):
+    """Convert alert time to a timestamp.
+
+    Args:
+        alert_time (str): Alert time.
+
+    Returns:
+        float: Seconds since epoch, current time if alert time is invalid.
+
+    """
+    try:
+        return time.mktime(datetime.strptime(alert_time, ALERT_TIME_FORMAT).timetuple())
+    except (TypeError, ValueError):
+        return time.time()
+
+
+class AlertHistory:
+    """Indexed alert history stored in a SQLite database.
+
+    Each thread uses its own database connection, as SQLite connections can not be shared between threads.
+
+    Attributes:
+        db_file (str): Database filename.
+
+    """
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self._local = threading.local()
+        db_dir = os.path.dirname(db_file)
+        if db_dir and not os.path.isdir(db_dir):
+            os.makedirs(db_dir)
+        conn = self.conn()
+        conn.execute('PRAGMA journal_mode=WAL')  # Allow queries while alerts are written
+        with conn:
+            for statement in _schema:
+                conn.execute(statement)
+
+    def conn(self):
+        """Get database connection of the calling thread.
+
+        Returns:
+            obj: SQLite connection.
+
+        """
+        if not hasattr(self._local, 'conn'):
+            self._local.conn = sqlite3.connect(self.db_file)
+        return self._local.conn
+
+    def add(self, alert_dicts):
+        """Store alerts in a single transaction.
+
+        Args:
+            alert_dicts (list): Alerts in dict format.
+
+        """
+        rows = [(alert_timestamp(alert_dict['time']), alert_dict['time'], alert_dict['level'], alert_dict['node'],
+                 alert_dict['group'], alert_dict['resource'], alert_dict['msg']) for alert_dict in alert_dicts]
+        conn = self.conn()
+        with conn:
+            conn.executemany('INSERT INTO alerts (timestamp, time, level, node, group_name, resource, msg) '
+                             'VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def prune(self, before):
+        """Remove alerts older than a timestamp.
+
+        Args:
+            before (float): Alerts before this timestamp are removed.
+
+        Returns:
+            int: Number of alerts removed.
+
+        """
+        conn = self.conn()
+        with conn:
+            return conn.execute('DELETE FROM alerts WHERE timestamp < ?', (before,)).rowcount
+
+    def query(self, resource=None, group=None, since=None, limit=1000):
+        """Find alerts, newest alerts are returned first.
+
+        Args:
+            resource (str, opt): Resource name.
+            group (str, opt): Group name.
+            since (float, opt): Only alerts at or after this timestamp.
+            limit (int, opt): Maximum number of alerts.
+
+        Returns:
+            list: Alerts in dict format.
+
+        """
+        conditions = []
+        params = []
+        if resource is not None:
+            conditions.append('resource = ?')
+            params.append(resource)
+        if group is not None:
+            conditions.append('group_name = ?')
+            params.append(group)
+        if since is not None:
+            conditions.append('timestamp >= ?')
+            params.append(since)
+
+        sql = 'SELECT time, level, node, group_name, resource, msg FROM alerts'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY timestamp DESC, id DESC LIMIT ?'
+        params.append(limit)
+
+        return [{'time': row[0], 'level': row[1], 'node': row[2], 'group': row[3], 'resource': row[4], 'msg': row[5]}
+                for row in self.conn().execute(sql, params)]
@@ -4,12 +4,13 @@ import socket
 import sys
 import threading
 
-import Pyro4 as Pyro
-
 from ics.alerts import AlertHandler
 from ics.environment import ICS_ALERT_PORT
+from ics.environment import ICS_ALERT_UDS_FILE
+from ics.environment import ICS_ALERT_WORKERS
 from ics.environment import ICS_LOG
 from ics.utils import ics_version
+from ics.utils import serve
 
 if not os.path.isdir(ICS_LOG):
     try:
@@ -45,22 +46,27 @@ logging.getLogger("Pyro4.core").setLevel(logging.INFO)
 
 alert_handler = AlertHandler()
 
-# Start alert handler thread
-logger.info('Starting alert handler...')
-thread_alert_handler = threading.Thread(name='alert handler', target=alert_handler.run)
-thread_alert_handler.daemon = True
-thread_alert_handler.start()
+# Start alert history writer thread
+thread_history_writer = threading.Thread(name='alert history writer', target=alert_handler.history_writer)
+thread_history_writer.daemon = True
+thread_history_writer.start()
+
+# Start alert handler threads
+logger.info('Starting {} alert handler workers...'.format(ICS_ALERT_WORKERS))
+for worker in range(ICS_ALERT_WORKERS):
+    thread_alert_handler = threading.Thread(name='alert handler {}'.format(worker), target=alert_handler.run)
+    thread_alert_handler.daemon = True
+    thread_alert_handler.start()
 
-logger.info("Starting Pyro on port " + str(ICS_ALERT_PORT))
+logger.info("Starting Pyro on port {} and socket {}".format(ICS_ALERT_PORT, ICS_ALERT_UDS_FILE))
 
-Pyro.Daemon.serveSimple(
+serve(
     {
         alert_handler: 'alert_handler'
     },
-    port=ICS_ALERT_PORT,
     host=socket.gethostname(),
-    ns=False,
-    verbose=False)
+    port=ICS_ALERT_PORT,
+    uds_file=ICS_ALERT_UDS_FILE)
 
 
 
@@ -5,10 +5,9 @@ import signal
 import socket
 import sys
 
-import Pyro4 as Pyro
-
 from environment import ICS_ENGINE_PORT
 from environment import ICS_LOG
+from environment import ICS_UDS_FILE
 from ics import utils
 from system import NodeSystem
 
@@ -66,14 +65,13 @@ signal.signal(signal.SIGTERM, signal_handler)
 
 system.startup()
 
-logger.info("Starting Pyro on port " + str(ICS_ENGINE_PORT))
+logger.info("Starting Pyro on port {} and socket {}".format(ICS_ENGINE_PORT, ICS_UDS_FILE))
 
-Pyro.Daemon.serveSimple(
+utils.serve(
     {
         system: 'system'
     },
-    port=ICS_ENGINE_PORT,
     host=socket.gethostname(),
-    ns=False,
-    verbose=False)
+    port=ICS_ENGINE_PORT,
+    uds_file=ICS_UDS_FILE)
 
@@ -0,0 +1,168 @@
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class ConfigJournal:
+    """Append-only log of config changes.
+
+    Each change is appended as a JSON line and synced to disk as it is made, so no change is lost when the engine
+    stops before the config file is written. Records hold the complete new value of what changed, so replaying records
+    which are already included in the config file gives the same result.
+
+    When the config is compacted the journal is rotated to a separate file, so changes made while the config file is
+    written go to a new journal. The rotated journal is removed once the config file has been written.
+
+    Attributes:
+        filename (str): Journal filename.
+        rotated_filename (str): Filename of journal being compacted.
+        count (int): Number of records in the journal.
+        compact_size (int): Number of records after which compaction is requested.
+        compact_event (obj): Set when the journal has reached compact_size records.
+
+    """
+
+    def __init__(self, filename, compact_size=1000):
+        self.filename = filename
+        self.rotated_filename = filename + '.rotated'
+        self.compact_size = compact_size
+        self.compact_event = threading.Event()
+        self.truncate_partial()
+        self.count = len(self.read(filename))
+        self._file = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def truncate_partial(self):
+        """Remove a partially written last record, so new records do not continue it."""
+        if not os.path.isfile(self.filename):
+            return
+        with open(self.filename, 'rb+') as f:
+            data = f.read()
+            if data and not data.endswith(b'\n'):
+                logger.warning('Removing partially written record from config journal ' + self.filename)
+                f.truncate(data.rfind(b'\n') + 1)
+
+    @staticmethod
+    def read(filename):
+        """Read records from a journal file.
+
+        Args:
+            filename (str): Journal filename.
+
+        Returns:
+            list: Records, oldest first. A partially written last record is skipped.
+
+        """
+        records = []
+        if not os.path.isfile(filename):
+            return records
+        with open(filename, 'r') as f:
+            for line_number, line in enumerate(f, 1):
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    logger.warning('Skipping invalid record {} in config journal {}'.format(line_number, filename))
+        return records
+
+    def records(self):
+        """Read all records which have not been compacted.
+
+        Returns:
+            list: Records, oldest first.
+
+        """
+        return self.read(self.rotated_filename) + self.read(self.filename)
+
+    def append(self, records):
+        """Append records to the journal.
+
+        Within a batch() the records are written when the batch ends.
+
+        Args:
+            records (list): Records which can be serialized as JSON.
+
+        """
+        batch = getattr(self._local, 'batch', None)
+        if batch is not None:
+            batch.extend(records)
+        else:
+            self.write(records)
+
+    def write(self, records):
+        """Write records to the journal file and sync them to disk.
+
+        Args:
+            records (list): Records which can be serialized as JSON.
+
+        """
+        if not records:
+            return
+        data = ''.join(json.dumps(record) + '\n' for record in records)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.filename, 'a')
+            self._file.write(data)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.count += len(records)
+        if self.count >= self.compact_size:
+            self.compact_event.set()
+
+    @contextmanager
+    def batch(self):
+        """Collect records appended by the calling thread and write them together, with a single sync."""
+        if getattr(self._local, 'batch', None) is not None:
+            yield  # Nested batch, written by outer batch
+            return
+        self._local.batch = []
+        try:
+            yield
+        finally:
+            records = self._local.batch
+            self._local.batch = None
+            self.write(records)
+
+    def rotate(self):
+        """Move records to the rotated journal before compaction.
+
+        When a previous compaction failed, the records are added to the rotated journal which still exists.
+
+        Returns:
+            bool: True if there are records to compact.
+
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if os.path.isfile(self.filename):
+                if os.path.isfile(self.rotated_filename):
+                    with open(self.filename, 'r') as src, open(self.rotated_filename, 'a') as dst:
+                        dst.write(src.read())
+                        dst.flush()
+                        os.fsync(dst.fileno())
+                    os.remove(self.filename)
+                else:
+                    os.replace(self.filename, self.rotated_filename)
+            self.count = 0
+            self.compact_event.clear()
+        return os.path.isfile(self.rotated_filename)
+
+    def remove_rotated(self):
+        """Remove rotated journal once its records are included in the config file."""
+        try:
+            os.remove(self.rotated_filename)
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        """Close journal file."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,31 @@
+CRITICAL = 40
+ERROR = 30
+WARNING = 20
+INFO = 10
+NOTSET = 0
+
+_level_names = {
+    CRITICAL: 'CRITICAL',
+    ERROR: 'ERROR',
+    WARNING: 'WARNING',
+    INFO: 'INFO',
+    NOTSET: 'NOTSET',
+    'CRITICAL': CRITICAL,
+    'ERROR': ERROR,
+    'WARNING': WARNING,
+    'INFO': INFO,
+    'NOTSET': NOTSET
+}
+
+
+def get_level_name(level):
+    """Return the string representation of an alert level.
+
+    Args:
+        level: Alert level
+
+    Returns:
+        Alert level name.
+
+    """
+    return _level_names[level]
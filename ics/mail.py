@@ -1,26 +1,100 @@
+import logging
 import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 
+logger = logging.getLogger(__name__)
 
-def send_html(recipient, sender, subject, html):
-    """Send HTML mail.
+
+def html_message(recipients, sender, subject, html):
+    """Create HTML mail message.
 
     Args:
-        recipient (str): Recipient address.
+        recipients (list): Recipient addresses.
         sender (str): Sender address.
         subject (str): Mail subject.
         html (str): Raw HTML to be sent.
 
+    Returns:
+        str: Mail message.
+
     """
     msg = MIMEMultipart('alternative')
     msg['Subject'] = subject
     msg['From'] = sender
-    msg['To'] = recipient
+    msg['To'] = ', '.join(recipients)
 
     part1 = MIMEText(html, 'html')
     msg.attach(part1)
+    return msg.as_string()
+
+
+def send_html(recipient, sender, subject, html):
+    """Send HTML mail.
+
+    Args:
+        recipient (str): Recipient address.
+        sender (str): Sender address.
+        subject (str): Mail subject.
+        html (str): Raw HTML to be sent.
 
+    """
     s = smtplib.SMTP('localhost')
-    s.sendmail(sender, recipient, msg.as_string())
+    s.sendmail(sender, recipient, html_message([recipient], sender, subject, html))
     s.quit()
+
+
+class SMTPConnection:
+    """SMTP connection which is kept open between messages.
+
+    The connection is opened when the first message is sent. When the server has closed the connection, for example
+    after an idle timeout, the connection is opened again and the message resent.
+
+    Attributes:
+        host (str): SMTP server host.
+        port (int): SMTP server port.
+        timeout (int): Socket timeout (in seconds).
+
+    """
+
+    def __init__(self, host='localhost', port=25, timeout=30):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.smtp = None
+
+    def connect(self):
+        """Open connection to SMTP server."""
+        logger.debug('Connecting to SMTP server {}:{}'.format(self.host, self.port))
+        self.smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+
+    def close(self):
+        """Close connection to SMTP server."""
+        if self.smtp is not None:
+            try:
+                self.smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                self.smtp.close()
+            self.smtp = None
+
+    def sendmail(self, sender, recipients, msg):
+        """Send message to all recipients in a single transaction.
+
+        Args:
+            sender (str): Sender address.
+            recipients (list): Recipient addresses.
+            msg (str): Mail message.
+
+        """
+        if self.smtp is None:
+            self.connect()
+        try:
+            self.smtp.sendmail(sender, recipients, msg)
+        except (smtplib.SMTPServerDisconnected, ConnectionResetError, BrokenPipeError):
+            logger.debug('SMTP server closed connection, reconnecting')
+            self.smtp = None
+            self.connect()
+            self.smtp.sendmail(sender, recipients, msg)
+        except smtplib.SMTPException:
+            self.close()  # Start next message on a new connection
+            raise
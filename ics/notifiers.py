@@ -0,0 +1,300 @@
+import json
+import logging
+import os
+import subprocess
+import threading
+import time
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue  # Python2 version
+
+try:
+    from urllib.request import Request, urlopen
+except ImportError:
+    from urllib2 import Request, urlopen  # Python2 version
+
+try:
+    import syslog
+except ImportError:
+    syslog = None  # Not available on Windows
+
+from ics import mail
+from ics.environment import HOSTNAME
+from ics.levels import CRITICAL, ERROR
+
+logger = logging.getLogger(__name__)
+
+
+class Notification:
+    """Alert notification shared by all notifiers.
+
+    The HTML body is rendered once and sent by every notifier which uses it.
+
+    Attributes:
+        alerts (list): Alerts in dict format.
+        subject (str): Notification subject.
+        html (str): Rendered HTML body.
+
+    """
+
+    def __init__(self, alerts, subject, html):
+        self.alerts = alerts
+        self.subject = subject
+        self.html = html
+
+
+class Notifier(object):
+    """Base class for alert notification channels.
+
+    Each notifier has its own bounded queue and worker threads, so a slow channel does not delay the other channels.
+    When the queue of a notifier is full, notify waits up to queue_timeout seconds for space, which slows down the alert
+    workers reading the spool, before the notification is dropped. A notification which can not be sent is retried
+    with an increasing delay before it fails. Subclasses implement send().
+
+    Attributes:
+        name (str): Notifier name.
+        workers (int): Number of worker threads.
+        retries (int): Number of times a failed notification is retried.
+        retry_delay (float): Delay (in seconds) before the first retry, doubled for every following retry.
+        queue_timeout (float): Maximum time (in seconds) notify waits for space in a full queue.
+        notify_queue (obj): Notifications waiting to be sent.
+        counters (dict): Notifier statistics.
+
+    """
+
+    name = None
+
+    def __init__(self, workers=1, queue_size=100, retries=3, retry_delay=1.0, queue_timeout=30):
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.notify_queue = queue.Queue(maxsize=queue_size)
+        self.counters = {
+            'sent': 0,
+            'failed': 0,
+            'dropped': 0,
+            'send_time': 0.0
+        }
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def configure(self, settings):
+        """Apply alert settings.
+
+        Args:
+            settings (dict): Alert setting attribute names and values.
+
+        """
+        pass
+
+    def send(self, notification):
+        """Send notification.
+
+        Args:
+            notification (obj): Notification object.
+
+        Raises:
+            Exception: When notification could not be sent.
+
+        """
+        raise NotImplementedError
+
+    def start(self):
+        """Start worker threads if they are not already running."""
+        with self._lock:
+            if self._threads:
+                return
+            for worker in range(self.workers):
+                thread = threading.Thread(name='{} notifier {}'.format(self.name, worker), target=self.run)
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+
+    def notify(self, notification, callback=None):
+        """Queue notification to be sent.
+
+        Args:
+            notification (obj): Notification object.
+            callback (func, opt): Called with True once the notification has been sent, or with False when it
+                failed or was dropped.
+
+        """
+        self.start()
+        try:
+            self.notify_queue.put((notification, callback), timeout=self.queue_timeout)
+        except queue.Full:
+            logger.error('{} notifier queue full, dropping notification: {}'.format(self.name, notification.subject))
+            with self._lock:
+                self.counters['dropped'] += 1
+            if callback is not None:
+                callback(False)
+
+    def wait(self):
+        """Wait until all queued notifications have been sent."""
+        self.notify_queue.join()
+
+    def stats(self):
+        """Notifier statistics.
+
+        Returns:
+            dict: Sent, failed and dropped notification counts, queue size and average send time (in seconds).
+
+        """
+        with self._lock:
+            data = dict(self.counters)
+        send_count = data['sent'] + data['failed']
+        data['queued'] = self.notify_queue.qsize()
+        data['send_time'] = data['send_time'] / send_count if send_count else 0.0
+        return data
+
+    def run(self):
+        """Continuously send notifications from the notifier queue."""
+        while True:
+            notification, callback = self.notify_queue.get()
+            result = 'failed'
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    time.sleep(self.retry_delay * 2 ** (attempt - 1))
+                start_time = time.time()
+                try:
+                    self.send(notification)
+                    result = 'sent'
+                except Exception as err:
+                    logger.error('{} notifier unable to send notification (attempt {} of {}): {}'.format(
+                        self.name, attempt + 1, self.retries + 1, err))
+                with self._lock:
+                    self.counters['send_time'] += time.time() - start_time
+                if result == 'sent':
+                    break
+            with self._lock:
+                self.counters[result] += 1
+
+            if callback is not None:
+                try:
+                    callback(result == 'sent')
+                except Exception as err:
+                    logger.exception('Unknown exception occurred: ' + str(err))
+            self.notify_queue.task_done()
+
+
+class MailNotifier(Notifier):
+    """Send notifications by mail to AlertRecipients.
+
+    Each worker keeps its own SMTP connection open and sends to all recipients in a single transaction.
+    """
+
+    name = 'mail'
+
+    def __init__(self, workers=2, queue_size=100, host='localhost', port=25, **kwargs):
+        super(MailNotifier, self).__init__(workers, queue_size, **kwargs)
+        self.host = host
+        self.port = port
+        self.recipients = []
+        self.sender = 'ics@' + HOSTNAME
+        self._local = threading.local()
+
+    def configure(self, settings):
+        if 'AlertRecipients' in settings:
+            self.recipients = list(settings['AlertRecipients'])
+
+    def send(self, notification):
+        recipients = self.recipients
+        if not recipients:
+            raise RuntimeError('alert recipient list is empty')
+        if not hasattr(self._local, 'connection'):
+            self._local.connection = mail.SMTPConnection(self.host, self.port)
+        logger.info('Sending mail to {}'.format(', '.join(recipients)))
+        self._local.connection.sendmail(self.sender, recipients,
+                                        mail.html_message(recipients, self.sender, notification.subject,
+                                                          notification.html))
+
+
+class SyslogNotifier(Notifier):
+    """Send notifications to the local syslog, one message per alert."""
+
+    name = 'syslog'
+
+    def send(self, notification):
+        if syslog is None:
+            raise RuntimeError('syslog is not available on this platform')
+        for alert_dict in notification.alerts:
+            priority = syslog.LOG_CRIT if alert_dict['level'] >= CRITICAL else \
+                syslog.LOG_ERR if alert_dict['level'] >= ERROR else syslog.LOG_WARNING
+            syslog.syslog(priority, 'ICS alert: {} {} {} "{}"'.format(alert_dict['node'], alert_dict['group'],
+                                                                     alert_dict['resource'], alert_dict['msg']))
+
+
+class WebhookNotifier(Notifier):
+    """Send notifications as JSON to the AlertWebhookURL with an HTTP POST."""
+
+    name = 'webhook'
+
+    def __init__(self, workers=1, queue_size=100, timeout=10, **kwargs):
+        super(WebhookNotifier, self).__init__(workers, queue_size, **kwargs)
+        self.url = ''
+        self.timeout = timeout
+
+    def configure(self, settings):
+        if 'AlertWebhookURL' in settings:
+            self.url = settings['AlertWebhookURL']
+
+    def send(self, notification):
+        if not self.url:
+            raise RuntimeError('AlertWebhookURL is not set')
+        data = json.dumps({'subject': notification.subject, 'alerts': notification.alerts}).encode('utf-8')
+        request = Request(self.url, data=data, headers={'Content-Type': 'application/json'})
+        response = urlopen(request, timeout=self.timeout)
+        response.read()
+        response.close()
+
+
+class ScriptNotifier(Notifier):
+    """Run the AlertScript for every notification.
+
+    The alerts are written as JSON to the standard input of the script, the subject is in ICS_ALERT_SUBJECT and the
+    number of alerts in ICS_ALERT_COUNT.
+    """
+
+    name = 'script'
+
+    def __init__(self, workers=1, queue_size=100, timeout=60, **kwargs):
+        super(ScriptNotifier, self).__init__(workers, queue_size, **kwargs)
+        self.script = ''
+        self.timeout = timeout
+
+    def configure(self, settings):
+        if 'AlertScript' in settings:
+            self.script = settings['AlertScript']
+
+    def send(self, notification):
+        if not self.script:
+            raise RuntimeError('AlertScript is not set')
+        env = dict(os.environ)
+        env['ICS_ALERT_SUBJECT'] = notification.subject
+        env['ICS_ALERT_COUNT'] = str(len(notification.alerts))
+        process = subprocess.run(self.script, shell=True, env=env, input=json.dumps(notification.alerts).encode(),
+                                 stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=self.timeout)
+        if process.returncode != 0:
+            raise RuntimeError('Alert script exited with {}: {}'.format(process.returncode,
+                                                                       process.stderr.decode().strip()))
+
+
+notifier_types = {
+    MailNotifier.name: MailNotifier,
+    SyslogNotifier.name: SyslogNotifier,
+    WebhookNotifier.name: WebhookNotifier,
+    ScriptNotifier.name: ScriptNotifier
+}
+
+
+def register_notifier(notifier_class):
+    """Register a notifier type so it can be enabled with the AlertNotifiers system attribute.
+
+    Args:
+        notifier_class (class): Notifier subclass with a unique name.
+
+    """
+    notifier_types[notifier_class.name] = notifier_class
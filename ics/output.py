@@ -0,0 +1,289 @@
+import logging
+import os
+import selectors
+import subprocess
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue  # Python2 version
+
+from ics.environment import ICS_RES_OUTPUT
+from ics.utils import resource_log_name
+
+logger = logging.getLogger(__name__)
+
+
+class OutputBuffer:
+    """Ring buffer holding the most recent output lines of a resource.
+
+    Attributes:
+        max_size (int): Maximum size (in bytes) of buffered lines.
+        lines (obj): Buffered lines, oldest first.
+        size (int): Size (in bytes) of buffered lines.
+
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.lines = deque()
+        self.size = 0
+
+    def append(self, line):
+        """Add line, removing the oldest lines when the buffer is full.
+
+        Args:
+            line (str): Output line.
+
+        """
+        self.lines.append(line)
+        self.size += len(line)
+        while self.size > self.max_size and len(self.lines) > 1:
+            self.size -= len(self.lines.popleft())
+
+
+class OutputCapture:
+    """Capture resource command output.
+
+    A single writer thread reads the output of all running resource commands. Output lines are tagged with the time,
+    resource name, command type and stream, kept in a ring buffer per resource and written to the resource log in
+    batches.
+
+    Output of monitor commands is read through pipes. Start and stop commands can leave a daemon running which keeps
+    their stdout and stderr open, so they are detached: they run in a new session and write to output files of the
+    resource in the output directory, which are read until the command exits. A daemon can keep writing to these files
+    after the engine has stopped reading them or has restarted, where it would fail writing to a pipe. The output files
+    are emptied each time the command runs again.
+
+    Attributes:
+        buffer_size (int): Size (in bytes) of output kept in memory for each resource.
+        write_interval (float): Maximum time (in seconds) output waits before it is written to the resource log.
+        output_dir (str): Directory of the output files of detached commands.
+        buffers (dict): Output buffer for each resource name.
+
+    """
+
+    def __init__(self, buffer_size=16 * 1024, write_interval=1.0, output_dir=ICS_RES_OUTPUT):
+        self.buffer_size = buffer_size
+        self.write_interval = write_interval
+        self.output_dir = output_dir
+        self.buffers = {}
+        self._new_pipes = queue.Queue()
+        self._files = []
+        self._pending_lines = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._wakeup_read, self._wakeup_write = os.pipe()
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._wakeup_read, selectors.EVENT_READ, None)
+
+    def start(self):
+        """Start writer thread if it is not already running."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(name='output capture', target=self.writer_wrapper)
+                self._thread.daemon = True
+                self._thread.start()
+
+    def run(self, resource_name, cmd_type, cmd, detach=False):
+        """Run a resource command and capture its output.
+
+        Args:
+            resource_name (str): Resource name.
+            cmd_type (str): Command type.
+            cmd (list): Command line.
+            detach (bool, opt): Run command in a new session with its output written to output files instead of
+                pipes.
+
+        Returns:
+            obj: Popen object of the command.
+
+        """
+        if not detach:
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True)
+            self.add(resource_name, cmd_type, process)
+            return process
+
+        fds = []
+        readers = []
+        try:
+            if not os.path.isdir(self.output_dir):
+                os.makedirs(self.output_dir)
+            for stream_name in ['stdout', 'stderr']:
+                filename = self.output_file(resource_name, cmd_type, stream_name)
+                fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+                fds.append(fd)
+                os.ftruncate(fd, 0)  # Replace output of the previous run
+                readers.append(open(filename, 'rb'))
+            process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=fds[0], stderr=fds[1], close_fds=True,
+                                       start_new_session=True)
+        except Exception:
+            for reader in readers:
+                reader.close()
+            raise
+        finally:
+            for fd in fds:
+                os.close(fd)
+
+        self.start()
+        with self._lock:
+            for stream_name, reader in zip(['stdout', 'stderr'], readers):
+                self._files.append([reader, (resource_name, cmd_type, stream_name), b'', process])
+        return process
+
+    def output_file(self, resource_name, cmd_type, stream_name):
+        """Get file name of the output file of a detached command.
+
+        Args:
+            resource_name (str): Resource name.
+            cmd_type (str): Command type.
+            stream_name (str): Stream name, stdout or stderr.
+
+        Returns:
+            str: Output file name.
+
+        """
+        return os.path.join(self.output_dir, '{}.{}.{}'.format(resource_name, cmd_type, stream_name))
+
+    def add(self, resource_name, cmd_type, process):
+        """Capture the stdout and stderr pipes of a resource command.
+
+        Args:
+            resource_name (str): Resource name.
+            cmd_type (str): Command type.
+            process (obj): Process started with stdout and stderr pipes.
+
+        """
+        self.start()
+        for stream_name, stream in [('stdout', process.stdout), ('stderr', process.stderr)]:
+            if stream is not None:
+                self._new_pipes.put((stream, (resource_name, cmd_type, stream_name)))
+        os.write(self._wakeup_write, b'\0')
+
+    def output(self, resource_name):
+        """Get buffered output of a resource.
+
+        Args:
+            resource_name (str): Resource name.
+
+        Returns:
+            list: Output lines, oldest first.
+
+        """
+        with self._lock:
+            if resource_name not in self.buffers:
+                return []
+            return list(self.buffers[resource_name].lines)
+
+    def remove(self, resource_name):
+        """Remove buffered output of a resource.
+
+        Args:
+            resource_name (str): Resource name.
+
+        """
+        with self._lock:
+            self.buffers.pop(resource_name, None)
+
+    def add_line(self, tag, text):
+        """Tag output line and add it to the resource buffer and pending resource log lines.
+
+        Args:
+            tag (tuple): Resource name, command type and stream name.
+            text (str): Output line without line ending.
+
+        """
+        resource_name, cmd_type, stream_name = tag
+        line = '{} {} {} {}: {}'.format(datetime.now().strftime('%Y-%m-%d %H:%M:%S'), resource_name, cmd_type,
+                                        stream_name, text)
+        with self._lock:
+            if resource_name not in self.buffers:
+                self.buffers[resource_name] = OutputBuffer(self.buffer_size)
+            self.buffers[resource_name].append(line)
+        self._pending_lines.append(line + '\n')
+
+    def write_pending(self):
+        """Write pending lines to the resource log."""
+        if not self._pending_lines:
+            return
+        try:
+            with open(resource_log_name(), 'a') as resource_log:
+                resource_log.write(''.join(self._pending_lines))
+        except IOError as err:
+            logger.error('Unable to write resource log, {} lines lost: {}'.format(len(self._pending_lines), err))
+        self._pending_lines = []
+
+    def read_pipe(self, key):
+        """Read available output from a pipe.
+
+        Args:
+            key (obj): Selector key of pipe.
+
+        """
+        stream = key.fileobj
+        tag, partial = key.data
+        data = os.read(stream.fileno(), 65536)
+        if data:
+            lines = (partial + data).split(b'\n')
+            key.data[1] = lines.pop()
+            for line in lines:
+                self.add_line(tag, line.decode(errors='replace').rstrip('\r'))
+        else:
+            # End of output, command has exited
+            if partial:
+                self.add_line(tag, partial.decode(errors='replace').rstrip('\r'))
+            self._selector.unregister(stream)
+            stream.close()
+
+    def read_files(self):
+        """Read new output from the output files of detached commands, closing the files once the command exited."""
+        with self._lock:
+            entries = list(self._files)
+        for entry in entries:
+            reader, tag, partial, process = entry
+            exited = process.poll() is not None
+            data = reader.read()
+            if data:
+                lines = (partial + data).split(b'\n')
+                entry[2] = lines.pop()
+                for line in lines:
+                    self.add_line(tag, line.decode(errors='replace').rstrip('\r'))
+            if exited:
+                if entry[2]:
+                    self.add_line(tag, entry[2].decode(errors='replace').rstrip('\r'))
+                reader.close()
+                with self._lock:
+                    self._files.remove(entry)
+
+    def writer(self):
+        """Continuously read command output and write it to the resource log."""
+        last_write = time.time()
+        while True:
+            for key, _ in self._selector.select(timeout=self.write_interval):
+                if key.fileobj == self._wakeup_read:
+                    os.read(self._wakeup_read, 4096)
+                    while not self._new_pipes.empty():
+                        stream, tag = self._new_pipes.get()
+                        self._selector.register(stream, selectors.EVENT_READ, [tag, b''])
+                else:
+                    self.read_pipe(key)
+
+            if time.time() - last_write >= self.write_interval:
+                self.read_files()
+                self.write_pending()
+                last_write = time.time()
+
+    def writer_wrapper(self):
+        while True:
+            try:
+                self.writer()
+            except Exception:
+                logger.exception('Exception occurred in output capture, will be restarted in 1 second.')
+                time.sleep(1)
+
+
+output_capture = OutputCapture()
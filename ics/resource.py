@@ -1,33 +1,35 @@
 import logging
 import random
-import subprocess
 import time
 
 from ics import events
-from ics.alerts import AlertClient
 from ics.attributes import AttributeObject, resource_attributes, group_attributes
 from ics.states import ResourceStates, GroupStates, ONLINE_STATES
-from ics.utils import resource_log_name
+from ics.output import output_capture
 
 logger = logging.getLogger(__name__)
 
-alert = AlertClient()
+alert = events.alert  # Share alert outbox with event handler
 
 
 class Resource(AttributeObject):
 
+    config_type = 'resources'
+
     def __init__(self, name, group_name, init_state=ResourceStates.UNKNOWN):
         super(Resource, self).__init__()
         self.init_attr(resource_attributes)
         self.name = name
         self.state = init_state
-        self.set_attr('Group', group_name)
+        self.load_attr({'Group': group_name})
         self.last_poll = int(time.time()) - random.randint(0, 60)  # Set at random times to prevent poll clustering
         self.poll_running = False
         self.fault_count = 0
         self.parents = []
         self.children = []
+        self.links_seq = 0
         self.propagate = False
+        self.provisional = False
         self.cmd_process = None
         self.cmd_type = None
         self.cmd_end_time = -1
@@ -60,7 +62,7 @@ class Resource(AttributeObject):
 
         if self.attr_value('Enabled') == 'false' or self.attr_value('MonitorOnly') == 'true':
             self.state = ResourceStates.OFFLINE  # Set resource offline regardless of current state
-            logger.info('Resource({}) Unable to change state, resource is disabled'.format(self.name))
+            logger.info('Resource(%s) Unable to change state, resource is disabled', self.name)
 
             # When a resource is disabled, no state change will occur. However, subsequent event will be triggered to
             # act as a pass though in order to facilitate propagation.
@@ -79,7 +81,7 @@ class Resource(AttributeObject):
         else:
             self.state = new_state
             event_class = self.event_map[new_state]
-            logger.info('Resource({}) Changing state from {} to {}'.format(self.name, cur_state, new_state))
+            logger.info('Resource(%s) Changing state from %s to %s', self.name, cur_state, new_state)
 
         events.trigger_event(event_class(self, cur_state))
 
@@ -113,6 +115,10 @@ class Resource(AttributeObject):
             deps_list.append(parent.name)
         return deps_list
 
+    def links_changed(self):
+        """Record a change to the dependencies of the resource with a change sequence number."""
+        self.links_seq = self.mark_changed()
+
     def add_child(self, resource):
         """Add child dependency link to resource.
 
@@ -139,18 +145,18 @@ class Resource(AttributeObject):
 
         """
         for parent in self.parents:
-            logger.debug('Resource({}) Verifying state of {}'.format(self.name, parent.name))
+            logger.debug('Resource(%s) Verifying state of %s', self.name, parent.name)
             state = parent.state
 
             if parent.attr_value('Enabled') == 'false':
-                logger.debug('Resource({}) Found {} to be disabled, skipping'.format(self.name, parent.name))
+                logger.debug('Resource(%s) Found %s to be disabled, skipping', self.name, parent.name)
                 continue
             elif parent.attr_value('MonitorOnly') == 'true':
-                logger.debug('Resource({}) Found {} to be in monitory only, skipping'.format(self.name, parent.name))
+                logger.debug('Resource(%s) Found %s to be in monitory only, skipping', self.name, parent.name)
                 continue
             elif state is not ResourceStates.ONLINE:
-                logger.debug('Resource({}) Found {} in state {} '
-                             'not to be online unable to start yet'.format(self.name, parent.name, state))
+                logger.debug('Resource(%s) Found %s in state %s not to be online unable to start yet',
+                             self.name, parent.name, state)
                 return False
 
         return True
@@ -163,18 +169,18 @@ class Resource(AttributeObject):
 
         """
         for child in self.children:
-            logger.debug('Resource({}) Verifying state of {}'.format(self.name, child.name))
+            logger.debug('Resource(%s) Verifying state of %s', self.name, child.name)
             state = child.state
 
             if child.attr_value('Enabled') == 'false':
-                logger.debug('Resource({}) Found {} to be disabled, skipping'.format(self.name, child.name))
+                logger.debug('Resource(%s) Found %s to be disabled, skipping', self.name, child.name)
                 continue
             elif child.attr_value('MonitorOnly') == 'true':
-                logger.debug('Resource({}) Found {} to be in monitory only, skipping'.format(self.name, child.name))
+                logger.debug('Resource(%s) Found %s to be in monitory only, skipping', self.name, child.name)
                 continue
             elif state is not ResourceStates.OFFLINE:
-                logger.debug('Resource({}) Found {} in state {} '
-                             'not to be offline unable to start yet'.format(self.name, child.name, state))
+                logger.debug('Resource(%s) Found %s in state %s not to be offline unable to start yet',
+                             self.name, child.name, state)
                 return False
 
         return True
@@ -189,7 +195,7 @@ class Resource(AttributeObject):
 
         if cur_time - self.last_poll >= poll_interval and not self.poll_running:
             self.poll_running = True
-            logger.debug('Resource({}) ready for interval monitoring poll'.format(self.name))
+            logger.debug('Resource(%s) ready for interval monitoring poll', self.name)
             self.probe()
 
     def _reset_cmd(self):
@@ -209,14 +215,12 @@ class Resource(AttributeObject):
 
         """
         try:
-            logger.debug('Resource({}) running command: {}'.format(self.name, ' '.join(cmd)))
-            resource_log = resource_log_name()
-            self.cmd_process = subprocess.Popen(cmd,
-                                                stdout=open(resource_log, 'a'),
-                                                stderr=open(resource_log, 'a'),
-                                                close_fds=True)
+            logger.debug('Resource(%s) running command: %s', self.name, ' '.join(cmd))
+            # Start and stop commands are detached, they can leave a daemon running after the engine restarts
+            process = output_capture.run(self.name, cmd_type, cmd, detach=cmd_type != 'poll')
             self.cmd_end_time = int(time.time()) + timeout
             self.cmd_type = cmd_type
+            self.cmd_process = process  # Set last, poll updater checks commands with a process
         except IndexError:
             logger.error('Resource({}) unable to run command, no command given'.format(self.name))
             self._reset_cmd()
@@ -242,7 +246,7 @@ class Resource(AttributeObject):
         """
         if self.cmd_process is not None:
             if self.cmd_process.poll() is not None:
-                logger.debug('Resource({}) {} command returned'.format(self.name, self.cmd_type))
+                logger.debug('Resource(%s) %s command returned', self.name, self.cmd_type)
                 self.cmd_exit_code = self.cmd_process.poll()
                 return True
             elif int(time.time()) >= self.cmd_end_time:
@@ -268,14 +272,14 @@ class Resource(AttributeObject):
                 logger.warning('Resource({}) error occurred when running {} '
                                'command, return code {}'.format(self.name, self.cmd_type, self.cmd_exit_code))
             else:
-                logger.debug('Resource({}) command {} ran successfully'.format(self.name, self.cmd_type))
+                logger.debug('Resource(%s) command %s ran successfully', self.name, self.cmd_type)
             events.trigger_event(events.PollRunEvent(self))
         elif self.cmd_type == 'poll':
             if self.cmd_exit_code == 110:
-                logger.debug('Resource({}) poll command found resource to be online'.format(self.name))
+                logger.debug('Resource(%s) poll command found resource to be online', self.name)
                 event_class = self.poll_event_map[self.cmd_exit_code]
             elif self.cmd_exit_code == 100:
-                logger.debug('Resource({}) poll command found resource to be offline'.format(self.name))
+                logger.debug('Resource(%s) poll command found resource to be offline', self.name)
                 event_class = self.poll_event_map[self.cmd_exit_code]
             else:
                 logger.warning('Resource({}) error occurred when polling '
@@ -284,6 +288,7 @@ class Resource(AttributeObject):
 
             self.reset_poll_counter()
             self.poll_running = False
+            self.provisional = False
             events.trigger_event(event_class(self))
         else:
             logger.error('Resource({}) received unknown command type: {}'.format(self.name, self.cmd_type))
@@ -314,14 +319,14 @@ class Resource(AttributeObject):
     def probe(self):
         """Generate a resource poll."""
         if self.attr_value('Enabled') == 'false':
-            logger.info('Resource({}) Unable to probe, resource is not enabled.'.format(self.name))
+            logger.info('Resource(%s) Unable to probe, resource is not enabled.', self.name)
         else:
             self.poll_running = True
             events.trigger_event(events.PollRunEvent(self))
 
     def start(self):
         """Run command to start resource."""
-        logger.info('Resource({}) running command to start resource'.format(self.name))
+        logger.info('Resource(%s) running command to start resource', self.name)
         cmd = self.attr_value('StartProgram').split()
         if not cmd:
             logger.error('Resource({}) unable to start, attribute StartProgram not set'.format(self.name))
@@ -332,7 +337,7 @@ class Resource(AttributeObject):
 
     def stop(self):
         """Run command to stop resource."""
-        logger.info('Resource({}) running command to stop resource'.format(self.name))
+        logger.info('Resource(%s) running command to stop resource', self.name)
         cmd = self.attr_value('StopProgram').split()
         if not cmd:
             logger.error('Resource({}) unable to start, attribute StopProgram not set'.format(self.name))
@@ -343,7 +348,7 @@ class Resource(AttributeObject):
 
     def poll(self):
         """Run command to poll resource."""
-        logger.debug('Resource({}) running command to poll resource'.format(self.name))
+        logger.debug('Resource(%s) running command to poll resource', self.name)
         cmd = self.attr_value('MonitorProgram').split()
         if not cmd:
             logger.error('Resource({}) unable to monitor, attribute MonitorProgram not set'.format(self.name))
@@ -360,6 +365,8 @@ class Resource(AttributeObject):
 
 class Group(AttributeObject):
 
+    config_type = 'groups'
+
     def __init__(self, name):
         super(Group, self).__init__()
         self.init_attr(group_attributes)
@@ -419,6 +426,27 @@ class Group(AttributeObject):
 
         return total_load
 
+    def dependency_order(self):
+        """Group resources ordered by dependency, each resource after all of its parents.
+
+        Resources without parents come first, in member order. Resources in a dependency cycle are added last.
+
+        Returns:
+            list: Resource objects.
+
+        """
+        remaining = {resource: len(resource.parents) for resource in self.members}
+        ordered = [resource for resource in self.members if not resource.parents]
+        for resource in ordered:  # Extended while iterating
+            for child in resource.children:
+                if child in remaining:
+                    remaining[child] -= 1
+                    if remaining[child] == 0:
+                        ordered.append(child)
+        if len(ordered) < len(self.members):
+            ordered.extend(resource for resource in self.members if remaining[resource] > 0)
+        return ordered
+
     def add_resource(self, resource):
         """Add group resource.
 
@@ -0,0 +1,196 @@
+import gzip
+import hashlib
+import logging
+import os
+import re
+import shutil
+import time
+
+logger = logging.getLogger(__name__)
+
+LOG_SUFFIX = r'\d{4}-\d{2}-\d{2}_\d{2}'  # Hourly log files, see utils.resource_log_name
+BACKUP_SUFFIX = r'\d{6}_\d{6}'  # Config backups, see NodeSystem.backup_config
+
+
+def open_file(filename):
+    """Open file for reading, decompressing gzip files.
+
+    Args:
+        filename (str): Filename.
+
+    Returns:
+        obj: Binary file object.
+
+    """
+    if filename.endswith('.gz'):
+        return gzip.open(filename, 'rb')
+    return open(filename, 'rb')
+
+
+def file_hash(filename):
+    """Hash of the (decompressed) file content.
+
+    Args:
+        filename (str): Filename.
+
+    Returns:
+        str: SHA-256 hex digest.
+
+    """
+    digest = hashlib.sha256()
+    with open_file(filename) as f:
+        for block in iter(lambda: f.read(65536), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def compress_file(filename):
+    """Compress file with gzip, keeping its modification time.
+
+    The compressed file is written to a temporary file and renamed before the original is removed, so either the
+    original or the complete compressed file always exists.
+
+    Args:
+        filename (str): Filename.
+
+    Returns:
+        str: Compressed filename.
+
+    """
+    gz_filename = filename + '.gz'
+    tmp_filename = gz_filename + '.tmp'
+    stat = os.stat(filename)
+    with open(filename, 'rb') as src, gzip.open(tmp_filename, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.utime(tmp_filename, (stat.st_atime, stat.st_mtime))
+    os.replace(tmp_filename, gz_filename)
+    os.remove(filename)
+    return gz_filename
+
+
+class RetentionPolicy:
+    """Retention of timestamped files, such as hourly logs and config backups.
+
+    Files are named base_name + '.' + timestamp, optionally followed by '.gz'. Timestamps sort in time order, so the
+    oldest files are removed first. A limit of 0 disables that limit.
+
+    Attributes:
+        base_name (str): Path of the files without the timestamp suffix.
+        suffix (str): Regular expression matching the timestamp suffix.
+        max_count (int): Maximum number of files kept.
+        max_age (int): Maximum age (in seconds) of files kept.
+        max_size (int): Maximum total size (in bytes) of files kept.
+        compress (bool): Compress files which are no longer written to.
+        dedupe (bool): Remove files with the same content as the previous file.
+        idle_time (int): Time (in seconds) since the last change before a file is compressed.
+        active (func): Returns the name of the file currently written to, which is never removed or compressed.
+
+    """
+
+    def __init__(self, base_name, suffix, max_count=0, max_age=0, max_size=0, compress=True, dedupe=False,
+                 idle_time=60, active=None):
+        self.base_name = base_name
+        self.suffix = suffix
+        self.max_count = max_count
+        self.max_age = max_age
+        self.max_size = max_size
+        self.compress = compress
+        self.dedupe = dedupe
+        self.idle_time = idle_time
+        self.active = active
+        self._pattern = re.compile(re.escape(os.path.basename(base_name)) + r'\.' + suffix + r'(\.gz)?$')
+
+    def files(self):
+        """Find files covered by the policy.
+
+        Returns:
+            list: Filenames, oldest first.
+
+        """
+        directory = os.path.dirname(self.base_name) or '.'
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return []
+        filenames = [os.path.join(directory, name) for name in names if self._pattern.match(name)]
+        return sorted(filenames, key=lambda filename: filename[:-3] if filename.endswith('.gz') else filename)
+
+    def latest(self):
+        """Newest file covered by the policy.
+
+        Returns:
+            str: Filename or None if there are no files.
+
+        """
+        filenames = self.files()
+        return filenames[-1] if filenames else None
+
+    def remove(self, filename, reason):
+        logger.info('Removing {} ({})'.format(filename, reason))
+        try:
+            os.remove(filename)
+        except FileNotFoundError:
+            pass
+
+    def apply(self, now=None):
+        """Remove and compress files according to the policy.
+
+        Args:
+            now (float, opt): Current time, used for testing.
+
+        Returns:
+            dict: Number of files removed and compressed.
+
+        """
+        now = time.time() if now is None else now
+        active = self.active() if self.active is not None else None
+        result = {'removed': 0, 'compressed': 0}
+
+        files = []
+        for filename in self.files():
+            if filename == active:
+                continue
+            try:
+                stat = os.stat(filename)
+            except FileNotFoundError:
+                continue
+            files.append([filename, stat.st_mtime, stat.st_size])
+
+        if self.dedupe:
+            previous_hash = None
+            for entry in list(files):
+                current_hash = file_hash(entry[0])
+                if current_hash == previous_hash:
+                    self.remove(entry[0], 'same content as previous file')
+                    files.remove(entry)
+                    result['removed'] += 1
+                previous_hash = current_hash
+
+        if self.max_age:
+            for entry in list(files):
+                if now - entry[1] > self.max_age:
+                    self.remove(entry[0], 'older than {} seconds'.format(self.max_age))
+                    files.remove(entry)
+                    result['removed'] += 1
+
+        if self.max_count:
+            while len(files) > self.max_count:
+                self.remove(files.pop(0)[0], 'more than {} files'.format(self.max_count))
+                result['removed'] += 1
+
+        if self.max_size:
+            total_size = sum(entry[2] for entry in files)
+            while files and total_size > self.max_size:
+                filename, _, size = files.pop(0)
+                self.remove(filename, 'more than {} bytes'.format(self.max_size))
+                total_size -= size
+                result['removed'] += 1
+
+        if self.compress:
+            for filename, mtime, _ in files:
+                if not filename.endswith('.gz') and now - mtime >= self.idle_time:
+                    logger.debug('Compressing {}'.format(filename))
+                    compress_file(filename)
+                    result['compressed'] += 1
+
+        return result
@@ -0,0 +1,243 @@
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PREFIX = 'segment-'
+ACK_FILE = 'ack'
+
+
+class Spool:
+    """Persistent append-only record spool.
+
+    Records are appended as JSON lines to segment files in the spool directory. Consumers read records with get() and
+    acknowledge them with ack() once they have been processed. The acknowledgement offset is the position of the oldest
+    record that has not been acknowledged, it is stored in the ack file so unacknowledged records are delivered again
+    after a restart. Segments before the acknowledgement offset are removed.
+
+    The ack file is saved after ack_batch acknowledgements, after ack_interval seconds or when no record is available,
+    not for every acknowledgement. Records acknowledged after the last save are delivered again after a crash.
+
+    Attributes:
+        directory(str): Spool directory.
+        segment_size(int): Size (in bytes) after which a new segment is started.
+        write_segment(int): Segment number records are appended to.
+        read_segment(int): Segment number of next record to read.
+        read_offset(int): Offset in read segment of next record to read.
+        pending(set): Positions (segment, offset) of records that have been read but not acknowledged.
+        ack_position(tuple): Position (segment, offset) of oldest record that has not been acknowledged.
+        saved_position(tuple): Acknowledgement position stored in the ack file.
+        ack_batch(int): Number of acknowledgements after which the ack file is saved.
+        ack_interval(float): Time (in seconds) after which acknowledgements are saved.
+
+    """
+
+    def __init__(self, directory, segment_size=1024 * 1024, ack_batch=100, ack_interval=1.0):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.ack_batch = ack_batch
+        self.ack_interval = ack_interval
+        self.ack_count = 0
+        self.ack_time = time.time()
+        self.pending = set()
+        self.condition = threading.Condition()
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        segments = self.segments()
+        self.ack_position = self.load_ack() or ((segments[0], 0) if segments else (1, 0))
+        self.saved_position = self.ack_position
+        self.read_segment, self.read_offset = self.ack_position
+        # Always start a new segment so records are never appended after a partially written record
+        self.write_segment = max(segments + [self.read_segment]) + 1
+        self.write_size = 0
+        self.remove_segments()
+
+    def segment_file(self, segment):
+        """Get file name of segment.
+
+        Args:
+            segment (int): Segment number.
+
+        Returns:
+            str: Segment file name.
+
+        """
+        return os.path.join(self.directory, '{}{:010d}'.format(SEGMENT_PREFIX, segment))
+
+    def segments(self):
+        """Get segment numbers in spool directory.
+
+        Returns:
+            list: Sorted segment numbers.
+
+        """
+        segments = []
+        for file_name in os.listdir(self.directory):
+            if file_name.startswith(SEGMENT_PREFIX):
+                try:
+                    segments.append(int(file_name[len(SEGMENT_PREFIX):]))
+                except ValueError:
+                    logger.warning('Ignoring invalid file in spool directory: ' + file_name)
+        return sorted(segments)
+
+    def load_ack(self):
+        """Load acknowledgement offset from ack file.
+
+        Returns:
+            tuple: Position (segment, offset) or None if ack file does not exist or is invalid.
+
+        """
+        ack_file = os.path.join(self.directory, ACK_FILE)
+        if not os.path.isfile(ack_file):
+            return None
+        try:
+            with open(ack_file, 'r') as f:
+                segment, offset = f.read().split()
+            return int(segment), int(offset)
+        except (IOError, ValueError) as err:
+            logger.error('Unable to read spool ack file {}: {}'.format(ack_file, err))
+            return None
+
+    def save_ack(self):
+        """Write acknowledgement offset to ack file."""
+        ack_file = os.path.join(self.directory, ACK_FILE)
+        tmp_file = ack_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            f.write('{} {}'.format(*self.ack_position))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, ack_file)
+
+    def remove_segments(self):
+        """Remove segments which have been completely acknowledged."""
+        for segment in self.segments():
+            if segment >= self.ack_position[0]:
+                break
+            try:
+                os.remove(self.segment_file(segment))
+            except OSError as err:
+                logger.error('Unable to remove spool segment {}: {}'.format(segment, err))
+
+    def put(self, records):
+        """Append records to spool.
+
+        Args:
+            records (list): Records which can be serialized as JSON.
+
+        """
+        data = ''.join(json.dumps(record) + '\n' for record in records)
+        with self.condition:
+            with open(self.segment_file(self.write_segment), 'a') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            self.write_size += len(data)
+            if self.write_size >= self.segment_size:
+                self.write_segment += 1
+                self.write_size = 0
+            self.condition.notify_all()
+
+    def read_next(self):
+        """Read next record and advance read position.
+
+            Note: Must be called while holding the condition lock.
+
+        Returns:
+            tuple: Record position (segment, offset) and record, or None if no record is available.
+
+        """
+        while True:
+            try:
+                with open(self.segment_file(self.read_segment), 'r') as f:
+                    f.seek(self.read_offset)
+                    line = f.readline()
+            except IOError:
+                line = ''
+
+            if not line.endswith('\n'):
+                if self.read_segment >= self.write_segment:
+                    return None
+                if line:
+                    logger.error('Skipping partially written record in spool segment {}'.format(self.read_segment))
+                self.read_segment += 1
+                self.read_offset = 0
+                continue
+
+            position = (self.read_segment, self.read_offset)
+            self.read_offset += len(line)
+            try:
+                return position, json.loads(line)
+            except ValueError:
+                logger.error('Skipping invalid record in spool: ' + line.strip())
+                self.pending.add(position)
+                self.ack(position)
+
+    def get(self, timeout=None):
+        """Get next record from spool.
+
+        Args:
+            timeout (float, opt): Maximum time (in seconds) to wait for a record.
+
+        Returns:
+            tuple: Record position and record, or None if timeout expired.
+
+        """
+        with self.condition:
+            while True:
+                next_record = self.read_next()
+                if next_record is not None:
+                    self.pending.add(next_record[0])
+                    return next_record
+                self.flush_ack()  # Save acknowledgements while idle
+                if not self.condition.wait(timeout) and timeout is not None:
+                    return None
+
+    def ack(self, position):
+        """Acknowledge record has been processed.
+
+        Args:
+            position (tuple): Record position returned by get.
+
+        """
+        with self.condition:
+            self.pending.discard(position)
+            self.ack_position = min(self.pending) if self.pending else (self.read_segment, self.read_offset)
+            self.ack_count += 1
+            if self.ack_count >= self.ack_batch or time.time() - self.ack_time >= self.ack_interval:
+                self.flush_ack()
+
+    def flush_ack(self):
+        """Save acknowledgement offset if it has changed, removing segments once the acknowledged segment changes."""
+        with self.condition:
+            self.ack_count = 0
+            self.ack_time = time.time()
+            if self.ack_position == self.saved_position:
+                return
+            try:
+                self.save_ack()
+            except (IOError, OSError) as err:
+                logger.error('Unable to write spool ack file: {}'.format(err))
+                return
+            segment_changed = self.ack_position[0] != self.saved_position[0]
+            self.saved_position = self.ack_position
+            if segment_changed:
+                self.remove_segments()
+
+    def backlog(self):
+        """Get size of records that have not been acknowledged.
+
+        Returns:
+            int: Size in bytes.
+
+        """
+        with self.condition:
+            size = 0
+            for segment in self.segments():
+                if segment >= self.ack_position[0]:
+                    size += os.path.getsize(self.segment_file(segment))
+            return max(size - self.ack_position[1], 0)
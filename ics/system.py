@@ -1,24 +1,41 @@
+import json
 import logging
 import operator
 import os
 import sys
 import threading
 import time
+from collections import deque, OrderedDict
+from copy import deepcopy
+from contextlib import contextmanager
 from datetime import datetime
 from random import choice
 from shutil import copyfile
 
 import Pyro4 as Pyro
 
-from ics.attributes import AttributeObject, system_attributes
+from ics.alerts import ALERT_SETTINGS
+from ics.attributes import AttributeObject, group_attributes, resource_attributes, system_attributes
+from ics import retention
+from ics.environment import ICS_ALERT_LOG
 from ics.environment import ICS_CONF
 from ics.environment import ICS_CONF_FILE
+from ics.environment import ICS_CONF_GROUPS
+from ics.environment import ICS_CONF_JOURNAL
+from ics.environment import ICS_CONF_SNAPSHOT
 from ics.environment import ICS_ENGINE_PORT
+from ics.environment import ICS_NODE_NAME
+from ics.environment import ICS_RES_LOG
+from ics.environment import ICS_STATE_FILE
 from ics.errors import ICSError
+from ics.output import output_capture
 from ics.events import event_handler
+from ics.journal import ConfigJournal
 from ics.resource import Resource, Group
 from ics.states import NodeStates, ResourceStates, TRANSITION_STATES, ONLINE_STATES
-from ics.utils import read_config, write_config, hostname
+from ics.utils import alert_conn, alert_log_name, atomic_write, checksum_filename, resource_log_name
+from ics.utils import file_checksum, read_config, read_snapshot, write_config, write_snapshot
+from ics.utils import group_config_filename, group_layout, list_group_backups, list_group_configs, read_group_configs
 
 logger = logging.getLogger(__name__)
 
@@ -33,22 +50,50 @@ class NodeSystem(AttributeObject):
         groups (dict): Dictionary of group objects.
         threads (list): List of started thread references.
         remote_nodes (dict): Dictionary or remote node Pyro connections.
+        heartbeat_nodes (dict): Dictionary of remote node Pyro connections used only by the heartbeat thread.
+        node_heartbeats (dict): Time of the last successful heartbeat for each remote node.
+        node_groups (dict): Groups last reported online by each remote node.
+        lost_nodes (set): Remote nodes that have been declared lost.
+        failover_history (deque): Records of the most recent group failovers.
         poll_enabled (bool): Flag signifying when polling is enabled.
-        config_update (bool): Flag signifying when there is an update to save in the config.
+        deleted (dict): Change sequence number of each deleted group and resource, by config section.
+        deleted_pruned_seq (int): Change sequence number of the newest deletion pruned from deleted.
+        compacted_seq (int): Change sequence number up to which changes are included in the config files.
+        config_version (int): Cluster-wide config version of the latest config mutation applied on this node.
+        mutation_log (obj): Recent config mutations by config version and origin node, oldest first.
+        config_lock (obj): Lock held while changing groups, resources and dependency links.
+        backup_hashes (dict): Content hash of the newest backup of each config file.
+        group_configs (dict): Group config last written to or read from each group config file.
+        journal (obj): Config change journal, None until the config has been loaded.
 
     """
 
+    config_type = 'system'
+
     def __init__(self):
         super(NodeSystem, self).__init__()
         self.init_attr(system_attributes)
-        self.node_name = hostname()
+        self.node_name = ICS_NODE_NAME
         self.cluster_name = ""
         self.resources = {}
         self.groups = {}
         self.threads = []
         self.remote_nodes = {}  # Remote systems
+        self.heartbeat_nodes = {}
+        self.node_heartbeats = {}
+        self.node_groups = {}
+        self.lost_nodes = set()
+        self.failover_history = deque(maxlen=100)
         self.poll_enabled = False
-        self.config_update = False
+        self.deleted = {'groups': {}, 'resources': {}}
+        self.deleted_pruned_seq = 0
+        self.compacted_seq = 0
+        self.config_version = 0
+        self.mutation_log = OrderedDict()
+        self.config_lock = threading.RLock()
+        self.backup_hashes = {}
+        self.group_configs = {}
+        self.journal = None
 
     @Pyro.expose
     def ping(self, host=None):
@@ -172,19 +217,210 @@ class NodeSystem(AttributeObject):
 
         """
         try:
-            if append:
-                logger.debug('Node appending {} to attribute {} '.format(value, attr_name))
-                self.attr_append_value(attr_name, value)
-            elif remove:
-                logger.debug('Node removing {} from  attribute {}'.format(value, attr_name))
-                self.attr_remove_value(attr_name, value)
-            else:
-                logger.debug('Node modifying attribute {} to {} '.format(attr_name, value))
-                self.set_attr(attr_name, value)
+            with self.config_lock:
+                if append:
+                    logger.debug('Node appending %s to attribute %s ', value, attr_name)
+                    self.attr_append_value(attr_name, value)
+                elif remove:
+                    logger.debug('Node removing %s from  attribute %s', value, attr_name)
+                    self.attr_remove_value(attr_name, value)
+                else:
+                    logger.debug('Node modifying attribute %s to %s ', attr_name, value)
+                    self.set_attr(attr_name, value)
         except KeyError:
             return False
+
+        if attr_name in ALERT_SETTINGS:
+            self.start_alert_settings_push()
         return True
 
+    def push_alert_settings(self):
+        """Send alert settings to the alert server so its cached settings are updated."""
+        settings = {attr_name: self.attr_value(attr_name) for attr_name in ALERT_SETTINGS}
+        try:
+            conn = alert_conn()
+            conn._pyroTimeout = 5
+            conn.update_settings(settings)
+            conn._pyroRelease()
+        except Pyro.errors.CommunicationError as err:
+            logger.warning('Unable to push alert settings to alert server: {}'.format(err))
+
+    def start_alert_settings_push(self):
+        """Push alert settings in a separate thread so an unavailable alert server does not delay the caller."""
+        thread_alert_push = threading.Thread(name='alert settings push', target=self.push_alert_settings)
+        thread_alert_push.daemon = True
+        thread_alert_push.start()
+
+    def mutate(self, method_name, args, kwargs=None, remote=False, version=None, origin=None):
+        """Apply a config mutation with a cluster-wide config version and replicate it to the remote nodes.
+
+        A mutation made on this node gets the version after the latest applied version, a replicated mutation keeps
+        the version and origin node it was made with, so a mutation received twice is applied once. Mutations made
+        on different nodes with the same version are both applied and logged as a conflict. Mutations are kept in
+        the mutation log for nodes catching up. A node which can not be reached catches up when it starts or its
+        heartbeat is restored. The mutation is replicated after the config lock is released, so the caller must not
+        hold the config lock.
+
+        Args:
+            method_name (str): Name of the cluster method, the method without the clus_ prefix applies the mutation.
+            args (list): Method arguments.
+            kwargs (dict, opt): Method keyword arguments.
+            remote (bool, opt): Mutation replicated from a remote node, which is not replicated again.
+            version (int, opt): Config version of a replicated mutation.
+            origin (str, opt): Node a replicated mutation was made on.
+
+        """
+        kwargs = kwargs or {}
+        if remote and version is not None and version > self.config_version + 1 and origin in self.remote_nodes:
+            logger.info('Missed config mutations before version {}, catching up from {}'.format(version, origin))
+            self.catch_up([origin])
+
+        with self.config_lock:
+            if version is None:
+                version, origin = self.config_version + 1, self.node_name
+            if (version, origin) in self.mutation_log:
+                logger.debug('Config mutation %s from %s already applied', version, origin)
+                return
+            conflicts = sorted(other for other_version, other in self.mutation_log if other_version == version)
+            if conflicts:
+                logger.warning('Config version {} from {} conflicts with config version {} from {}, the config may '
+                               'differ between nodes'.format(version, origin, version, ', '.join(conflicts)))
+            with self.change_batch():
+                getattr(self, method_name[len('clus_'):])(*args, **kwargs)
+                self.config_version = max(self.config_version, version)
+                self.journal_change({'op': 'version', 'version': self.config_version})
+            self.mutation_log[(version, origin)] = {'version': version, 'origin': origin, 'method': method_name,
+                                                    'args': args, 'kwargs': kwargs}
+            while len(self.mutation_log) > int(self.attr_value('MutationLogSize')):
+                self.mutation_log.popitem(last=False)
+
+        if not remote:
+            for node in list(self.remote_nodes):
+                try:
+                    getattr(self.remote_nodes[node], method_name)(*args, remote=True, version=version,
+                                                                  origin=origin, **kwargs)
+                except (Pyro.errors.CommunicationError, ICSError) as err:
+                    logger.warning('Unable to replicate config version {} to {}, node will catch up: {}'.format(
+                        version, node, err))
+
+    @Pyro.expose
+    def mutations_since(self, version):
+        """Config mutations after a config version, used by a node catching up.
+
+        Args:
+            version (int): Latest config version applied on the calling node.
+
+        Returns:
+            list: Mutations ordered by version, None when the mutation log no longer holds all of them.
+
+        """
+        with self.config_lock:
+            if version >= self.config_version:
+                return []
+            mutations = [mutation for mutation in self.mutation_log.values() if mutation['version'] > version]
+            if not mutations or min(mutation['version'] for mutation in mutations) > version + 1:
+                return None
+            return sorted(mutations, key=lambda mutation: (mutation['version'], mutation['origin']))
+
+    @Pyro.expose
+    def config_snapshot(self):
+        """Config of groups and resources with its config version, used by a node too far behind to catch up.
+
+        Returns:
+            dict: Config version and configuration data.
+
+        """
+        with self.config_lock:
+            return {'version': self.config_version, 'config': deepcopy(self.config_data())}
+
+    def apply_snapshot(self, snapshot):
+        """Change the groups and resources to those of a config snapshot from a remote node.
+
+        Only the differences are applied, so unchanged groups and resources keep their state. System attributes are
+        not changed, they are set per node. Groups and resources which are not in the snapshot are kept and logged,
+        as they may have been added on this node while it was not reachable.
+
+        Args:
+            snapshot (dict): Config version and configuration data.
+
+        """
+        with self.config_lock:
+            with self.change_batch():
+                changes = []
+                for method_name, args in self.config_changes(snapshot['config']):
+                    if method_name == 'clus_grp_delete':
+                        logger.warning('Keeping group {} which is not in config snapshot version {}'.format(
+                            args[0], snapshot['version']))
+                    elif method_name == 'clus_res_delete' and args[0] not in snapshot['config']['resources']:
+                        logger.warning('Keeping resource {} which is not in config snapshot version {}'.format(
+                            args[0], snapshot['version']))
+                    elif method_name.startswith('clus_'):
+                        changes.append((method_name, args))
+                for method_name, args in changes:
+                    getattr(self, method_name[len('clus_'):])(*args)
+                self.config_version = snapshot['version']
+                self.journal_change({'op': 'version', 'version': self.config_version})
+            self.mutation_log.clear()
+        logger.info('Applied config snapshot version {}, {} changes'.format(snapshot['version'], len(changes)))
+
+    def catch_up(self, hosts=None):
+        """Apply config mutations made while this node was not reachable.
+
+        Each remote node is asked for the mutations after the latest applied config version. When this node made a
+        mutation with the latest version, the mutations with that version are included, so a mutation the remote
+        node made with the same version is applied and logged as a conflict. When the mutation log of the remote
+        node no longer holds all of them, its config snapshot is applied instead.
+
+        Args:
+            hosts (list, opt): Remote nodes to catch up from, defaults to all remote nodes.
+
+        Returns:
+            int: Config version after catching up.
+
+        """
+        for host in list(self.remote_nodes) if hosts is None else hosts:
+            try:
+                with Pyro.Proxy(self.remote_nodes[host]._pyroUri) as conn:
+                    conn._pyroTimeout = int(self.attr_value('HeartbeatTimeout'))
+                    with self.config_lock:
+                        since = self.config_version
+                        if any(version == since for version, origin in self.mutation_log):
+                            since -= 1
+                    mutations = conn.mutations_since(since)
+                    if mutations is None:
+                        logger.info('Config version {} too far behind {}, applying config snapshot'.format(
+                            self.config_version, host))
+                        try:
+                            self.apply_snapshot(conn.config_snapshot())
+                        except ICSError as err:
+                            logger.warning('Unable to apply config snapshot from {}: {}'.format(host, err))
+                        continue
+            except (Pyro.errors.CommunicationError, KeyError) as err:
+                logger.info('Unable to catch up config from {}: {}'.format(host, err))
+                continue
+
+            if mutations:
+                logger.info('Applying {} missed config mutations from {}'.format(len(mutations), host))
+            for mutation in mutations:
+                try:
+                    self.mutate(mutation['method'], mutation['args'], mutation['kwargs'], remote=True,
+                                version=mutation['version'], origin=mutation['origin'])
+                except (ICSError, KeyError, TypeError) as err:
+                    logger.warning('Unable to apply config version {} from {}: {}'.format(
+                        mutation['version'], host, err))
+        return self.config_version
+
+    def start_catch_up(self, hosts):
+        """Start config catch up thread, which is not added to threads as it finishes.
+
+        Args:
+            hosts (list): Remote nodes to catch up from.
+
+        """
+        thread_catch_up = threading.Thread(name='config catch up', target=self.catch_up, args=(hosts,))
+        thread_catch_up.daemon = True
+        thread_catch_up.start()
+
     def register_node(self, host):
         """Register a host and generate its URI.
 
@@ -198,8 +434,14 @@ class NodeSystem(AttributeObject):
             logger.error("Unable to register self ({}) as a remote node".format(self.node_name))
             return
 
-        uri = 'PYRO:system@' + str(host) + ':' + str(ICS_ENGINE_PORT)
+        # A node name can include the engine port (host:port) to allow multiple engines on the same host
+        if ':' in host:
+            uri = 'PYRO:system@' + str(host)
+        else:
+            uri = 'PYRO:system@' + str(host) + ':' + str(ICS_ENGINE_PORT)
         self.remote_nodes[host] = Pyro.Proxy(uri)
+        self.heartbeat_nodes[host] = Pyro.Proxy(uri)
+        self.node_heartbeats[host] = time.time()
 
     @Pyro.expose
     def add_node(self, host):
@@ -227,6 +469,10 @@ class NodeSystem(AttributeObject):
         logger.info('Deleting node {}'.format(host))
         # TODO: Check if host is current host
         del self.remote_nodes[host]
+        self.heartbeat_nodes.pop(host, None)
+        self.node_heartbeats.pop(host, None)
+        self.node_groups.pop(host, None)
+        self.lost_nodes.discard(host)
         self.attr_remove_value('NodeList', host)
 
     @Pyro.expose
@@ -239,18 +485,164 @@ class NodeSystem(AttributeObject):
         """
         return self.attr_value('NodeList')
 
+    @Pyro.expose
+    def node_heartbeat(self, host):
+        """Heartbeat from a remote node.
+
+        Args:
+            host (str): Calling node.
+
+        Returns:
+            list: Names of the groups currently online on this node.
+
+        """
+        logger.debug('Received heartbeat from ' + str(host))
+        return self.grp_online_list()
+
+    def grp_online_list(self):
+        """Return the names of all groups that are online on this node.
+
+        Returns:
+            list: Online group names.
+
+        """
+        online_groups = []
+        for group in self.groups.values():
+            if group.state() in ONLINE_STATES:
+                online_groups.append(group.name)
+        return online_groups
+
     def heartbeat(self):
+        """Continuously send heartbeats to remote nodes and detect lost nodes."""
         while True:
-            for host in self.remote_nodes:
+            timeout = int(self.attr_value('HeartbeatTimeout'))
+            for host in list(self.heartbeat_nodes):
+                conn = self.heartbeat_nodes[host]
+                conn._pyroTimeout = timeout
                 try:
-                    self.remote_nodes[host].ping(host=self.node_name)
+                    self.node_groups[host] = conn.node_heartbeat(self.node_name)
                 except Pyro.errors.CommunicationError as error:
-                    # TODO: send alert
                     logger.debug('Heartbeat error: ' + str(error))
-                    logger.error('Heartbeat from {} lost'.format(host))
+                    conn._pyroRelease()
+                    last_heartbeat = self.node_heartbeats.get(host, 0)
+                    if host not in self.lost_nodes and time.time() - last_heartbeat >= timeout:
+                        # TODO: send alert
+                        logger.error('Heartbeat from {} lost'.format(host))
+                        self.lost_nodes.add(host)
+                        self.start_failover(host, last_heartbeat)
+                else:
+                    self.node_heartbeats[host] = time.time()
+                    if host in self.lost_nodes:
+                        logger.info('Heartbeat from {} restored'.format(host))
+                        self.lost_nodes.discard(host)
+                        self.start_catch_up([host])
 
             time.sleep(1)
 
+    def failover_coordinator(self):
+        """Determine which node coordinates failover for lost nodes. Every surviving node makes the same choice
+        by selecting the first node name of the nodes still responding to heartbeats.
+
+        Returns:
+            str: Coordinator node name.
+
+        """
+        surviving_nodes = [self.node_name]
+        for host in self.remote_nodes:
+            if host not in self.lost_nodes:
+                surviving_nodes.append(host)
+        return sorted(surviving_nodes)[0]
+
+    def start_failover(self, host, last_heartbeat):
+        """Start failover thread for a lost node.
+
+        Args:
+            host (str): Lost node name.
+            last_heartbeat (float): Time of last successful heartbeat from lost node.
+
+        """
+        thread_failover = threading.Thread(name='failover ' + str(host), target=self.failover_node,
+                                           args=(host, last_heartbeat))
+        thread_failover.daemon = True
+        thread_failover.start()
+
+    def failover_node(self, host, last_heartbeat):
+        """Bring online the groups that were online on a lost node.
+
+        Args:
+            host (str): Lost node name.
+            last_heartbeat (float): Time of last successful heartbeat from lost node.
+
+        """
+        coordinator = self.failover_coordinator()
+        if coordinator != self.node_name:
+            logger.info('Node {} will coordinate failover for lost node {}'.format(coordinator, host))
+            return
+
+        for group_name in self.node_groups.get(host, []):
+            try:
+                self.failover_group(group_name, host, last_heartbeat)
+            except Exception:
+                logger.exception('Group({}) failover from lost node {} failed'.format(group_name, host))
+
+    def failover_group(self, group_name, host, last_heartbeat):
+        """Bring a group online on a surviving node and record the failover time.
+
+        Args:
+            group_name (str): Group name.
+            host (str): Lost node name.
+            last_heartbeat (float): Time of last successful heartbeat from lost node.
+
+        """
+        if group_name not in self.groups:
+            return
+        elif self.grp_value(group_name, 'Parallel') == 'true':
+            logger.debug('Group(%s) is parallel, skipping failover', group_name)
+            return
+        elif self.grp_value(group_name, 'AutoFailover') == 'false':
+            logger.info('Group({}) AutoFailover not enabled, skipping failover'.format(group_name))
+            return
+        elif not self.grp_online_status(group_name):
+            return
+
+        node = self.group_online_select(group_name)
+        logger.info('Group({}) failing over from lost node {} to {}'.format(group_name, host, node))
+        if node == self.node_name:
+            self.grp_online(group_name)
+            conn = self
+        else:
+            conn = self.remote_nodes[node]
+            conn.grp_online(group_name)
+
+        failover_timeout = time.time() + 300
+        while time.time() < failover_timeout:
+            if conn.grp_state(group_name) == 'ONLINE':
+                break
+            time.sleep(0.2)
+        else:
+            logger.error('Group({}) did not come online on {} after failover'.format(group_name, node))
+            return
+
+        failover_time = time.time() - last_heartbeat
+        logger.info('Group({}) failover to {} complete in {:.2f} seconds'.format(group_name, node, failover_time))
+        self.failover_history.append({
+            'group': group_name,
+            'from_node': host,
+            'to_node': node,
+            'last_heartbeat': last_heartbeat,
+            'failover_time': failover_time
+        })
+
+    @Pyro.expose
+    def failover_stats(self):
+        """Return the most recent group failovers coordinated by this node.
+
+        Returns:
+            list: Failover records with group, nodes and failover time in seconds.
+
+        """
+        return list(self.failover_history)
+
     def get_group(self, group_name):
         """Get group object from groups list.
 
@@ -330,7 +722,7 @@ class NodeSystem(AttributeObject):
 
         """
         system_list = self.grp_value(group_name, 'SystemList')
-        logger.debug('Valid nodes for group {} {}'.format(group_name, str(system_list)))
+        logger.debug('Valid nodes for group %s %s', group_name, system_list)
         if node in system_list:
             return True
         else:
@@ -361,7 +753,7 @@ class NodeSystem(AttributeObject):
                     raise ICSError('Group {} is already online.'.format(group_name))
                 else:
                     online_node = self.group_online_select(group_name)
-                    logger.debug('Attempting online group {} on node {} '.format(group_name, online_node))
+                    logger.debug('Attempting online group %s on node %s ', group_name, online_node)
                     if self.attr_value('NodeName') == online_node:
                         self.grp_online(group_name)
                     else:
@@ -395,9 +787,14 @@ class NodeSystem(AttributeObject):
         group = self.get_group(group_name)
         group.start()
 
-    def grp_online_auto(self):
-        """Start all groups with the attribute AutoStart set to true."""
-        for group in self.groups.values():
+    def grp_online_auto(self, group=None):
+        """Start groups with the attribute AutoStart set to true.
+
+        Args:
+            group (obj, opt): Group object to start, defaults to all groups.
+
+        """
+        for group in self.groups.values() if group is None else [group]:
             if group.attr_value('AutoStart') == 'true':
                 group.start()
 
@@ -482,8 +879,10 @@ class NodeSystem(AttributeObject):
                 group_states.append((group_name, local_node, self.grp_state(group_name)))
 
             for node in self.remote_nodes:
+                if node in self.lost_nodes:
+                    continue
                 state = self.remote_nodes[node].grp_state(group_name)
-                logger.debug("Found group {} in state {} on node {}".format(group_name, state, node))
+                logger.debug('Found group %s in state %s on node %s', group_name, state, node)
                 group_states.append((group_name, node, state))
 
         return group_states
@@ -503,18 +902,17 @@ class NodeSystem(AttributeObject):
         return group.state().upper()
 
     @Pyro.expose
-    def clus_grp_add(self, group_name, remote=False):
+    def clus_grp_add(self, group_name, remote=False, version=None, origin=None):
         """Add a new group.
 
         Args:
             group_name (str): Name of group.
             remote (bool, opt): Local or remote execution.
+            version (int, opt): Config version of a mutation replicated from a remote node.
+            origin (str, opt): Node a replicated mutation was made on.
 
         """
-        self.grp_add(group_name)
-        if not remote:
-            for node in self.remote_nodes:
-                self.remote_nodes[node].clus_grp_add(group_name, remote=True)
+        self.mutate('clus_grp_add', [group_name], remote=remote, version=version, origin=origin)
 
     def grp_add(self, group_name):
         """Interface for adding a new group.
@@ -528,29 +926,29 @@ class NodeSystem(AttributeObject):
 
         """
         logger.info('Adding new group {}'.format(group_name))
-        if group_name in self.grp_list():
-            raise ICSError('Group {} already exists'.format(group_name))
-        elif len(self.groups) >= int(self.attr_value('GroupLimit')):
-            raise ICSError('Max group count reached, unable to add new group')
-        else:
-            group = Group(group_name)
-            self.groups[group_name] = group
-
-        self.config_update = True
+        with self.config_lock:
+            if group_name in self.grp_list():
+                raise ICSError('Group {} already exists'.format(group_name))
+            elif len(self.groups) >= int(self.attr_value('GroupLimit')):
+                raise ICSError('Max group count reached, unable to add new group')
+            else:
+                group = Group(group_name)
+                group.created_seq = group.mark_changed()
+                self.groups[group_name] = group
+                self.journal_change({'op': 'grp_add', 'name': group_name})
 
     @Pyro.expose
-    def clus_grp_delete(self, group_name, remote=False):
+    def clus_grp_delete(self, group_name, remote=False, version=None, origin=None):
         """Remove a group from the cluster.
 
         Args:
             group_name (str): Group name.
             remote (bool, opt): Local or remote execution.
+            version (int, opt): Config version of a mutation replicated from a remote node.
+            origin (str, opt): Node a replicated mutation was made on.
 
         """
-        self.grp_delete(group_name)
-        if not remote:
-            for node in self.remote_nodes:
-                self.remote_nodes[node].clus_grp_delete(group_name, remote=True)
+        self.mutate('clus_grp_delete', [group_name], remote=remote, version=version, origin=origin)
 
     def grp_delete(self, group_name):
         """Interface for deleting an existing group.
@@ -560,28 +958,28 @@ class NodeSystem(AttributeObject):
 
         """
         logger.info('Deleting group {}'.format(group_name))
-        group = self.get_group(group_name)
-        if not group.members:
-            del self.groups[group_name]
-        else:
-            logger.error('Unable to delete group ({}), group still contains resources'.format(group_name))
-            pass  # delete object?
-
-        self.config_update = True
+        with self.config_lock:
+            group = self.get_group(group_name)
+            if not group.members:
+                del self.groups[group_name]
+                self.deleted['groups'][group_name] = AttributeObject.next_change_seq()
+                self.journal_change({'op': 'grp_delete', 'name': group_name})
+            else:
+                logger.error('Unable to delete group ({}), group still contains resources'.format(group_name))
+                pass  # delete object?
 
     @Pyro.expose
-    def clus_grp_enable(self, group_name, remote=False):
+    def clus_grp_enable(self, group_name, remote=False, version=None, origin=None):
         """Enable a group on the cluster.
 
         Args:
             group_name (str): Group name.
             remote (bool, opt): Local or remote execution.
+            version (int, opt): Config version of a mutation replicated from a remote node.
+            origin (str, opt): Node a replicated mutation was made on.
 
         """
-        self.grp_enable(group_name)
-        if not remote:
-            for node in self.remote_nodes:
-                self.remote_nodes[node].clus_grp_enable(group_name, remote=True)
+        self.mutate('clus_grp_enable', [group_name], remote=remote, version=version, origin=origin)
 
     def grp_enable(self, group_name):
         """Interface to enable a group.
@@ -594,18 +992,17 @@ class NodeSystem(AttributeObject):
         group.set_attr('Enabled', 'true')
 
     @Pyro.expose
-    def clus_grp_disable(self, group_name, remote=False):
+    def clus_grp_disable(self, group_name, remote=False, version=None, origin=None):
         """Disable a group on the cluster.
 
         Args:
             group_name (str): Group name.
             remote (str):Local or remote execution.
+            version (int, opt): Config version of a mutation replicated from a remote node.
+            origin (str, opt): Node a replicated mutation was made on.
 
         """
-        self.grp_disable(group_name)
-        if not remote:
-            for node in self.remote_nodes:
-                self.remote_nodes[node].clus_grp_disable(group_name, remote=True)
+        self.mutate('clus_grp_disable', [group_name], remote=remote, version=version, origin=origin)
 
     def grp_disable(self, group_name):
         """Interface to disable a group.
@@ -618,18 +1015,17 @@ class NodeSystem(AttributeObject):
         group.set_attr('Enabled', 'false')
 
     @Pyro.expose
-    def clus_grp_enable_resources(self, group_name, remote=False):
+    def clus_grp_enable_resources(self, group_name, remote=False, version=None, origin=None):
         """Enable a group resources on a cluster.
 
         Args:
             group_name (str): Group name.
             remote (bool, opt): Local or remote execution.
+            version (int, opt): Config version of a mutation replicated from a remote node.
+            origin (str, opt): Node a replicated mutation was made on.
 
         """
-        self.grp_enable_resources(group_name)
-        if not remote:
-            for node in self.remote_nodes:
-                self.remote_nodes[node].clus_grp_enable_resources(group_name, remote=True)
+        self.mutate('clus_grp_enable_resources', [group_name], remote=remote, version=version, origin=origin)
 
     def grp_enable_resources(self, group_name):
         """Interface to enable a group resources.
@@ -639,21 +1035,21 @@ class NodeSystem(AttributeObject):
 
         """
         group = self.get_group(group_name)
-        group.enable_resources()
+        with self.change_batch():
+            group.enable_resources()
 
     @Pyro.expose
-    def clus_grp_disable_resources(self, group_name, remote=False):
+    def clus_grp_disable_resources(self, group_name, remote=False, version=None, origin=None):
         """Disable a group resources on a cluster.
 
         Args:
             group_name (str): Group name.
             remote (bool, opt): Local or remote execution.
+            version (int, opt): Config version of a mutation replicated from a remote node.
+            origin (str, opt): Node a replicated mutation was made on.
 
         """
-        self.grp_disable_resources(group_name)
-        if not remote:
-            for node in self.remote_nodes:
-                self.remote_nodes[node].clus_grp_disable_resources(group_name, remote=True)
+        self.mutate('clus_grp_disable_resources', [group_name], remote=remote, version=version, origin=origin)
 
     def grp_disable_resources(self, group_name):
         """Interface to disable a group resources.
@@ -663,7 +1059,8 @@ class NodeSystem(AttributeObject):
 
         """
         group = self.get_group(group_name)
-        group.disable_resources()
+        with self.change_batch():
+            group.disable_resources()
 
     @Pyro.expose
     def clus_grp_flush(self, group_name, system_name):
@@ -788,7 +1185,8 @@ class NodeSystem(AttributeObject):
         return group.attr_value(attr_name)
 
     @Pyro.expose
-    def clus_grp_modify(self, group_name, attr_name, value, remote=False, append=False, remove=False):
+    def clus_grp_modify(self, group_name, attr_name, value, remote=False, append=False, remove=False, version=None,
+                        origin=None):
         """Modify a group attribute value on the cluster.
 
         Args:
@@ -798,13 +1196,12 @@ class NodeSystem(AttributeObject):
             remote (bool, opt): Local or remote execution.
             append (bool, opt): Append item to attribute list.
             remove (bool, opt): Remove item from attribute list.
+            version (int, opt): Config version of a mutation replicated from a remote node.
+            origin (str, opt): Node a replicated mutation was made on.
 
         """
-        self.grp_modify(group_name, attr_name, value, append=append, remove=remove)
-        if not remote:
-            for node in self.remote_nodes:
-                self.remote_nodes[node].clus_grp_modify(group_name, attr_name, value, remote=True, append=append,
-                                                        remove=remove)
+        self.mutate('clus_grp_modify', [group_name, attr_name, value], {'append': append, 'remove': remove}, remote,
+                    version, origin)
 
     def grp_modify(self, group_name, attr_name, value, append=False, remove=False):
         """Modify an attribute for a given group.
@@ -822,15 +1219,16 @@ class NodeSystem(AttributeObject):
         """
         group = self.get_group(group_name)
         try:
-            if append:
-                logger.debug('Group({}) Appending {} to attribute {} '.format(group_name, value, attr_name))
-                group.attr_append_value(attr_name, value)
-            elif remove:
-                logger.debug('Group({}) Removing {} from  attribute {}'.format(group_name, value, attr_name))
-                group.attr_remove_value(attr_name, value)
-            else:
-                logger.debug('Group({}) Modifying attribute {} to {} '.format(group_name, attr_name, value))
-                group.set_attr(attr_name, value)
+            with self.config_lock:
+                if append:
+                    logger.debug('Group(%s) Appending %s to attribute %s ', group_name, value, attr_name)
+                    group.attr_append_value(attr_name, value)
+                elif remove:
+                    logger.debug('Group(%s) Removing %s from  attribute %s', group_name, value, attr_name)
+                    group.attr_remove_value(attr_name, value)
+                else:
+                    logger.debug('Group(%s) Modifying attribute %s to %s ', group_name, attr_name, value)
+                    group.set_attr(attr_name, value)
         except KeyError:
             return False
         return True
@@ -942,19 +1340,18 @@ class NodeSystem(AttributeObject):
             resource.change_state(ResourceStates.STOPPING)
 
     @Pyro.expose
-    def clus_res_add(self, resource_name, group_name, remote=False):
+    def clus_res_add(self, resource_name, group_name, remote=False, version=None, origin=None):
         """Cluster interface for adding a resource.
         
         Args:
             resource_name (str): Resource name.
             group_name (str): Resource group name. 
-            remote (bool, opt): Local or remote execution. 
+            remote (bool, opt): Local or remote execution.
+            version (int, opt): Config version of a mutation replicated from a remote node.
+            origin (str, opt): Node a replicated mutation was made on.
 
         """
-        self.res_add(resource_name, group_name)
-        if not remote:
-            for node in self.remote_nodes:
-                self.remote_nodes[node].clus_res_add(resource_name, group_name, remote=True)
+        self.mutate('clus_res_add', [resource_name, group_name], remote=remote, version=version, origin=origin)
 
     def res_add(self, resource_name, group_name, init_state=ResourceStates.OFFLINE):
         """Interface for adding new resource.
@@ -971,33 +1368,88 @@ class NodeSystem(AttributeObject):
 
         """
         logger.info('Adding new resource {}'.format(resource_name))
-        if resource_name in self.resources.keys():
-            raise ICSError('Resource {} already exists'.format(resource_name))
-        elif group_name not in self.groups.keys():
-            raise ICSError('Group {} does not exist'.format(group_name))
-        elif len(self.resources) >= int(self.attr_value('ResourceLimit')):
-            raise ICSError('Max resource count reached, unable to add new resource')
-        else:
-            resource = Resource(resource_name, group_name, init_state=init_state)
-            self.resources[resource_name] = resource
-            group = self.groups[group_name]
-            group.add_resource(resource)
+        with self.config_lock:
+            if resource_name in self.resources.keys():
+                raise ICSError('Resource {} already exists'.format(resource_name))
+            elif group_name not in self.groups.keys():
+                raise ICSError('Group {} does not exist'.format(group_name))
+            elif len(self.resources) >= int(self.attr_value('ResourceLimit')):
+                raise ICSError('Max resource count reached, unable to add new resource')
+            else:
+                self._res_create(resource_name, group_name, init_state)
 
-        self.config_update = True
+    def _res_create(self, resource_name, group_name, init_state):
+        """Create resource object and add it to its group without any checks.
+
+        Args:
+            resource_name (str): Name of new resource.
+            group_name (str): Name of existing group.
+            init_state (obj): Initial state of resource.
+
+        """
+        self.journal_change({'op': 'res_add', 'name': resource_name, 'group': group_name})
+        resource = Resource(resource_name, group_name, init_state=init_state)
+        resource.created_seq = resource.mark_changed()
+        self.resources[resource_name] = resource
+        group = self.groups[group_name]
+        group.add_resource(resource)
+        group.mark_changed()
 
     @Pyro.expose
-    def clus_res_delete(self, resource_name, remote=False):
+    def clus_res_add_many(self, resources, remote=False, version=None, origin=None):
+        """Cluster interface for adding multiple resources.
+
+        Args:
+            resources (list): List of resource name and group name pairs.
+            remote (bool, opt): Local or remote execution.
+            version (int, opt): Config version of a mutation replicated from a remote node.
+            origin (str, opt): Node a replicated mutation was made on.
+
+        """
+        self.mutate('clus_res_add_many', [resources], remote=remote, version=version, origin=origin)
+
+    def res_add_many(self, resources, init_state=ResourceStates.OFFLINE):
+        """Interface for adding multiple new resources. All resources are validated before any are added.
+
+        Args:
+            resources (list): List of resource name and group name pairs.
+            init_state (obj, opt): Initial state of resources.
+
+        Raises:
+            ICSError: When a resource already exists or is given more than once.
+            ICSError: When a group doesn't exists.
+            ICSError: When max resource count would be exceeded.
+
+        """
+        logger.info('Adding {} new resources'.format(len(resources)))
+        with self.config_lock:
+            new_resources = set()
+            for resource_name, group_name in resources:
+                if resource_name in self.resources or resource_name in new_resources:
+                    raise ICSError('Resource {} already exists'.format(resource_name))
+                elif group_name not in self.groups:
+                    raise ICSError('Group {} does not exist'.format(group_name))
+                new_resources.add(resource_name)
+
+            if len(self.resources) + len(new_resources) > int(self.attr_value('ResourceLimit')):
+                raise ICSError('Max resource count reached, unable to add new resources')
+
+            with self.change_batch():
+                for resource_name, group_name in resources:
+                    self._res_create(resource_name, group_name, init_state)
+
+    @Pyro.expose
+    def clus_res_delete(self, resource_name, remote=False, version=None, origin=None):
         """Cluster interface for deleting resources.
         
         Args:
             resource_name (str): Resource name. 
             remote (bool, opt): Local or remote execution.
+            version (int, opt): Config version of a mutation replicated from a remote node.
+            origin (str, opt): Node a replicated mutation was made on.
 
         """
-        self.res_delete(resource_name)
-        if not remote:
-            for node in self.remote_nodes:
-                self.remote_nodes[node].clus_res_delete(resource_name, remote=True)
+        self.mutate('clus_res_delete', [resource_name], remote=remote, version=version, origin=origin)
 
     def res_delete(self, resource_name):
         """Interface for deleting existing resource.
@@ -1009,20 +1461,63 @@ class NodeSystem(AttributeObject):
             ICSError: If resource does not exist.
 
         """
-        resource = self.get_resource(resource_name)
+        with self.config_lock:
+            resource = self.get_resource(resource_name)
 
-        for parent in resource.parents:
-            parent.children.remove(resource)
+            for parent in resource.parents:
+                parent.children.remove(resource)
 
-        for child in resource.children:
-            child.parents.remove(resource)
+            for child in resource.children:
+                child.parents.remove(resource)
+                child.links_changed()
 
-        group = self.get_group(resource.attr_value('Group'))
-        group.delete_resource(resource)
-        del self.resources[resource_name]
-        self.config_update = True
+            group = self.get_group(resource.attr_value('Group'))
+            group.delete_resource(resource)
+            group.mark_changed()
+            del self.resources[resource_name]
+            self.deleted['resources'][resource_name] = AttributeObject.next_change_seq()
+            self.journal_change({'op': 'res_delete', 'name': resource_name})
+        output_capture.remove(resource_name)
         logger.info('Resource({}) resource deleted'.format(resource_name))
 
+    @Pyro.expose
+    def clus_res_output(self, resource_name, node=None):
+        """Retrieve recent command output of a resource on a cluster node.
+
+        Args:
+            resource_name (str): Resource name.
+            node (str, opt): Node name, local node when not given.
+
+        Returns:
+            list: Output lines, oldest first.
+
+        Raises:
+            ICSError: If node does not exist.
+
+        """
+        if node is None or node == self.node_name:
+            return self.res_output(resource_name)
+        if node not in self.remote_nodes:
+            raise ICSError('Node {} does not exist'.format(node))
+        return self.remote_nodes[node].res_output(resource_name)
+
+    @Pyro.expose
+    def res_output(self, resource_name):
+        """Interface for getting recent command output of a resource.
+
+        Args:
+            resource_name (str): Resource name.
+
+        Returns:
+            list: Output lines, oldest first.
+
+        Raises:
+            ICSError: If resource does not exist.
+
+        """
+        self.get_resource(resource_name)
+        return output_capture.output(resource_name)
+
     @Pyro.expose
     def clus_res_state(self, resource_name):
         """Generate dictionary of resource states on all cluster nodes.
@@ -1040,6 +1535,23 @@ class NodeSystem(AttributeObject):
 
         return states
 
+    @Pyro.expose
+    def clus_res_provisional(self, resource_name):
+        """Generate dictionary of provisional resource states on all cluster nodes.
+
+        Args:
+            resource_name (str): Resource_name.
+
+        Returns:
+            dict: Nodes with True when the resource state is provisional, see res_provisional.
+
+        """
+        provisional = {self.attr_value('NodeName'): self.res_provisional(resource_name)}
+        for node in self.remote_nodes:
+            provisional[node] = self.remote_nodes[node].res_provisional(resource_name)
+
+        return provisional
+
     @Pyro.expose
     def clus_res_state_many(self, resource_list, include_node=False, remote=False):
         """Cluster interface for setting multiple resource states.
@@ -1076,6 +1588,20 @@ class NodeSystem(AttributeObject):
         resource = self.get_resource(resource_name)
         return resource.state.upper()
 
+    @Pyro.expose
+    def res_provisional(self, resource_name):
+        """Return whether the state of a resource was restored at startup and has not been confirmed by a poll yet.
+
+        Args:
+            resource_name (str): Resource name.
+
+        Returns:
+            bool: True when the resource state is provisional.
+
+        """
+        resource = self.get_resource(resource_name)
+        return resource.provisional
+
     def res_state_many(self, resource_list, include_node=False):
         """Return states for a given list of resource.
 
@@ -1106,19 +1632,19 @@ class NodeSystem(AttributeObject):
         return resource_states
 
     @Pyro.expose
-    def clus_res_link(self, resource_name, resource_dependency, remote=False):
+    def clus_res_link(self, resource_name, resource_dependency, remote=False, version=None, origin=None):
         """Add a resource dependency on the cluster.
         
         Args:
             resource_name (str): Resource name. 
             resource_dependency (str) Resource dependency name.
             remote (bool, opt): Local or remote execution.
+            version (int, opt): Config version of a mutation replicated from a remote node.
+            origin (str, opt): Node a replicated mutation was made on.
 
         """
-        self.res_link(resource_name, resource_dependency)
-        if not remote:
-            for node in self.remote_nodes:
-                self.remote_nodes[node].clus_res_link(resource_name, resource_dependency, remote=True)
+        self.mutate('clus_res_link', [resource_name, resource_dependency], remote=remote, version=version,
+                    origin=origin)
 
     def res_link(self, resource_name, resource_dependency):
         """Interface to add a dependency to a resource.
@@ -1131,29 +1657,82 @@ class NodeSystem(AttributeObject):
             ICSError: When resources given are not in the same group.
 
         """
-        resource = self.get_resource(resource_name)
-        parent_resource = self.get_resource(resource_dependency)
-        if resource.attr_value('Group') != parent_resource.attr_value('Group'):
-            raise ICSError('Unable to add link, resources not in same group')
-        resource.add_parent(parent_resource)
-        parent_resource.add_child(resource)
-        logger.info('Resource({}) created dependency on {}'.format(resource_name, resource_dependency))
-        self.config_update = True
+        with self.config_lock:
+            resource = self.get_resource(resource_name)
+            parent_resource = self.get_resource(resource_dependency)
+            if resource.attr_value('Group') != parent_resource.attr_value('Group'):
+                raise ICSError('Unable to add link, resources not in same group')
+            resource.add_parent(parent_resource)
+            parent_resource.add_child(resource)
+            resource.links_changed()
+            self.journal_change({'op': 'res_link', 'name': resource_name, 'dep': resource_dependency})
+            logger.info('Resource({}) created dependency on {}'.format(resource_name, resource_dependency))
 
     @Pyro.expose
-    def clus_res_unlink(self, resource_name, resource_dependency, remote=False):
+    def clus_res_link_many(self, links, remote=False, version=None, origin=None):
+        """Add multiple resource dependencies on the cluster.
+
+        Args:
+            links (list): List of resource name and resource dependency name pairs.
+            remote (bool, opt): Local or remote execution.
+            version (int, opt): Config version of a mutation replicated from a remote node.
+            origin (str, opt): Node a replicated mutation was made on.
+
+        """
+        self.mutate('clus_res_link_many', [links], remote=remote, version=version, origin=origin)
+
+    def res_link_many(self, links):
+        """Interface to add multiple resource dependencies. All links are validated before any are added.
+
+        Args:
+            links (list): List of resource name and resource dependency name pairs.
+
+        Raises:
+            ICSError: When a resource does not exist.
+            ICSError: When resources given are not in the same group.
+            ICSError: When a link already exists or is given more than once.
+
+        """
+        with self.config_lock:
+            new_links = set()
+            for resource_name, resource_dependency in links:
+                resource = self.get_resource(resource_name)
+                parent_resource = self.get_resource(resource_dependency)
+                if resource is parent_resource:
+                    raise ICSError('Unable to add link, resource {} can not depend on itself'.format(resource_name))
+                elif resource.attr_value('Group') != parent_resource.attr_value('Group'):
+                    raise ICSError('Unable to add link, resources {} and {} not in same group'.format(
+                        resource_name, resource_dependency))
+                elif parent_resource in resource.parents or (resource_name, resource_dependency) in new_links:
+                    raise ICSError('Unable to add link, {} already depends on {}'.format(
+                        resource_name, resource_dependency))
+                new_links.add((resource_name, resource_dependency))
+
+            for resource_name, resource_dependency in links:
+                resource = self.resources[resource_name]
+                parent_resource = self.resources[resource_dependency]
+                resource.add_parent(parent_resource)
+                parent_resource.add_child(resource)
+                resource.links_changed()
+            self.journal_change(*[{'op': 'res_link', 'name': resource_name, 'dep': resource_dependency}
+                                  for resource_name, resource_dependency in links])
+
+            logger.info('Created {} resource dependencies'.format(len(links)))
+
+    @Pyro.expose
+    def clus_res_unlink(self, resource_name, resource_dependency, remote=False, version=None, origin=None):
         """Remove a resource dependency on the cluster.
         
         Args:
             resource_name (str): Resource name. 
             resource_dependency (str): Resource dependency name. 
-            remote (bool, opt): Local or remote execution. 
+            remote (bool, opt): Local or remote execution.
+            version (int, opt): Config version of a mutation replicated from a remote node.
+            origin (str, opt): Node a replicated mutation was made on.
 
         """
-        self.res_unlink(resource_name, resource_dependency)
-        if not remote:
-            for node in self.remote_nodes:
-                self.remote_nodes[node].clus_res_unlink(resource_name, resource_dependency, remote=True)
+        self.mutate('clus_res_unlink', [resource_name, resource_dependency], remote=remote, version=version,
+                    origin=origin)
 
     def res_unlink(self,  resource_name, resource_dependency):
         """Interface to remove a dependency from a resource.
@@ -1166,15 +1745,17 @@ class NodeSystem(AttributeObject):
             ICSError: When resource link does not exist.
 
         """
-        resource = self.get_resource(resource_name)
-        parent_resource = self.get_resource(resource_dependency)
-        try:
-            resource.remove_parent(parent_resource)
-        except ValueError:
-            raise ICSError('Unable to remove link, link does not exist.')
-        parent_resource.remove_child(resource)
-        logger.info('Resource({}) removed dependency on {}'.format(resource_name, resource_dependency))
-        self.config_update = True
+        with self.config_lock:
+            resource = self.get_resource(resource_name)
+            parent_resource = self.get_resource(resource_dependency)
+            try:
+                resource.remove_parent(parent_resource)
+            except ValueError:
+                raise ICSError('Unable to remove link, link does not exist.')
+            parent_resource.remove_child(resource)
+            resource.links_changed()
+            self.journal_change({'op': 'res_unlink', 'name': resource_name, 'dep': resource_dependency})
+            logger.info('Resource({}) removed dependency on {}'.format(resource_name, resource_dependency))
 
     @Pyro.expose
     def clus_res_dep(self, resource_args):
@@ -1311,7 +1892,7 @@ class NodeSystem(AttributeObject):
         return resource.attr_value(attr_name)
 
     @Pyro.expose
-    def clus_res_modify(self, resource_name, attr_name, value, remote=False):
+    def clus_res_modify(self, resource_name, attr_name, value, remote=False, version=None, origin=None):
         """Modify a resource attribute on the cluster.
         
         Args:
@@ -1319,12 +1900,11 @@ class NodeSystem(AttributeObject):
             attr_name (str): Attribute name. 
             value (str): New attribute value. 
             remote (bool, opt): Local or remote execution.
+            version (int, opt): Config version of a mutation replicated from a remote node.
+            origin (str, opt): Node a replicated mutation was made on.
 
         """
-        self.res_modify(resource_name, attr_name, value)
-        if not remote:
-            for node in self.remote_nodes:
-                self.remote_nodes[node].clus_res_modify(resource_name, attr_name, value, remote=True)
+        self.mutate('clus_res_modify', [resource_name, attr_name, value], remote=remote, version=version, origin=origin)
 
     def res_modify(self, resource_name, attr_name, value):
         """Interface for modifying attribute for resource.
@@ -1340,11 +1920,44 @@ class NodeSystem(AttributeObject):
         """
         resource = self.get_resource(resource_name)
         try:
-            resource.set_attr(attr_name, value)
+            with self.config_lock:
+                resource.set_attr(attr_name, value)
         except KeyError:
             return False
         return True
 
+    @Pyro.expose
+    def clus_res_modify_many(self, modifications, remote=False, version=None, origin=None):
+        """Modify multiple resource attributes on the cluster.
+
+        Args:
+            modifications (list): List of resource name, attribute name and value lists.
+            remote (bool, opt): Local or remote execution.
+            version (int, opt): Config version of a mutation replicated from a remote node.
+            origin (str, opt): Node a replicated mutation was made on.
+
+        """
+        self.mutate('clus_res_modify_many', [modifications], remote=remote, version=version, origin=origin)
+
+    def res_modify_many(self, modifications):
+        """Interface for modifying multiple resource attributes. All modifications are validated before any are made.
+
+        Args:
+            modifications (list): List of resource name, attribute name and value lists.
+
+        Raises:
+            ICSError: When a resource or attribute does not exist.
+            ICSError: When a value is not valid for an attribute.
+
+        """
+        with self.config_lock:
+            for resource_name, attr_name, value in modifications:
+                self.get_resource(resource_name).validate_attr(attr_name, value)
+
+            with self.change_batch():
+                for resource_name, attr_name, value in modifications:
+                    self.resources[resource_name].set_attr(attr_name, value)
+
     @Pyro.expose
     def clus_res_attr(self, resource_name):
         """Retrieve resource attributes.
@@ -1383,6 +1996,8 @@ class NodeSystem(AttributeObject):
         nodes_load = {self.attr_value('NodeName'):  self.load()}
 
         for node in self.remote_nodes:
+            if node in self.lost_nodes:
+                continue
             nodes_load[node] = self.remote_nodes[node].load()
 
         logger.debug('Node loads: ' + str(nodes_load))
@@ -1403,7 +2018,8 @@ class NodeSystem(AttributeObject):
         nodes_load = self.clus_load()
 
         for node in self.grp_value(group_name, 'SystemList'):
-            group_nodes_load[node] = nodes_load[node]
+            if node in nodes_load:
+                group_nodes_load[node] = nodes_load[node]
 
         return group_nodes_load
 
@@ -1446,34 +2062,190 @@ class NodeSystem(AttributeObject):
                 count += 1
         return count
 
-    def startup_poll(self):
-        """Poll all resources"""
+    def startup_order(self):
+        """Groups in the order they are probed at startup.
+
+        Groups with AutoStart set come first, then groups with a higher Priority.
+
+        Returns:
+            list: Group objects.
+
+        """
+        def priority(group):
+            return group.attr_value('AutoStart') != 'true', -int(group.attr_value('Priority')), group.name
+        return sorted(self.groups.values(), key=priority)
+
+    def probe_order(self):
+        """Resources in the order they are probed at startup, grouped by group.
+
+        Resources are probed per group in startup_order, dependency roots first.
+
+        Returns:
+            list: Tuples of group object and list of resource objects.
+
+        """
+        return [(group, group.dependency_order()) for group in self.startup_order()]
+
+    def startup_poll(self, order=None, group_probed=None):
+        """Poll all resources, one group after the other.
+
+        A group is probed once the polls of all of its resources have finished, while resources of the following groups
+        are still being polled.
+
+        Args:
+            order (list, opt): Tuples of group and resources in the order they are polled, defaults to probe_order.
+            group_probed (func, opt): Called with a group object as soon as all resources of the group are probed.
+
+        """
         logger.info('Polling resources to determine initial state...')
-        resource_count = len(self.resources)
+        if order is None:
+            order = self.probe_order()
+        resource_count = sum(len(resources) for _, resources in order)
         polled_resources = 0
-        for resource in self.resources.values():
-            while True:
-                count = self.poll_count()
-                if count < 30:
-                    resource.probe()
-                    polled_resources += 1
-                    logger.info('Remaining resources to be polled {}/{}'.format(str(resource_count - polled_resources),
-                                                                                str(resource_count)))
-                    break
-                else:
+        pending = []
+
+        def finish_groups():
+            for entry in list(pending):
+                group, resources = entry
+                if not any(resource.poll_running for resource in resources):
+                    pending.remove(entry)
+                    logger.info('Group({}) probed'.format(group.name))
+                    if group_probed is not None:
+                        group_probed(group)
+
+        for group, resources in order:
+            for resource in resources:
+                while self.poll_count() >= 30:
+                    finish_groups()
                     time.sleep(0.1)
+                resource.probe()
+                polled_resources += 1
+                logger.info('Remaining resources to be polled {}/{}'.format(str(resource_count - polled_resources),
+                                                                            str(resource_count)))
+            pending.append((group, resources))
+            finish_groups()
 
         # Wait for all polls to finish
-        while True:
-            count = self.poll_count()
-            if count != 0:
-                logger.info('Remaining resources to finish poll {}/{}'.format(count, resource_count))
+        while pending:
+            finish_groups()
+            if pending:
+                logger.info('Remaining resources to finish poll {}/{}'.format(self.poll_count(), resource_count))
                 time.sleep(1)
-            else:
-                break
 
         logger.info('Startup polling complete')
 
+    # Resource states which are saved for a warm restart, mapped to the state objects compared with "is"
+    saved_states = {state: state for state in [ResourceStates.ONLINE, ResourceStates.OFFLINE,
+                                                ResourceStates.FAULTED]}
+
+    def save_states(self):
+        """Save resource states and poll times, used to restore states at the next startup."""
+        resources = {}
+        for resource in list(self.resources.values()):
+            if resource.state in self.saved_states:
+                resources[resource.name] = {'state': resource.state, 'last_poll': resource.last_poll}
+        data = {'time': time.time(), 'resources': resources}
+        atomic_write(ICS_STATE_FILE, json.dumps(data).encode('utf-8'))
+        logger.debug('Saved states of %s resources', len(resources))
+
+    def restore_states(self):
+        """Restore resource states saved within WarmRestartAge of their last poll.
+
+        Restored resources are provisional until they are polled again.
+
+        Returns:
+            int: Number of restored resources.
+
+        """
+        max_age = int(self.attr_value('WarmRestartAge'))
+        if max_age <= 0:
+            return 0
+        try:
+            with open(ICS_STATE_FILE, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except (IOError, ValueError) as err:
+            logger.warning('Unable to read saved resource states: {}'.format(err))
+            return 0
+
+        now = time.time()
+        restored = 0
+        for resource_name, saved in data.get('resources', {}).items():
+            resource = self.resources.get(resource_name)
+            if resource is None or saved.get('state') not in self.saved_states or \
+                    now - saved.get('last_poll', 0) > max_age or resource.attr_value('Enabled') == 'false':
+                continue
+            resource.state = self.saved_states[saved['state']]
+            resource.last_poll = int(saved['last_poll'])
+            resource.provisional = True
+            restored += 1
+        logger.info('Restored saved states of {}/{} resources'.format(restored, len(self.resources)))
+        return restored
+
+    def revalidation_order(self):
+        """Resources in the order they are probed after a warm restart, grouped by group.
+
+        Groups are probed in startup_order and the resources of a group in dependency order, each resource after its
+        parents. Resources at the same dependency level are probed without a restored state first, then provisional
+        resources with the oldest poll first.
+
+        Returns:
+            list: Tuples of group object and list of resource objects.
+
+        """
+        order = []
+        for group, resources in self.probe_order():
+            levels = {}
+            for resource in resources:
+                # Parents which are not ordered before the resource are in a dependency cycle, which is probed last
+                parent_levels = [levels.get(parent, len(resources)) for parent in resource.parents]
+                levels[resource] = max(parent_levels) + 1 if parent_levels else 0
+
+            def priority(resource):
+                return levels[resource], resource.provisional, resource.last_poll
+            order.append((group, sorted(resources, key=priority)))
+        return order
+
+    def revalidate(self):
+        """Probe all resources after a warm restart, starting groups as soon as their resources are probed."""
+        try:
+            self.startup_poll(self.revalidation_order(), group_probed=self.grp_online_auto)
+            self.poll_enabled = True
+            logger.info('Revalidation of restored resource states complete')
+        except Exception:
+            logger.exception('Exception occurred during revalidation, enabling polling')
+            self.poll_enabled = True
+
+    def start_revalidation(self):
+        """Start revalidation thread, which is not added to threads as it finishes"""
+        logger.info('Starting revalidation of restored resource states...')
+        thread_revalidation = threading.Thread(name='revalidation', target=self.revalidate)
+        thread_revalidation.daemon = True
+        thread_revalidation.start()
+
+    def state_saver(self):
+        """Continuously save resource states."""
+        while True:
+            time.sleep(int(self.attr_value('StateSaveInterval')))
+            self.save_states()
+
+    def state_saver_wrapper(self):
+        while True:
+            try:
+                self.state_saver()
+            except Exception:
+                logger.exception('Exception occurred in state saver, will be restarted in 10 seconds.')
+                time.sleep(10)
+
+    def start_state_saver(self):
+        """Start resource state saver thread"""
+        logger.info('Starting state saver...')
+        thread_state_saver = threading.Thread(name='state saver', target=self.state_saver_wrapper)
+        thread_state_saver.daemon = True
+        thread_state_saver.start()
+        self.threads.append(thread_state_saver)
+
     def poll_updater_wrapper(self):
         while True:
             try:
@@ -1514,6 +2286,38 @@ class NodeSystem(AttributeObject):
         thread_poll_updater.start()
         self.threads.append(thread_poll_updater)
 
+    def heartbeat_wrapper(self):
+        while True:
+            try:
+                self.heartbeat()
+            except Exception:
+                logger.exception('Exception occurred in heartbeat, will be restarted in 10 seconds.')
+                time.sleep(10)
+
+    def start_heartbeat(self):
+        """Start heartbeat thread"""
+        logger.info('Starting heartbeat...')
+        thread_heartbeat = threading.Thread(name='heartbeat', target=self.heartbeat_wrapper)
+        thread_heartbeat.daemon = True
+        thread_heartbeat.start()
+        self.threads.append(thread_heartbeat)
+
+    def retention_wrapper(self):
+        while True:
+            try:
+                self.retention()
+            except Exception:
+                logger.exception('Exception occurred in retention handler, will be restarted in 10 seconds.')
+                time.sleep(10)
+
+    def start_retention(self):
+        """Start log and config backup retention thread"""
+        logger.info('Starting retention handler...')
+        thread_retention = threading.Thread(name='retention', target=self.retention_wrapper)
+        thread_retention.daemon = True
+        thread_retention.start()
+        self.threads.append(thread_retention)
+
     def start_config_backup(self):
         """Start config backup"""
         logger.info('Starting auto backups...')
@@ -1552,6 +2356,62 @@ class NodeSystem(AttributeObject):
 
         return data
 
+    # Operations allowed to be run with execute
+    execute_operations = {
+        # Node operations
+        'ping', 'node_state', 'clus_node_state', 'node_attr', 'node_value', 'node_list', 'load', 'clus_load',
+        # Group operations
+        'grp_state', 'clus_grp_state', 'clus_grp_state_all', 'grp_list', 'clus_grp_list', 'grp_value',
+        'clus_grp_value', 'grp_attr', 'clus_grp_attr', 'grp_resources', 'clus_grp_resources', 'clus_grp_online',
+        'clus_grp_offline', 'clus_grp_add', 'clus_grp_delete', 'clus_grp_enable', 'clus_grp_disable',
+        'clus_grp_enable_resources', 'clus_grp_disable_resources', 'clus_grp_flush', 'clus_grp_clear',
+        'clus_grp_modify',
+        # Resource operations
+        'res_state', 'clus_res_state', 'clus_res_state_many', 'res_list', 'clus_res_list', 'res_value',
+        'clus_res_value', 'res_attr', 'clus_res_attr', 'res_dep', 'clus_res_dep', 'clus_res_online',
+        'clus_res_offline', 'clus_res_add', 'clus_res_add_many', 'clus_res_delete', 'clus_res_link',
+        'clus_res_link_many', 'clus_res_unlink', 'clus_res_clear', 'clus_res_probe', 'clus_res_modify',
+        'clus_res_modify_many', 'clus_res_output',
+        # Other operations
+        'clus_log_command', 'dump',
+    }
+
+    @Pyro.expose
+    def execute(self, operations, stop_on_error=False):
+        """Run multiple operations in order within a single request.
+
+        Args:
+            operations (list): List of operations, each a list of the operation name, optional list of positional
+                arguments and optional dict of keyword arguments.
+            stop_on_error (bool, opt): Stop running operations after the first error.
+
+        Returns:
+            list: Result of each operation run, as a dict with either a 'result' or an 'error' key.
+
+        """
+        results = []
+        for operation in operations:
+            name = operation[0]
+            args = operation[1] if len(operation) > 1 else []
+            kwargs = operation[2] if len(operation) > 2 else {}
+            try:
+                if name not in self.execute_operations:
+                    raise ICSError('Operation {} is not allowed'.format(name))
+                result = getattr(self, name)(*args, **kwargs)
+            except ICSError as err:
+                results.append({'error': str(err)})
+            except Exception as err:
+                logger.exception('Operation {} caught unknown exception'.format(name))
+                results.append({'error': '{}: {}'.format(err.__class__.__name__, str(err))})
+            else:
+                results.append({'result': result})
+                continue
+
+            if stop_on_error:
+                break
+
+        return results
+
     @Pyro.expose
     def clus_log_command(self, message):
         """Log command onto cluster.
@@ -1577,81 +2437,675 @@ class NodeSystem(AttributeObject):
         """
         logger.info('User command, ' + str(message))
 
-    def config_data(self):
-        """Return system configuration data in dictionary format"""
+    def journal_change(self, *records):
+        """Record config changes in the config journal.
+
+        Args:
+            *records (dict): Change records.
+
+        """
+        if AttributeObject.change_journal is not None:
+            AttributeObject.change_journal.append(records)
+
+    @contextmanager
+    def change_batch(self):
+        """Write config changes made in the block to the config journal together."""
+        if AttributeObject.change_journal is None:
+            yield
+        else:
+            with AttributeObject.change_journal.batch():
+                yield
+
+    def apply_change(self, record):
+        """Apply a config change record from the config journal.
+
+        Changes which are already included in the config are skipped.
+
+        Args:
+            record (dict): Change record.
+
+        Raises:
+            ICSError: When the change can not be applied.
+
+        """
+        op = record['op']
+        name = record.get('name')
+        if op == 'set':
+            if record['type'] == 'system':
+                attr_object = self
+            elif record['type'] == 'groups':
+                attr_object = self.get_group(name)
+            else:
+                attr_object = self.get_resource(name)
+            attr_object.set_attr(record['attr'], record['value'])
+        elif op == 'grp_add':
+            if name not in self.groups:
+                self.grp_add(name)
+        elif op == 'grp_delete':
+            if name in self.groups:
+                self.grp_delete(name)
+        elif op == 'res_add':
+            if name not in self.resources:
+                self.res_add(name, record['group'], init_state=ResourceStates.UNKNOWN)
+        elif op == 'res_delete':
+            if name in self.resources:
+                self.res_delete(name)
+        elif op == 'res_link':
+            if self.get_resource(record['dep']) not in self.get_resource(name).parents:
+                self.res_link(name, record['dep'])
+        elif op == 'res_unlink':
+            if self.get_resource(record['dep']) in self.get_resource(name).parents:
+                self.res_unlink(name, record['dep'])
+        elif op == 'version':
+            self.config_version = max(self.config_version, record['version'])
+        else:
+            raise ICSError('Unknown config change {}'.format(op))
+
+    def replay_changes(self, records):
+        """Apply config changes recorded after the config file was last written.
+
+        Args:
+            records (list): Change records, oldest first.
+
+        """
+        logger.info('Replaying {} config changes from journal'.format(len(records)))
+        for record in records:
+            try:
+                self.apply_change(record)
+            except (ICSError, KeyError) as err:
+                logger.warning('Unable to replay config change {}: {}'.format(record, err))
+
+    def compact_config(self):
+        """Write the config files and remove the journal records they include.
+
+        Returns:
+            list: Written config filenames.
+
+        """
+        self.journal.rotate()
+        with self.config_lock:
+            seq = AttributeObject.change_seq
+            group_files = self.attr_value('GroupConfigFiles') == 'true'
+            snapshot = self.attr_value('ConfigSnapshot') == 'true'
+            if group_files:
+                # Only groups changed since the last compaction, or not yet written to a group config file
+                group_names = self.changed_groups(self.compacted_seq)
+                group_names.update(name for name in self.groups if name not in self.group_configs)
+                all_group_names = list(self.groups)
+                data = deepcopy(self.config_data(group_names))  # Serialized outside the lock
+            else:
+                data = deepcopy(self.config_data())
+            data['version'] = self.config_version
+        logger.debug('Writing config file')
+        if group_files:
+            written = self.write_group_configs(data, all_group_names)
+        else:
+            checksum = write_config(ICS_CONF_FILE, data)
+            if snapshot:
+                write_snapshot(ICS_CONF_SNAPSHOT, data, checksum)
+            self.remove_group_configs()
+            written = [ICS_CONF_FILE]
+        self.journal.remove_rotated()
+        self.compacted_seq = seq
+        self.prune_deleted(seq)
+        return written
+
+    def prune_deleted(self, seq):
+        """Remove the deleted groups and resources recorded at or before a change sequence number.
+
+        Args:
+            seq (int): Change sequence number.
+
+        """
+        with self.config_lock:
+            for deleted in self.deleted.values():
+                for name, deleted_seq in list(deleted.items()):
+                    if deleted_seq <= seq:
+                        self.deleted_pruned_seq = max(self.deleted_pruned_seq, deleted_seq)
+                        del deleted[name]
+
+    @staticmethod
+    def group_config_file(group_name):
+        """Config filename of a group.
+
+        Args:
+            group_name (str): Group name.
+
+        Returns:
+            str: Group config filename.
+
+        """
+        return group_config_filename(ICS_CONF_GROUPS, group_name)
+
+    @staticmethod
+    def group_config_files():
+        """Existing group config files.
+
+        Returns:
+            list: Group config filenames.
+
+        """
+        return list_group_configs(ICS_CONF_GROUPS)
+
+    @staticmethod
+    def split_config(data):
+        """Split config data into the main config, holding the system attributes, and a config for each group.
+
+        Args:
+            data (dict): System configuration data.
+
+        Returns:
+            tuple: Main config data, which lists the group names so a backup of it can be restored with the group
+                config files, and dictionary of group config data, which holds the group attributes and the group
+                resources with their dependencies.
+
+        """
+        group_configs = {}
+        for group_name, group_data in data['groups'].items():
+            group_configs[group_name] = {'name': group_name, 'attributes': group_data['attributes'], 'resources': {}}
+        for resource_name, resource_data in data['resources'].items():
+            group_configs[resource_data['attributes']['Group']]['resources'][resource_name] = resource_data
+        main_data = {'version': data.get('version', 0), 'system': data['system'], 'groups': {}, 'resources': {},
+                     'group_names': sorted(group_configs)}
+        return main_data, group_configs
+
+    def write_group_configs(self, data, group_names):
+        """Write config data with one config file per group.
+
+        Only group config files which changed since they were last written are rewritten. Group files are written
+        before main.cf, and files of deleted groups are removed after it, so a main.cf without the group layout is
+        never loaded together with group files. The journal is replayed over whichever files were written.
+
+        Args:
+            data (dict): System configuration data, holding the groups which may have changed.
+            group_names (list): Names of all groups, files of other groups are removed.
+
+        Returns:
+            list: Written config filenames.
+
+        """
+        main_data, group_configs = self.split_config(data)
+        os.makedirs(ICS_CONF_GROUPS, exist_ok=True)
+        written = []
+        for group_name, group_config in group_configs.items():
+            if self.group_configs.get(group_name) != group_config:
+                filename = self.group_config_file(group_name)
+                write_config(filename, group_config)
+                self.group_configs[group_name] = group_config
+                written.append(filename)
+
+        # A snapshot would not include the groups
+        if os.path.isfile(ICS_CONF_SNAPSHOT):
+            os.remove(ICS_CONF_SNAPSHOT)
+        write_config(ICS_CONF_FILE, main_data)
+        written.append(ICS_CONF_FILE)
+
+        current_files = set(self.group_config_file(group_name) for group_name in group_names)
+        for filename in self.group_config_files():
+            if filename not in current_files:
+                self.remove_config_file(filename)
+        for group_name in set(self.group_configs).difference(group_names):
+            del self.group_configs[group_name]
+        logger.debug('Wrote {} of {} group config files'.format(len(written) - 1, len(group_names)))
+        return written
+
+    def remove_group_configs(self):
+        """Remove group config files, once main.cf holds all groups."""
+        for filename in self.group_config_files():
+            self.remove_config_file(filename)
+        self.group_configs = {}
+
+    @staticmethod
+    def remove_config_file(filename):
+        """Remove config file with its checksum file.
+
+        Args:
+            filename (str): Config filename.
+
+        """
+        logger.info('Removing config file {}'.format(filename))
+        for path in [filename, checksum_filename(filename)]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def config_data(self, group_names=None):
+        """Return system configuration data in dictionary format.
+
+        Args:
+            group_names (list, opt): Only include these groups and their resources, defaults to all groups.
+
+        """
         config_data = {
             'system': {'attributes': self.modified_attributes()},
             'groups': {},
             'resources': {}
         }
 
-        for group in self.groups.values():
+        if group_names is None:
+            groups = self.groups.values()
+            resources = self.resources.values()
+        else:
+            groups = [self.groups[group_name] for group_name in group_names]
+            resources = [resource for group in groups for resource in group.members]
+        for group in groups:
             config_data['groups'][group.name] = {'attributes': group.modified_attributes()}
-        for resource in self.resources.values():
+        for resource in resources:
             config_data['resources'][resource.name] = {'attributes': resource.modified_attributes(),
                                                        'dependencies': resource.dependencies()}
         return config_data
 
+    def changed_groups(self, seq):
+        """Groups changed after a change sequence number, including changes to their resources.
+
+        Args:
+            seq (int): Change sequence number.
+
+        Returns:
+            set: Group names.
+
+        """
+        group_names = set(group.name for group in self.groups.values() if group.seq > seq)
+        group_names.update(resource.attr_value('Group') for resource in self.resources.values() if resource.seq > seq)
+        return group_names
+
+    @Pyro.expose
+    def changes_since(self, seq):
+        """Config changes made after a change sequence number, used for incremental updates of a copy of the config.
+
+        Groups and resources created after seq hold all of their modified attributes, others only the attributes
+        which changed. Resources hold their dependencies when created or when their dependencies changed. Deleted
+        groups and resources are to be deleted before the changes are applied, as they may have been created again.
+        For seq 0 the full config is returned, including groups and resources loaded from the config file, with no
+        deletions, which replaces the copy of the config.
+
+        Args:
+            seq (int): Change sequence number, 0 for the full config.
+
+        Returns:
+            dict: Current change sequence number, changed system attributes, groups and resources, and the names of
+                deleted groups and resources.
+
+        Raises:
+            ICSError: When deletions made after seq have been pruned, the caller has to start again from 0.
+
+        """
+        with self.config_lock:
+            if 0 < seq < self.deleted_pruned_seq:
+                raise ICSError('Changes since {} are no longer available, deletions up to {} have been pruned'.format(
+                    seq, self.deleted_pruned_seq))
+            full = seq == 0
+            changes = {
+                'seq': AttributeObject.change_seq,  # Read first, later changes are sent again by the next call
+                'system': {'attributes': self.modified_attributes() if full else self.changed_since(seq)},
+                'groups': {},
+                'resources': {},
+                'deleted': {config_type: sorted(name for name, deleted_seq in deleted.items()
+                                                if deleted_seq > seq and not full)
+                            for config_type, deleted in self.deleted.items()}
+            }
+            for group in self.groups.values():
+                if full or group.created_seq > seq:
+                    changes['groups'][group.name] = {'attributes': group.modified_attributes()}
+                elif group.seq > seq:
+                    attributes = group.changed_since(seq)
+                    if attributes:
+                        changes['groups'][group.name] = {'attributes': attributes}
+            for resource in self.resources.values():
+                if full or resource.created_seq > seq:
+                    resource_changes = {'attributes': resource.modified_attributes(),
+                                        'dependencies': resource.dependencies()}
+                elif resource.seq > seq:
+                    resource_changes = {'attributes': resource.changed_since(seq)}
+                    if resource.links_seq > seq:
+                        resource_changes['dependencies'] = resource.dependencies()
+                else:
+                    continue
+                changes['resources'][resource.name] = resource_changes
+            return deepcopy(changes)
+
     def load_config(self, data):
         """Load system config file.
 
+        Groups and resources are created directly with their attribute values, without logging or recording each
+        attribute, so large configs load quickly.
+
         Args:
             data (dict): System configuration data.
 
+        Raises:
+            ICSError: When the config refers to a group or resource which does not exist, or has an invalid attribute.
+
         """
         logger.info('Loading configuration...')
 
         try:
-            # Set system attributes from config
-            system_data = data['system']
-            for attr_name in system_data['attributes']:
-                self.set_attr(attr_name, system_data['attributes'][attr_name])
-
-            # Create groups from config
-            group_data = data['groups']
-            for group_name in group_data:
-                self.grp_add(group_name)
-                group = self.get_group(group_name)
-                for attr_name in group_data[group_name]['attributes']:
-                    group.set_attr(attr_name, group_data[group_name]['attributes'][attr_name])
-
-            # Create resources from config
-            resource_data = data['resources']
-            for resource_name in resource_data.keys():
-                group_name = resource_data[resource_name]['attributes']['Group']
-                self.res_add(resource_name, group_name, init_state=ResourceStates.UNKNOWN)
-                resource = self.get_resource(resource_name)
-                for attr_name in resource_data[resource_name]['attributes']:
-                    resource.set_attr(attr_name, resource_data[resource_name]['attributes'][attr_name])
-
-            # Create resource dependency links
-            # Note: Links need to be done in separate loop to guarantee parent resources
-            # are created first when establishing links
-            for resource_name in resource_data.keys():
-                for dep_name in resource_data[resource_name]['dependencies']:
-                    self.res_link(resource_name, dep_name)
+            with self.config_lock:
+                # Set system attributes from config
+                self.load_attr(data['system']['attributes'])
+                self.cluster_name = self.attr_value('ClusterName')
+                self.config_version = data.get('version', 0)
+
+                # Create groups from config
+                group_data = data['groups']
+                for group_name in group_data:
+                    if group_name in self.groups:
+                        raise ICSError('Group {} already exists'.format(group_name))
+                    group = Group(group_name)
+                    group.load_attr(group_data[group_name]['attributes'])
+                    self.groups[group_name] = group
+
+                # Create resources from config
+                resource_data = data['resources']
+                for resource_name in resource_data:
+                    attributes = resource_data[resource_name]['attributes']
+                    group_name = attributes['Group']
+                    if resource_name in self.resources:
+                        raise ICSError('Resource {} already exists'.format(resource_name))
+                    elif group_name not in self.groups:
+                        raise ICSError('Group {} does not exist'.format(group_name))
+                    resource = Resource(resource_name, group_name, init_state=ResourceStates.UNKNOWN)
+                    resource.load_attr(attributes)
+                    self.resources[resource_name] = resource
+                    self.groups[group_name].add_resource(resource)
+
+                # Create resource dependency links
+                # Note: Links need to be done in separate loop to guarantee parent resources
+                # are created first when establishing links
+                for resource_name in resource_data:
+                    resource = self.resources[resource_name]
+                    for dep_name in resource_data[resource_name]['dependencies']:
+                        parent_resource = self.get_resource(dep_name)
+                        if resource.attr_value('Group') != parent_resource.attr_value('Group'):
+                            raise ICSError('Unable to link {} to {}, resources not in same group'.format(
+                                resource_name, dep_name))
+                        resource.add_parent(parent_resource)
+                        parent_resource.add_child(resource)
         except (TypeError, KeyError) as error:
             logging.error('Error occurred while loading config: {}:{}'.format(error.__class__.__name__, str(error)))
             raise
 
+        logger.info('Loaded {} groups and {} resources'.format(len(self.groups), len(self.resources)))
+
+    def read_startup_config(self):
+        """Read config data for startup, from the binary snapshot when it was written with the current config file.
+
+        When main.cf uses one config file per group, the group config files are read as well.
+
+        Returns:
+            dict: Configuration data.
+
+        Raises:
+            FileNotFoundError: When configuration file does not exist.
+            ICSError: When configuration file is corrupt.
+
+        """
+        if os.path.isfile(ICS_CONF_SNAPSHOT) and os.path.isfile(ICS_CONF_FILE):
+            try:
+                snapshot_checksum, data = read_snapshot(ICS_CONF_SNAPSHOT)
+            except ICSError as err:
+                logger.warning('{}, reading config file instead'.format(err))
+            else:
+                if snapshot_checksum == file_checksum(ICS_CONF_FILE):
+                    logger.info('Reading configuration snapshot...')
+                    return data
+                logger.info('Config file changed since the config snapshot was written, reading config file')
+        data = read_config(ICS_CONF_FILE)
+        if group_layout(data):
+            self.group_configs = read_group_configs(ICS_CONF_GROUPS, data)
+        return data
+
+    @staticmethod
+    def attr_changes(default_attributes, current, new):
+        """Find attribute changes between modified attributes of an object.
+
+        Args:
+            default_attributes (dict): Default attributes of the object type.
+            current (dict): Current modified attribute values.
+            new (dict): New modified attribute values.
+
+        Returns:
+            list: Attribute name and new value pairs, attributes missing in new are set to their default.
+
+        """
+        changes = []
+        for attr_name in sorted(set(current) | set(new)):
+            default_value = deepcopy(default_attributes[attr_name]['default'])
+            value = new.get(attr_name, default_value)
+            if value != current.get(attr_name, default_value):
+                changes.append((attr_name, value))
+        return changes
+
+    def config_changes(self, data):
+        """Find the cluster operations which change the live config to the given config.
+
+        Resources which move to another group are deleted and added again. NodeList is not changed, nodes are added
+        and deleted with add_node and delete_node.
+
+        Args:
+            data (dict): New configuration data, in the format of config_data().
+
+        Returns:
+            list: Method name and argument list pairs, in the order they need to be applied.
+
+        """
+        current = self.config_data()
+        cur_groups, new_groups = current['groups'], data['groups']
+        cur_resources, new_resources = current['resources'], data['resources']
+        changes = []
+
+        for attr_name, value in self.attr_changes(system_attributes, current['system']['attributes'],
+                                                  data['system']['attributes']):
+            if attr_name != 'NodeList':
+                changes.append(('node_modify', [attr_name, value]))
+
+        for group_name in sorted(set(new_groups) - set(cur_groups)):
+            changes.append(('clus_grp_add', [group_name]))
+        for group_name in sorted(new_groups):
+            cur_attributes = cur_groups[group_name]['attributes'] if group_name in cur_groups else {}
+            for attr_name, value in self.attr_changes(group_attributes, cur_attributes,
+                                                      new_groups[group_name]['attributes']):
+                changes.append(('clus_grp_modify', [group_name, attr_name, value]))
+
+        moved = {resource_name for resource_name in set(cur_resources) & set(new_resources)
+                 if cur_resources[resource_name]['attributes']['Group'] !=
+                 new_resources[resource_name]['attributes']['Group']}
+        removed = (set(cur_resources) - set(new_resources)) | moved
+        added = (set(new_resources) - set(cur_resources)) | moved
+
+        # Links of removed resources are removed with the resource
+        cur_links = {(resource_name, dep_name) for resource_name in cur_resources
+                     for dep_name in cur_resources[resource_name]['dependencies']
+                     if resource_name not in removed and dep_name not in removed}
+        new_links = {(resource_name, dep_name) for resource_name in new_resources
+                     for dep_name in new_resources[resource_name]['dependencies']}
+        for resource_name, dep_name in sorted(cur_links - new_links):
+            changes.append(('clus_res_unlink', [resource_name, dep_name]))
+        for resource_name in sorted(removed):
+            changes.append(('clus_res_delete', [resource_name]))
+
+        if added:
+            changes.append(('clus_res_add_many', [[[resource_name, new_resources[resource_name]['attributes']['Group']]
+                                                   for resource_name in sorted(added)]]))
+        modifications = []
+        for resource_name in sorted(new_resources):
+            new_attributes = dict(new_resources[resource_name]['attributes'])
+            if resource_name in added:
+                cur_attributes = {'Group': new_attributes['Group']}
+            else:
+                cur_attributes = cur_resources[resource_name]['attributes']
+            for attr_name, value in self.attr_changes(resource_attributes, cur_attributes, new_attributes):
+                modifications.append([resource_name, attr_name, value])
+        if modifications:
+            changes.append(('clus_res_modify_many', [modifications]))
+        if new_links - cur_links:
+            changes.append(('clus_res_link_many', [[list(link) for link in sorted(new_links - cur_links)]]))
+
+        for group_name in sorted(set(cur_groups) - set(new_groups)):
+            changes.append(('clus_grp_delete', [group_name]))
+        return changes
+
+    @staticmethod
+    def change_description(method_name, args):
+        """Describe a cluster operation found by config_changes.
+
+        Args:
+            method_name (str): Name of the cluster method.
+            args (list): Method arguments.
+
+        Returns:
+            list: Operation lines, one for each item of a _many operation.
+
+        """
+        if method_name.endswith('_many'):
+            return ['{} {}'.format(method_name[5:-5], ' '.join(str(arg) for arg in item)) for item in args[0]]
+        return ['{} {}'.format(method_name.replace('clus_', ''), ' '.join(str(arg) for arg in args))]
+
+    @Pyro.expose
+    def reload_config(self, filename=None):
+        """Apply a changed config file to the running cluster.
+
+        The config is compared with the live config and only the differences are applied, so unchanged groups and
+        resources keep their state and poll schedule.
+
+        Args:
+            filename (str, opt): Config filename, defaults to main.cf together with the group config files.
+
+        Returns:
+            list: Applied operations, one line each.
+
+        Raises:
+            ICSError: When the config file can not be read or is not valid, or a change fails. The error lists the
+                applied changes and the changes which were not applied.
+
+        """
+        filename = ICS_CONF_FILE if filename is None else filename
+        logger.info('Reloading config from {}'.format(filename))
+        try:
+            data = read_config(filename, verify=False)
+        except FileNotFoundError:
+            raise ICSError('Config file {} does not exist'.format(filename))
+        if filename == ICS_CONF_FILE and group_layout(data):
+            read_group_configs(ICS_CONF_GROUPS, data, verify=False)
+
+        # Validate by loading into an empty system, which also drops attributes set to their default values
+        validate_system = NodeSystem()
+        try:
+            validate_system.load_config(data)
+        except (KeyError, TypeError) as err:
+            raise ICSError('Invalid config {}: {} {}'.format(filename, err.__class__.__name__, err))
+        data = validate_system.config_data()
+
+        # Changes are applied without holding the config lock, as each change is replicated to the remote nodes
+        with self.config_lock:
+            changes = self.config_changes(data)
+        applied = []
+        for position, (method_name, args) in enumerate(changes):
+            try:
+                getattr(self, method_name)(*args)
+            except (ICSError, KeyError, TypeError) as err:
+                not_applied = [line for change in changes[position:] for line in self.change_description(*change)]
+                logger.error('Config reload stopped after {} changes: {}'.format(len(applied), err))
+                raise ICSError('Config reload failed on {}: {}\nApplied: {}\nNot applied: {}'.format(
+                    not_applied[0], err, ', '.join(applied) or 'none', ', '.join(not_applied)))
+            applied.extend(self.change_description(method_name, args))
+        logger.info('Config reloaded, {} changes applied'.format(len(applied)))
+        return applied
+
     def backup_config(self):
-        """Continuously write backup system config file."""
+        """Continuously compact the config journal into the config file and back up the config file.
+
+        Runs every BackupInterval minutes, or sooner when the journal has reached its compaction size.
+
+        """
         while True:
             interval = int(self.attr_value('BackupInterval'))
 
-            if any([AttributeObject.update_flag, self.config_update]):
-                AttributeObject.update_flag = False
-                self.config_update = False
+            if self.journal.count or os.path.isfile(self.journal.rotated_filename) or \
+                    AttributeObject.change_seq > self.compacted_seq:
                 logger.debug('Creating backup of config file')
-                if os.path.isfile(ICS_CONF_FILE):
-                    os.rename(ICS_CONF_FILE, ICS_CONF_FILE + '.autobackup')
-                write_config(ICS_CONF_FILE, self.config_data())
+                for filename in self.compact_config():
+                    self.create_backup(filename)
+
+            self.journal.compact_event.wait(interval * 60)
+
+    def create_backup(self, filename=ICS_CONF_FILE):
+        """Copy a config file to a timestamped backup unless it is the same as its newest backup.
 
-                backup_file = ICS_CONF_FILE + '.' + datetime.now().strftime('%y%m%d_%H%M%S')
-                logger.info('Creating backup config ' + backup_file)
-                copyfile(ICS_CONF_FILE, backup_file)
+        Args:
+            filename (str, opt): Config filename, defaults to main.cf.
+
+        Returns:
+            str: Backup filename or None if no backup was created.
+
+        """
+        config_hash = retention.file_hash(filename)
+        if filename not in self.backup_hashes:
+            latest_backup = self.backup_policy(filename).latest()
+            self.backup_hashes[filename] = retention.file_hash(latest_backup) if latest_backup is not None else None
+        if config_hash == self.backup_hashes[filename]:
+            logger.debug('Config file {} unchanged since the last backup, no backup created'.format(filename))
+            return None
+
+        backup_file = filename + '.' + datetime.now().strftime('%y%m%d_%H%M%S')
+        logger.info('Creating backup config ' + backup_file)
+        copyfile(filename, backup_file)
+        self.backup_hashes[filename] = config_hash
+        return backup_file
 
-            time.sleep(interval * 60)
+    def backup_policy(self, filename=ICS_CONF_FILE):
+        """Retention policy for config backups.
+
+        Args:
+            filename (str, opt): Config filename, defaults to main.cf.
+
+        Returns:
+            obj: RetentionPolicy object.
+
+        """
+        return retention.RetentionPolicy(filename, retention.BACKUP_SUFFIX,
+                                         max_count=int(self.attr_value('BackupRetentionCount')),
+                                         max_age=int(self.attr_value('BackupRetentionDays')) * 86400,
+                                         dedupe=True)
+
+    def retention_policies(self):
+        """Retention policies for config backups, resource logs and alert logs.
+
+        Backups of group config files are covered for existing groups and for deleted groups which still have backups.
+
+        Returns:
+            list: RetentionPolicy objects.
+
+        """
+        max_age = int(self.attr_value('LogRetentionDays')) * 86400
+        max_size = int(self.attr_value('LogRetentionSize')) * 1024 * 1024
+        group_files = sorted(set(self.group_config_files()) | set(list_group_backups(ICS_CONF_GROUPS)))
+        backup_policies = [self.backup_policy(filename) for filename in [ICS_CONF_FILE] + group_files]
+        return backup_policies + [
+            retention.RetentionPolicy(ICS_RES_LOG, retention.LOG_SUFFIX, max_age=max_age, max_size=max_size,
+                                      active=resource_log_name),
+            retention.RetentionPolicy(ICS_ALERT_LOG, retention.LOG_SUFFIX, max_age=max_age, max_size=max_size,
+                                      active=alert_log_name)
+        ]
+
+    def apply_retention(self):
+        """Remove and compress old config backups and log files."""
+        for policy in self.retention_policies():
+            try:
+                result = policy.apply()
+            except OSError as err:
+                logger.error('Unable to apply retention to {}: {}'.format(policy.base_name, err))
+                continue
+            if result['removed'] or result['compressed']:
+                logger.info('Retention of {}: {} files removed, {} files compressed'.format(
+                    policy.base_name, result['removed'], result['compressed']))
+
+    def retention(self):
+        """Continuously apply retention policies."""
+        while True:
+            self.apply_retention()
+            time.sleep(int(self.attr_value('RetentionInterval')) * 60)
 
     def startup(self):
         """Startup system."""
@@ -1659,10 +3113,16 @@ class NodeSystem(AttributeObject):
         # TODO: Add config startup management here
         data = {}
         try:
-            data = read_config(ICS_CONF_FILE)
+            data = self.read_startup_config()
         except FileNotFoundError:
             if not os.path.exists(ICS_CONF):
                 os.makedirs(ICS_CONF)
+        except ICSError as err:
+            # Starting with an empty config would remove all groups and resources from the node
+            logger.critical('{}, restore main.cf from a backup with icsconfig -restore <backup> before starting. '
+                            'When main.cf was edited by hand, remove main.cf.sha256 or use icssys -reload on a '
+                            'running node.'.format(err))
+            sys.exit(1)
 
         if data:
             try:
@@ -1673,6 +3133,13 @@ class NodeSystem(AttributeObject):
         else:
             logger.info('No configuration data found')
 
+        # Changes made after the config file was last written
+        self.journal = ConfigJournal(ICS_CONF_JOURNAL)
+        records = self.journal.records()
+        if records:
+            self.replay_changes(records)
+        AttributeObject.change_journal = self.journal
+
         if self.node_name not in self.attr_value('NodeList'):
             self.attr_append_value('NodeList', self.node_name)
 
@@ -1680,13 +3147,22 @@ class NodeSystem(AttributeObject):
         for host in self.attr_value('NodeList'):
             if host != self.node_name:
                 self.register_node(host)
+        self.catch_up()
+
+        restored = self.restore_states()
 
         self.start_event_handler()
         self.start_poll_updater()
-        self.startup_poll()
-        self.poll_enabled = True
+        if restored:
+            # Accept requests with the restored states while all resources are probed in the background
+            self.start_revalidation()
+        else:
+            self.startup_poll(group_probed=self.grp_online_auto)
+            self.poll_enabled = True
         self.start_config_backup()
-        self.grp_online_auto()
+        self.start_retention()
+        self.start_heartbeat()
+        self.start_state_saver()
 
         logger.info('Server startup complete')
 
@@ -1703,7 +3179,15 @@ class NodeSystem(AttributeObject):
     def shutdown(self):
         """Shutdown systemm."""
         logger.info('Server shutting down...')
-        write_config(ICS_CONF_FILE, self.config_data())
+        try:
+            self.save_states()
+        except (IOError, OSError) as err:
+            logger.error('Unable to save resource states: {}'.format(err))
+        if self.journal is not None:
+            self.compact_config()
+            self.journal.close()
+        else:
+            write_config(ICS_CONF_FILE, self.config_data())
         self.poll_enabled = False
         logger.info('Server shutdown complete')
         logger.shutdown()
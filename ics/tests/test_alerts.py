@@ -0,0 +1,191 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import Pyro4 as Pyro
+
+from ics.alerts import AlertClient
+from ics.alerts import AlertHandler
+from ics.alerts import alert_from_dict
+from ics.alerts import create_test_alert
+from ics.alerts import WARNING
+
+
+class FakeAlertServer:
+
+    def __init__(self):
+        self.batches = []
+
+    def add_alerts(self, alerts):
+        self.batches.append(alerts)
+
+
+class TestAlertClient(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.outbox_file = os.path.join(self.tmp_dir, 'alert_outbox')
+
+    def test_send_alert_batches(self):
+        alert = AlertClient(outbox_file=self.outbox_file, batch_size=10)
+        alert.alert_server_conn = FakeAlertServer()
+        for index in range(25):
+            alert.test('alert {}'.format(index))
+        self.assertTrue(alert.flush(timeout=5))
+        batches = alert.alert_server_conn.batches
+        self.assertEqual(sum(len(batch) for batch in batches), 25)
+        self.assertTrue(all(len(batch) <= 10 for batch in batches))
+
+    def test_spill_when_full(self):
+        alert = AlertClient(outbox_size=1, outbox_file=self.outbox_file)
+        alert.start_sender = lambda: None  # Keep alerts in outbox
+        alert.test('alert 1')
+        alert.test('alert 2')
+        alert.test('alert 3')
+        self.assertEqual(alert.outbox.qsize(), 1)
+        spilled_alerts = alert.unspill()
+        self.assertEqual([alert_dict['msg'] for alert_dict in spilled_alerts], ['alert 2', 'alert 3'])
+        self.assertFalse(os.path.exists(self.outbox_file))
+
+        # Sending file is read again until the alerts have been delivered
+        alert.test('alert 4')
+        self.assertEqual(AlertClient(outbox_file=self.outbox_file).unspill(), spilled_alerts)
+        alert.unspill_done()
+        self.assertEqual([alert_dict['msg'] for alert_dict in alert.unspill()], ['alert 4'])
+
+    def test_deliver_spilled(self):
+        alert = AlertClient(outbox_file=self.outbox_file, batch_size=2)
+        alert.alert_server_conn = FakeAlertServer()
+        alert.spill([create_test_alert('alert {}'.format(index), WARNING).asdict() for index in range(3)])
+        alert.deliver_spilled(alert.unspill())
+        self.assertEqual([len(batch) for batch in alert.alert_server_conn.batches], [2, 1])
+        self.assertEqual(alert.unspill(), [])
+
+    def test_deliver_failures(self):
+        alert = AlertClient(outbox_file=self.outbox_file, retries=1, max_retry_delay=0)
+        alerts = [create_test_alert('alert', WARNING).asdict()]
+        alert.alert_server_conn = mock.Mock()
+        alert.alert_server_conn.add_alerts.side_effect = ValueError('rejected')
+        self.assertTrue(alert.deliver(alerts))
+        self.assertEqual(alert.alert_server_conn.add_alerts.call_count, 1)
+        with open(alert.failed_file) as f:
+            self.assertEqual(len(f.readlines()), 1)
+
+        # Unreachable alert server is retried, then the remaining spilled alerts are spilled again
+        alert.alert_server_conn = None
+        with mock.patch('ics.alerts.time.sleep'), mock.patch('ics.alerts.alert_conn') as conn:
+            conn.return_value.add_alerts.side_effect = Pyro.errors.CommunicationError('unreachable')
+            self.assertFalse(alert.deliver(alerts))
+            self.assertEqual(conn.return_value.add_alerts.call_count, 2)
+            alert.spill(alerts)
+            alert.deliver_spilled(alert.unspill())
+        self.assertEqual(alert.unspill(), alerts)
+
+
+class TestAlertHandler(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.handler = AlertHandler(spool_dir=os.path.join(self.tmp_dir, 'spool'),
+                                    history_file=os.path.join(self.tmp_dir, 'alerts.db'))
+        self.handler.update_alert_settings = lambda: None
+        self.mails = []
+        self.handler.notify = lambda alerts, subject, html, callback=None: self.mails.append(subject)
+
+    def handle(self, msg):
+        self.handler.handle_alert(create_test_alert(msg, WARNING))
+
+    def test_dedup(self):
+        self.handler.dedup_window = 60
+        self.handle('Resource in unknown state')
+        self.handle('Resource in unknown state')
+        self.handle('Resource came online by itself')
+        self.assertEqual(len(self.mails), 2)
+        stats = self.handler.stats()
+        self.assertEqual(stats['received'], 3)
+        self.assertEqual(stats['suppressed'], 1)
+        self.assertEqual(list(stats['suppressed_alerts'].values()), [1])
+        self.assertEqual(self.handler.history_queue.qsize(), 3)
+
+    def test_digest(self):
+        self.handler.digest_size = 3
+        for index in range(4):
+            self.handle('alert {}'.format(index))
+        self.assertEqual(self.mails, ['ICS Alert Digest - 3 alerts'])
+        self.assertEqual(self.handler.stats()['digest_pending'], 1)
+        self.handler.notify_pending_digest(force=True)
+        self.assertEqual(len(self.mails), 2)
+        self.assertEqual(self.handler.stats()['notified'], 4)
+
+    def test_ack_when_sent(self):
+        spool = self.handler.alert_spool
+        spool.put([create_test_alert('alert {}'.format(index), WARNING).asdict() for index in range(2)])
+        callbacks = []
+        self.handler.notify = lambda alerts, subject, html, callback=None: callbacks.append(callback)
+        for _ in range(2):
+            position, alert_dict = spool.get(timeout=0)
+            self.handler.handle_alert(create_test_alert(alert_dict['msg'], WARNING), position)
+        callbacks[0](False)
+        callbacks[1](True)
+        self.assertEqual(spool.pending, set())
+
+        # A failed alert is added to the spool again until it has failed notify_retries times
+        self.handler.notify_retries = 2
+        for attempts in [1, 2]:
+            position, alert_dict = spool.get(timeout=0)
+            self.assertEqual((alert_dict['msg'], alert_dict['attempts']), ('alert 0', attempts))
+            self.handler.handle_alert(alert_from_dict(alert_dict), position)
+            callbacks[-1](False)
+        self.assertIsNone(spool.get(timeout=0))
+        self.assertEqual(spool.pending, set())
+        self.assertEqual(self.handler.stats()['failed'], 1)
+        self.assertEqual(self.handler.stats()['received'], 2)
+
+    def test_prune_history(self):
+        self.handler.alert_history.add([dict(create_test_alert(msg, WARNING).asdict(), time=alert_time)
+                                        for msg, alert_time in [('old', '01/01/2021 10:00:00'),
+                                                                ('new', time.strftime('%m/%d/%Y %H:%M:%S'))]])
+        self.handler.apply_settings({'AlertHistoryDays': '0'})
+        self.handler.prune_history()
+        self.assertEqual(len(self.handler.history()), 2)
+        self.handler.apply_settings({'AlertHistoryDays': '30'})
+        self.handler.prune_history()
+        self.assertEqual([alert['msg'] for alert in self.handler.history()], ['new'])
+
+    def test_settings_cache(self):
+        updates = []
+        self.assertEqual(self.handler.notifiers['mail'].recipients, [])
+        self.assertFalse(self.handler.settings_loaded.is_set())
+
+        # Alert workers wait until the settings have been retrieved from the engine
+        attempts = []
+
+        def update_alert_settings():
+            attempts.append(True)
+            if len(attempts) == 2:  # Engine unavailable on first attempt
+                self.handler.apply_settings({'AlertRecipients': ['a@localhost']})
+
+        self.handler.update_alert_settings = update_alert_settings
+        self.handler.wait_for_settings(retry_interval=0)
+        self.assertEqual(len(attempts), 2)
+        self.assertTrue(self.handler.settings_loaded.is_set())
+
+        self.handler.update_alert_settings = lambda: updates.append(True)
+        self.handler.update_settings({'AlertLevel': 'ERROR', 'AlertRecipients': ['a@localhost']})
+        self.handle('warning alert')
+        self.assertEqual(updates, [])
+        self.assertEqual(self.mails, [])
+        self.assertEqual(self.handler.notifiers['mail'].recipients, ['a@localhost'])
+
+        self.handler.settings_time = 0  # Refresh interval expired
+        self.handle('warning alert')
+        self.assertEqual(updates, [True])
+
+
+if __name__ == '__main__':
+    unittest.main()
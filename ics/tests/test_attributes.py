@@ -46,6 +46,11 @@ class TestAttributeObject(unittest.TestCase):
         self.assertEqual(self.attribute_object.attr_value('attr2'), 'true')
         with self.assertRaises(ics.errors.ICSError):
             self.attribute_object.set_attr('attr99', 'true')
+        with self.assertRaises(ics.errors.ICSError):
+            self.attribute_object.set_attr('attr2', 'yes')
+        with self.assertRaises(ics.errors.ICSError):
+            self.attribute_object.set_attr('attr4', 'value1')
+        self.assertEqual(self.attribute_object.attr_value('attr2'), 'true')
 
     def test_attr_value(self):
         self.assertEqual(self.attribute_object.attr_value('attr2'), 'false')
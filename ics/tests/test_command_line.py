@@ -0,0 +1,92 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import Pyro4 as Pyro
+
+import ics.errors
+from ics.command_line import CommandConnection
+from ics.command_line import parse_batch_line
+from ics.command_line import run_batch
+from ics.system import NodeSystem
+
+
+class TestBatch(unittest.TestCase):
+
+    def test_parse_batch_line(self):
+        self.assertEqual(parse_batch_line('-add proc-a1 group-a', 'icsres'),
+                         ('clus_res_add', ['proc-a1', 'group-a'], {}))
+        self.assertEqual(parse_batch_line('icsgrp -add group-a', 'icsres'),
+                         ('clus_grp_add', ['group-a'], {}))
+        self.assertEqual(parse_batch_line('-modify proc-a1 StartProgram /bin/start -sys a', 'icsres'),
+                         ('clus_res_modify', ['proc-a1', 'StartProgram', '/bin/start -sys a'], {}))
+        self.assertEqual(parse_batch_line('-modify group-a SystemList -append node-a', 'icsgrp'),
+                         ('clus_grp_modify', ['group-a', 'SystemList', 'node-a'], {'append': True}))
+        self.assertEqual(parse_batch_line('-online group-a -sys node-a', 'icsgrp'),
+                         ('clus_grp_online', ['group-a'], {'node': 'node-a'}))
+        self.assertEqual(parse_batch_line('-online proc-a1 -sys node-a', 'icsres'),
+                         ('clus_res_online', ['proc-a1', 'node-a'], {}))
+
+    def test_parse_batch_line_invalid(self):
+        for line in ['-state proc-a1', '-add proc-a1', '-online proc-a1', '-modify proc-a1 Enabled', '"-add']:
+            with self.assertRaises(ics.errors.ICSError):
+                parse_batch_line(line, 'icsres')
+
+    def test_run_batch(self):
+        uds_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, uds_dir)
+        uds_file = os.path.join(uds_dir, 'socket')
+
+        system = NodeSystem()
+        daemon = Pyro.Daemon(unixsocket=uds_file)
+        daemon.register(system, 'system')
+        thread = threading.Thread(target=daemon.requestLoop)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(daemon.shutdown)
+
+        lines = ['icsgrp -add group-a', '-add proc-a1 group-a', '-add proc-a1 group-a', '-add proc-a2 group-a',
+                 '-link proc-a2 proc-a1']
+        commands = []
+        for line_num, line in enumerate(lines, start=1):
+            commands.append((line_num, line) + parse_batch_line(line, 'icsres'))
+
+        cluster = Pyro.Proxy('PYRO:system@./u:' + uds_file)
+        errors = run_batch(cluster, commands)
+        cluster._pyroRelease()
+
+        self.assertEqual([error[0] for error in errors], [3])
+        self.assertEqual(system.res_list(), ['proc-a1', 'proc-a2'])
+        self.assertEqual(system.get_resource('proc-a2').dependencies(), ['proc-a1'])
+
+    def test_command_connection(self):
+        system = NodeSystem()
+        system.grp_add('group-a')
+        requests = []
+
+        class Connection:
+            def execute(self, operations, stop_on_error=False):
+                requests.append([operation[0] for operation in operations])
+                return system.execute(operations, stop_on_error=stop_on_error)
+
+            def __getattr__(self, name):
+                requests.append([name])
+                return getattr(system, name)
+
+        cluster = CommandConnection(Connection(), 'Command: icsgrp -list')
+        self.assertEqual(cluster.clus_grp_list(), ['group-a'])
+        self.assertEqual(cluster.clus_grp_list(), ['group-a'])
+        self.assertEqual(requests, [['clus_log_command', 'clus_grp_list'], ['clus_grp_list']])
+
+        del requests[:]
+        cluster = CommandConnection(Connection(), 'Command: icsgrp -add group-b')
+        cluster.clus_grp_add('group-b')
+        self.assertEqual(requests, [['clus_log_command'], ['clus_grp_add']])
+        with self.assertRaises(ics.errors.ICSError):
+            CommandConnection(Connection(), 'Command: icsgrp -value').clus_grp_value('group-c', 'Enabled')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from ics.history import AlertHistory, alert_timestamp
+
+
+def alert_dict(resource, group, msg, alert_time):
+    return {'resource': resource, 'group': group, 'node': 'node-a', 'level': 20, 'msg': msg, 'time': alert_time}
+
+
+class TestAlertHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.history = AlertHistory(os.path.join(self.tmp_dir, 'alerts.db'))
+        self.history.add([
+            alert_dict('proc-a1', 'group-a', 'first', '01/01/2021 10:00:00'),
+            alert_dict('proc-a2', 'group-a', 'second', '01/01/2021 11:00:00'),
+            alert_dict('proc-b1', 'group-b', 'third', '01/01/2021 12:00:00')
+        ])
+
+    def test_query(self):
+        self.assertEqual([alert['msg'] for alert in self.history.query()], ['third', 'second', 'first'])
+        self.assertEqual([alert['msg'] for alert in self.history.query(limit=1)], ['third'])
+
+    def test_query_filter(self):
+        self.assertEqual([alert['msg'] for alert in self.history.query(resource='proc-a1')], ['first'])
+        self.assertEqual([alert['msg'] for alert in self.history.query(group='group-a')], ['second', 'first'])
+        since = alert_timestamp('01/01/2021 11:00:00')
+        self.assertEqual([alert['msg'] for alert in self.history.query(group='group-a', since=since)], ['second'])
+
+    def test_prune(self):
+        self.assertEqual(self.history.prune(alert_timestamp('01/01/2021 11:00:00')), 1)
+        self.assertEqual([alert['msg'] for alert in self.history.query()], ['third', 'second'])
+
+    def test_reopen(self):
+        history = AlertHistory(self.history.db_file)
+        self.assertEqual(len(history.query()), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
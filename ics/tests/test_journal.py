@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from ics.attributes import AttributeObject
+from ics.journal import ConfigJournal
+from ics.system import NodeSystem
+
+
+class TestConfigJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.filename = os.path.join(self.directory, 'main.cf.journal')
+
+    def test_append_batch(self):
+        journal = ConfigJournal(self.filename, compact_size=3)
+        journal.append([{'op': 'grp_add', 'name': 'a'}])
+        with journal.batch():
+            journal.append([{'op': 'grp_add', 'name': 'b'}])
+            journal.append([{'op': 'grp_add', 'name': 'c'}])
+            self.assertEqual(len(ConfigJournal.read(self.filename)), 1)
+        self.assertEqual([record['name'] for record in journal.records()], ['a', 'b', 'c'])
+        self.assertTrue(journal.compact_event.is_set())
+
+    def test_partial_record(self):
+        with open(self.filename, 'w') as f:
+            f.write('{"op": "grp_add", "name": "a"}\n{"op": "grp_a')
+        journal = ConfigJournal(self.filename)
+        journal.append([{'op': 'grp_add', 'name': 'b'}])
+        self.assertEqual([record['name'] for record in journal.records()], ['a', 'b'])
+
+    def test_rotate(self):
+        journal = ConfigJournal(self.filename)
+        journal.append([{'op': 'grp_add', 'name': 'a'}])
+        self.assertTrue(journal.rotate())
+        journal.append([{'op': 'grp_add', 'name': 'b'}])
+        self.assertEqual(journal.count, 1)
+        self.assertEqual([record['name'] for record in journal.records()], ['a', 'b'])
+
+        # Compaction did not complete, records are kept in the rotated journal
+        self.assertTrue(journal.rotate())
+        self.assertEqual([record['name'] for record in journal.records()], ['a', 'b'])
+        journal.remove_rotated()
+        self.assertEqual(journal.records(), [])
+
+
+class TestJournalReplay(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.addCleanup(setattr, AttributeObject, 'change_journal', None)
+        self.journal = ConfigJournal(os.path.join(self.directory, 'main.cf.journal'))
+
+    def test_replay(self):
+        system = NodeSystem()
+        system.grp_add('group-a')
+        system.res_add('proc-a1', 'group-a')
+        config_data = system.config_data()
+
+        AttributeObject.change_journal = self.journal
+        system.grp_add('group-b')
+        system.res_add_many([('proc-b1', 'group-b'), ('proc-b2', 'group-b')])
+        system.res_link('proc-b2', 'proc-b1')
+        system.res_modify('proc-b1', 'StartProgram', 'start')
+        system.grp_modify('group-b', 'SystemList', ['node1'])
+        system.res_delete('proc-a1')
+        system.res_add('proc-a1', 'group-a')
+        system.res_modify('proc-a1', 'StopProgram', 'stop')
+        AttributeObject.change_journal = None
+
+        # Restart from the config written before the changes
+        restarted = NodeSystem()
+        restarted.load_config(config_data)
+        restarted.replay_changes(self.journal.records())
+        self.assertEqual(restarted.config_data(), system.config_data())
+
+        # Replaying changes already included in the config gives the same config
+        restarted.replay_changes(self.journal.records())
+        self.assertEqual(restarted.config_data(), system.config_data())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import socketserver
+import threading
+import unittest
+
+from ics import mail
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """Minimal SMTP server session recording received messages."""
+
+    def reply(self, line):
+        self.wfile.write((line + '\r\n').encode())
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.reply('220 localhost test SMTP')
+        recipients = []
+        while True:
+            line = self.rfile.readline().decode().rstrip('\r\n')
+            command = line[:4].upper()
+            if not line or command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            elif command in ('HELO', 'EHLO'):
+                self.reply('250 localhost')
+            elif command == 'MAIL':
+                recipients = []
+                self.reply('250 OK')
+            elif command == 'RCPT':
+                recipients.append(line.split(':', 1)[1].strip('<> '))
+                self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline().rstrip(b'\r\n') != b'.':
+                    pass
+                server.messages.append(recipients)
+                self.reply('250 OK')
+                if server.close_after_message:
+                    return
+            else:
+                self.reply('250 OK')
+
+
+class SMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        socketserver.ThreadingTCPServer.__init__(self, ('localhost', 0), SMTPHandler)
+        self.connections = 0
+        self.messages = []
+        self.close_after_message = False
+
+
+class TestSMTPConnection(unittest.TestCase):
+
+    def setUp(self):
+        self.server = SMTPServer()
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.port = self.server.server_address[1]
+
+    def test_connection_reuse(self):
+        connection = mail.SMTPConnection(port=self.port)
+        for index in range(3):
+            connection.sendmail('ics@localhost', ['a@localhost', 'b@localhost'], 'message {}'.format(index))
+        connection.close()
+        self.assertEqual(self.server.messages, [['a@localhost', 'b@localhost']] * 3)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_reconnect(self):
+        self.server.close_after_message = True
+        connection = mail.SMTPConnection(port=self.port)
+        for index in range(2):
+            connection.sendmail('ics@localhost', ['a@localhost'], 'message {}'.format(index))
+        connection.close()
+        self.assertEqual(len(self.server.messages), 2)
+        self.assertEqual(self.server.connections, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer  # Python2 version
+
+from ics import notifiers
+from ics.tests.test_mail import SMTPServer
+
+
+def notification(count=1):
+    alerts = [{'resource': 'proc-a1', 'group': 'group-a', 'node': 'node-a', 'level': 20, 'msg': 'alert {}'.format(i),
+               'time': '01/01/2021 10:00:00'} for i in range(count)]
+    return notifiers.Notification(alerts, 'ICS Warning Alert - proc-a1', '<p>alert</p>')
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        length = int(self.headers['Content-Length'])
+        self.server.requests.append(json.loads(self.rfile.read(length).decode()))
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class TestNotifiers(unittest.TestCase):
+
+    def start_server(self, server):
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server.server_address[1]
+
+    def test_mail(self):
+        server = SMTPServer()
+        notifier = notifiers.MailNotifier(workers=1, port=self.start_server(server))
+        notifier.configure({'AlertRecipients': ['a@localhost', 'b@localhost']})
+        for _ in range(3):
+            notifier.notify(notification())
+        notifier.wait()
+        self.assertEqual(server.messages, [['a@localhost', 'b@localhost']] * 3)
+        self.assertEqual(server.connections, 1)
+        self.assertEqual(notifier.stats()['sent'], 3)
+
+        # Without recipients the notification fails, so its alerts are not acknowledged
+        callbacks = []
+        notifier = notifiers.MailNotifier(workers=1, port=self.start_server(SMTPServer()), retries=0)
+        notifier.notify(notification(), callback=callbacks.append)
+        notifier.wait()
+        self.assertEqual(callbacks, [False])
+
+    def test_webhook(self):
+        server = HTTPServer(('localhost', 0), WebhookHandler)
+        server.requests = []
+        notifier = notifiers.WebhookNotifier()
+        notifier.configure({'AlertWebhookURL': 'http://localhost:{}/alerts'.format(self.start_server(server))})
+        notifier.notify(notification(2))
+        notifier.wait()
+        self.assertEqual(server.requests[0]['subject'], 'ICS Warning Alert - proc-a1')
+        self.assertEqual(len(server.requests[0]['alerts']), 2)
+
+    def test_script(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        output_file = os.path.join(tmp_dir, 'output')
+        notifier = notifiers.ScriptNotifier(retries=1, retry_delay=0)
+        notifier.configure({'AlertScript': 'cat > {}; test $ICS_ALERT_COUNT = 2'.format(output_file)})
+        notifier.notify(notification(2))
+        notifier.wait()
+        callbacks = []
+        notifier.configure({'AlertScript': 'echo $$ >> {}.attempts; exit 1'.format(output_file)})
+        notifier.notify(notification(1), callback=callbacks.append)
+        notifier.wait()
+        self.assertEqual(callbacks, [False])
+        with open(output_file + '.attempts') as f:
+            self.assertEqual(len(f.readlines()), 2)
+        with open(output_file) as f:
+            self.assertEqual(len(json.load(f)), 2)
+        stats = notifier.stats()
+        self.assertEqual((stats['sent'], stats['failed']), (1, 1))
+
+    def test_queue_full(self):
+        blocked = threading.Event()
+        notifier = notifiers.Notifier(queue_size=1, queue_timeout=0.1)
+        notifier.send = lambda notification: blocked.wait()
+        callbacks = []
+        for _ in range(3):
+            notifier.notify(notification(), callback=callbacks.append)
+        self.assertGreaterEqual(notifier.stats()['dropped'], 1)
+        blocked.set()
+        notifier.wait()
+        self.assertEqual(len(callbacks), 3)
+        self.assertEqual(callbacks.count(False), notifier.stats()['dropped'])
+
+    def test_queue_wait(self):
+        released = threading.Event()
+        threading.Timer(0.2, released.set).start()
+        notifier = notifiers.Notifier(queue_size=1, queue_timeout=10)
+        notifier.send = lambda notification: released.wait()
+        callbacks = []
+        for _ in range(3):
+            notifier.notify(notification(), callback=callbacks.append)
+        notifier.wait()
+        self.assertEqual(callbacks, [True] * 3)
+        self.assertEqual(notifier.stats()['dropped'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from ics.output import OutputBuffer, OutputCapture
+
+
+class TestOutputBuffer(unittest.TestCase):
+
+    def test_append(self):
+        buffer = OutputBuffer(10)
+        for line in ['aaaa', 'bbbb', 'cccc']:
+            buffer.append(line)
+        self.assertEqual(list(buffer.lines), ['bbbb', 'cccc'])
+        self.assertEqual(buffer.size, 8)
+
+
+class TestOutputCapture(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.log_file = os.path.join(self.tmp_dir, 'resource.log')
+        patcher = mock.patch('ics.output.resource_log_name', return_value=self.log_file)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def wait_for_output(self, capture, resource_name, count):
+        end_time = time.time() + 5
+        while len(capture.output(resource_name)) < count and time.time() < end_time:
+            time.sleep(0.05)
+        return capture.output(resource_name)
+
+    def wait_for_log(self, count):
+        end_time = time.time() + 5
+        while time.time() < end_time:
+            if os.path.exists(self.log_file):
+                with open(self.log_file) as f:
+                    lines = f.readlines()
+                if len(lines) >= count:
+                    return lines
+            time.sleep(0.05)
+        return []
+
+    def test_capture(self):
+        capture = OutputCapture(write_interval=0.1)
+        process = subprocess.Popen(['sh', '-c', 'echo one; echo two >&2; printf three'],
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        capture.add('proc-a1', 'poll', process)
+        process.wait()
+
+        lines = self.wait_for_output(capture, 'proc-a1', 3)
+        self.assertEqual(sorted(line.split(' ', 2)[2] for line in lines),
+                         ['proc-a1 poll stderr: two', 'proc-a1 poll stdout: one', 'proc-a1 poll stdout: three'])
+        self.assertEqual(capture.output('proc-b1'), [])
+
+        self.assertEqual(len(self.wait_for_log(3)), 3)
+
+        capture.remove('proc-a1')
+        self.assertEqual(capture.output('proc-a1'), [])
+
+    def test_capture_detached(self):
+        capture = OutputCapture(write_interval=0.1, output_dir=os.path.join(self.tmp_dir, 'output'))
+        process = capture.run('proc-a1', 'start', ['sh', '-c', 'echo one; echo two >&2; (sleep 1; echo late) &'],
+                              detach=True)
+        self.assertEqual(os.getsid(process.pid), process.pid)
+        process.wait()
+
+        lines = self.wait_for_output(capture, 'proc-a1', 2)
+        self.assertEqual(sorted(line.split(' ', 2)[2] for line in lines),
+                         ['proc-a1 start stderr: two', 'proc-a1 start stdout: one'])
+        end_time = time.time() + 5
+        while capture._files and time.time() < end_time:
+            time.sleep(0.05)
+        self.assertEqual(capture._files, [])  # Files are closed once the command exits, daemon keeps writing
+        output_file = capture.output_file('proc-a1', 'start', 'stdout')
+        end_time = time.time() + 5
+        while os.path.getsize(output_file) < len('one\nlate\n') and time.time() < end_time:
+            time.sleep(0.05)
+        with open(output_file) as f:
+            self.assertEqual(f.read(), 'one\nlate\n')
+
+        # Output files are replaced when the command runs again
+        capture.run('proc-a1', 'start', ['true'], detach=True).wait()
+        self.assertEqual(os.path.getsize(output_file), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
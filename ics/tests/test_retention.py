@@ -0,0 +1,77 @@
+import gzip
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from ics.retention import RetentionPolicy, BACKUP_SUFFIX, LOG_SUFFIX, file_hash
+
+
+class TestRetentionPolicy(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.now = time.time()
+
+    def create(self, name, content='data', age=3600):
+        filename = os.path.join(self.directory, name)
+        with open(filename, 'w') as f:
+            f.write(content)
+        mtime = self.now - age
+        os.utime(filename, (mtime, mtime))
+        return filename
+
+    def test_files(self):
+        self.create('resource.log.2020-01-01_01')
+        self.create('resource.log.2020-01-01_00.gz')
+        self.create('resource.log.other')
+        self.create('alerts.log.2020-01-01_00')
+        policy = RetentionPolicy(os.path.join(self.directory, 'resource.log'), LOG_SUFFIX)
+        self.assertEqual([os.path.basename(filename) for filename in policy.files()],
+                         ['resource.log.2020-01-01_00.gz', 'resource.log.2020-01-01_01'])
+
+    def test_count_age_size(self):
+        for hour in range(6):
+            self.create('resource.log.2020-01-01_0{}'.format(hour), content='x' * 100, age=(6 - hour) * 3600)
+        base_name = os.path.join(self.directory, 'resource.log')
+
+        policy = RetentionPolicy(base_name, LOG_SUFFIX, max_age=5 * 3600 + 60, compress=False)
+        self.assertEqual(policy.apply(now=self.now)['removed'], 1)
+        policy = RetentionPolicy(base_name, LOG_SUFFIX, max_count=4, compress=False)
+        self.assertEqual(policy.apply(now=self.now)['removed'], 1)
+        policy = RetentionPolicy(base_name, LOG_SUFFIX, max_size=250, compress=False)
+        self.assertEqual(policy.apply(now=self.now)['removed'], 2)
+        self.assertEqual([os.path.basename(filename) for filename in policy.files()],
+                         ['resource.log.2020-01-01_04', 'resource.log.2020-01-01_05'])
+
+    def test_compress(self):
+        self.create('resource.log.2020-01-01_00', content='old')
+        active = self.create('resource.log.2020-01-01_01', content='current')
+        recent = self.create('main.cf.200101_000000', content='recent', age=0)
+        policy = RetentionPolicy(os.path.join(self.directory, 'resource.log'), LOG_SUFFIX, active=lambda: active)
+        self.assertEqual(policy.apply(now=self.now)['compressed'], 1)
+        with gzip.open(os.path.join(self.directory, 'resource.log.2020-01-01_00.gz'), 'rt') as f:
+            self.assertEqual(f.read(), 'old')
+        self.assertTrue(os.path.exists(active))
+
+        policy = RetentionPolicy(os.path.join(self.directory, 'main.cf'), BACKUP_SUFFIX)
+        self.assertEqual(policy.apply(now=self.now)['compressed'], 0)
+        self.assertTrue(os.path.exists(recent))
+
+    def test_dedupe(self):
+        self.create('main.cf.200101_000000', content='a')
+        self.create('main.cf.200101_000100', content='a')
+        self.create('main.cf.200101_000200', content='b')
+        self.create('main.cf.200101_000300', content='a')
+        policy = RetentionPolicy(os.path.join(self.directory, 'main.cf'), BACKUP_SUFFIX, dedupe=True)
+        self.assertEqual(policy.apply(now=self.now), {'removed': 1, 'compressed': 3})
+        self.assertEqual([os.path.basename(filename) for filename in policy.files()],
+                         ['main.cf.200101_000000.gz', 'main.cf.200101_000200.gz', 'main.cf.200101_000300.gz'])
+        self.assertEqual(file_hash(policy.latest()),
+                         file_hash(os.path.join(self.directory, 'main.cf.200101_000000.gz')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import shutil
+import tempfile
+import unittest
+
+from ics.spool import Spool
+
+
+class TestSpool(unittest.TestCase):
+
+    def setUp(self):
+        self.spool_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.spool_dir)
+
+    def test_put_get(self):
+        spool = Spool(self.spool_dir)
+        spool.put([{'msg': 'a'}, {'msg': 'b'}])
+        self.assertEqual(spool.get(timeout=0)[1], {'msg': 'a'})
+        self.assertEqual(spool.get(timeout=0)[1], {'msg': 'b'})
+        self.assertIsNone(spool.get(timeout=0))
+
+    def test_redeliver_unacked(self):
+        spool = Spool(self.spool_dir)
+        spool.put([{'msg': 'a'}, {'msg': 'b'}, {'msg': 'c'}])
+        position_a, _ = spool.get(timeout=0)
+        spool.get(timeout=0)
+        position_c, _ = spool.get(timeout=0)
+        spool.ack(position_a)
+        spool.ack(position_c)
+        spool.flush_ack()
+
+        spool = Spool(self.spool_dir)  # Restart
+        self.assertEqual(spool.get(timeout=0)[1], {'msg': 'b'})
+        self.assertEqual(spool.get(timeout=0)[1], {'msg': 'c'})
+        self.assertIsNone(spool.get(timeout=0))
+
+    def test_remove_acked_segments(self):
+        spool = Spool(self.spool_dir, segment_size=1, ack_batch=1)
+        spool.put([{'msg': 'a'}])
+        spool.put([{'msg': 'b'}])
+        self.assertEqual(len(spool.segments()), 2)
+        for _ in range(2):
+            spool.ack(spool.get(timeout=0)[0])
+        self.assertEqual(len(spool.segments()), 1)  # Segment of last acknowledged record
+        self.assertEqual(spool.backlog(), 0)
+
+    def test_batch_ack(self):
+        spool = Spool(self.spool_dir, ack_batch=3, ack_interval=60)
+        spool.put([{'msg': str(index)} for index in range(4)])
+        positions = [spool.get(timeout=0)[0] for _ in range(4)]
+        for position in positions[:2]:
+            spool.ack(position)
+        self.assertIsNone(spool.load_ack())
+        spool.ack(positions[2])
+        self.assertEqual(spool.load_ack(), positions[3])
+
+        spool.ack(positions[3])
+        self.assertIsNone(spool.get(timeout=0))  # Saved when no record is available
+        self.assertEqual(spool.load_ack(), (spool.read_segment, spool.read_offset))
+
+    def test_skip_partial_record(self):
+        spool = Spool(self.spool_dir)
+        spool.put([{'msg': 'a'}])
+        with open(spool.segment_file(spool.write_segment), 'a') as f:
+            f.write('{"msg": ')  # Crash while writing record
+
+        spool = Spool(self.spool_dir)
+        spool.put([{'msg': 'b'}])
+        self.assertEqual(spool.get(timeout=0)[1], {'msg': 'a'})
+        self.assertEqual(spool.get(timeout=0)[1], {'msg': 'b'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,16 @@
+import os
+import shutil
+import tempfile
 import unittest
+from unittest import mock
 
 import Pyro4 as Pyro
 
 import ics.errors
+import ics.journal
+import ics.retention
 import ics.states
+import ics.utils
 from ics.resource import Group
 from ics.resource import Resource
 from ics.system import NodeSystem
@@ -53,10 +60,41 @@ class TestNodeSystem(unittest.TestCase):
 
         self.assertEqual(['test_host2'], self.system.attr_value('NodeList'))
 
+    def test_node_modify_alert_settings(self):
+        pushes = []
+        self.system.start_alert_settings_push = lambda: pushes.append(True)
+        self.assertTrue(self.system.node_modify('BackupInterval', '5'))
+        self.assertEqual(pushes, [])
+        self.assertTrue(self.system.node_modify('AlertLevel', 'ERROR'))
+        self.assertEqual(pushes, [True])
+
     @unittest.skip
     def test_heartbeat(self):
         self.fail()
 
+    def test_grp_online_list(self):
+        self.setup_simple_group()
+        self.assertEqual(self.system.grp_online_list(), [])
+        self.system.res_modify('proc-a1', 'Enabled', 'true')
+        self.system.get_resource('proc-a1').state = ics.states.ResourceStates.ONLINE
+        self.assertEqual(self.system.grp_online_list(), ['group-a'])
+
+    def test_failover_coordinator(self):
+        self.system.node_name = 'node-b'
+        self.system.add_node('node-a')
+        self.system.add_node('node-c')
+        self.assertEqual(self.system.failover_coordinator(), 'node-a')
+        self.system.lost_nodes.add('node-a')
+        self.assertEqual(self.system.failover_coordinator(), 'node-b')
+
+    def test_grp_clus_load_lost_node(self):
+        self.setup_simple_group()
+        self.system.add_node('node-a')
+        self.system.lost_nodes.add('node-a')
+        self.system.grp_modify('group-a', 'SystemList', self.system.node_name, append=True)
+        self.system.grp_modify('group-a', 'SystemList', 'node-a', append=True)
+        self.assertEqual(self.system.grp_clus_load('group-a'), {self.system.node_name: 0})
+
     @unittest.skip
     def test_clus_res_online(self):
         self.fail()
@@ -185,6 +223,28 @@ class TestNodeSystem(unittest.TestCase):
     def test_clus_grp_attr(self):
         self.fail()
 
+    def test_execute(self):
+        self.setup_simple_group()
+        self.system.res_link('proc-a2', 'proc-a1')
+        operations = [
+            ['res_value', ['proc-a1', 'Group']],
+            ['grp_state', ['group-a']],
+            ['res_dep', [['proc-a2']]],
+            ['res_value', ['proc-a99', 'Group']],
+            ['shutdown'],
+            ['res_state_many', [['proc-a1']], {'include_node': False}]
+        ]
+        results = self.system.execute(operations)
+        self.assertEqual(results[0], {'result': 'group-a'})
+        self.assertEqual(results[1], {'result': 'OFFLINE'})
+        self.assertEqual(results[2], {'result': [['group-a', 'proc-a2', 'proc-a1']]})
+        self.assertIn('error', results[3])
+        self.assertIn('error', results[4])
+        self.assertIn('error', results[5])
+
+        results = self.system.execute(operations, stop_on_error=True)
+        self.assertEqual(len(results), 4)
+
     def test_set_attr(self):
         self.system.set_attr('ResourceLimit', '12345')
         self.assertEqual(self.system.attr_value('ResourceLimit'), '12345')
@@ -252,6 +312,43 @@ class TestNodeSystem(unittest.TestCase):
         with self.assertRaises(ics.errors.ICSError):
             self.system.res_add(resource_name, group_name)
 
+    def test_res_add_many(self):
+        self.system.grp_add('group-a')
+        self.system.res_add_many([['proc-a1', 'group-a'], ['proc-a2', 'group-a']])
+        self.assertEqual(self.system.grp_resources('group-a'), ['proc-a1', 'proc-a2'])
+
+        # No resources are added when any resource is invalid
+        with self.assertRaises(ics.errors.ICSError):
+            self.system.res_add_many([['proc-a3', 'group-a'], ['proc-a1', 'group-a']])
+        with self.assertRaises(ics.errors.ICSError):
+            self.system.res_add_many([['proc-a3', 'group-a'], ['proc-a3', 'group-a']])
+        with self.assertRaises(ics.errors.ICSError):
+            self.system.res_add_many([['proc-a3', 'group-a'], ['proc-b1', 'group-b']])
+        self.assertEqual(self.system.res_list(), ['proc-a1', 'proc-a2'])
+
+    def test_res_modify_many(self):
+        self.setup_simple_group()
+        self.system.res_modify_many([['proc-a1', 'Enabled', 'true'], ['proc-a2', 'Load', '5']])
+        self.assertEqual(self.system.res_value('proc-a1', 'Enabled'), 'true')
+        self.assertEqual(self.system.res_value('proc-a2', 'Load'), '5')
+
+        with self.assertRaises(ics.errors.ICSError):
+            self.system.res_modify_many([['proc-a3', 'Enabled', 'true'], ['proc-a3', 'Invalid', 'true']])
+        self.assertEqual(self.system.res_value('proc-a3', 'Enabled'), 'false')
+
+    def test_res_link_many(self):
+        self.setup_simple_group()
+        self.system.res_link_many([['proc-a2', 'proc-a1'], ['proc-a3', 'proc-a1']])
+        self.assertEqual(self.system.get_resource('proc-a2').dependencies(), ['proc-a1'])
+        self.assertEqual(self.system.get_resource('proc-a3').dependencies(), ['proc-a1'])
+
+        for links in [[['proc-a3', 'proc-a2'], ['proc-a2', 'proc-a1']],
+                      [['proc-a3', 'proc-a2'], ['proc-a3', 'proc-b1']],
+                      [['proc-a3', 'proc-a2'], ['proc-a3', 'proc-a3']]]:
+            with self.assertRaises(ics.errors.ICSError):
+                self.system.res_link_many(links)
+        self.assertEqual(self.system.get_resource('proc-a3').dependencies(), ['proc-a1'])
+
     def test_res_delete(self):
         self.setup_simple_group()
         resource_name = 'proc-a1'
@@ -462,6 +559,244 @@ class TestNodeSystem(unittest.TestCase):
         resource.state = ics.states.ResourceStates.ONLINE
         self.assertEqual(3, self.system.load())
 
+    def test_reload_config(self):
+        self.setup_simple_group()
+        self.system.res_link('proc-a2', 'proc-a1')
+        self.system.res_link('proc-b2', 'proc-b1')
+        resource = self.system.get_resource('proc-a1')
+        resource.state = ics.states.ResourceStates.ONLINE
+
+        data = self.system.config_data()
+        del data['resources']['proc-c3']
+        data['resources']['proc-b2']['dependencies'] = []
+        data['resources']['proc-a3']['dependencies'] = ['proc-a2']
+        data['resources']['proc-a2']['attributes']['StartProgram'] = 'start'
+        data['resources']['proc-b3']['attributes']['Group'] = 'group-c'
+        data['resources']['proc-d1'] = {'attributes': {'Group': 'group-d', 'Enabled': 'true'}, 'dependencies': []}
+        data['groups']['group-d'] = {'attributes': {'SystemList': ['node1']}}
+        config_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, config_dir)
+        ics.utils.write_config(os.path.join(config_dir, 'main.cf'), data)
+
+        applied = self.system.reload_config(os.path.join(config_dir, 'main.cf'))
+        self.assertEqual(applied, ['grp_add group-d', 'grp_modify group-d SystemList [\'node1\']',
+                                   'res_unlink proc-b2 proc-b1', 'res_delete proc-b3', 'res_delete proc-c3',
+                                   'res_add proc-b3 group-c', 'res_add proc-d1 group-d',
+                                   'res_modify proc-a2 StartProgram start', 'res_modify proc-d1 Enabled true',
+                                   'res_link proc-a3 proc-a2'])
+        self.assertEqual(self.system.config_data(), data)
+        self.assertIs(self.system.get_resource('proc-a1'), resource)
+        self.assertEqual(resource.state, ics.states.ResourceStates.ONLINE)
+        self.assertEqual(self.system.reload_config(os.path.join(config_dir, 'main.cf')), [])
+
+        # Changes are replicated without holding the config lock, a failed change stops the reload and is reported
+        data['groups']['group-e'] = {'attributes': {'AutoStart': 'true'}}
+        data['groups']['group-a']['attributes']['AutoStart'] = 'true'
+        ics.utils.write_config(os.path.join(config_dir, 'main.cf'), data)
+        clus_grp_modify = self.system.clus_grp_modify
+
+        def grp_modify(group_name, attr_name, value):
+            self.assertFalse(self.system.config_lock._is_owned())
+            if group_name == 'group-e':
+                raise ics.errors.ICSError('Unable to replicate')
+            clus_grp_modify(group_name, attr_name, value)
+
+        with mock.patch.object(self.system, 'clus_grp_modify', side_effect=grp_modify):
+            with self.assertRaises(ics.errors.ICSError) as context:
+                self.system.reload_config(os.path.join(config_dir, 'main.cf'))
+        self.assertIn('Applied: grp_add group-e, grp_modify group-a AutoStart true', str(context.exception))
+        self.assertIn('Not applied: grp_modify group-e AutoStart true', str(context.exception))
+
+    def test_save_restore_states(self):
+        self.setup_simple_group()
+        self.system.grp_modify('group-b', 'AutoStart', 'true')
+        for resource in self.system.resources.values():
+            resource.set_attr('Enabled', 'true')
+            resource.state = ics.states.ResourceStates.ONLINE
+        self.system.get_resource('proc-a2').state = ics.states.ResourceStates.STARTING
+        self.system.get_resource('proc-a3').last_poll = 0  # Too old to be reused
+        state_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, state_dir)
+        patcher = mock.patch('ics.system.ICS_STATE_FILE', os.path.join(state_dir, 'states.json'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.system.save_states()
+
+        restarted = NodeSystem()
+        restarted.load_config(self.system.config_data())
+        self.assertEqual(restarted.restore_states(), 7)
+        resource = restarted.get_resource('proc-a1')
+        self.assertIs(resource.state, ics.states.ResourceStates.ONLINE)
+        self.assertTrue(resource.provisional)
+        self.assertEqual(restarted.res_state('proc-a1'), 'ONLINE')
+        self.assertEqual(restarted.clus_res_provisional('proc-a1'), {restarted.attr_value('NodeName'): True})
+        self.assertFalse(restarted.res_provisional('proc-a2'))
+        self.assertIs(restarted.get_resource('proc-a2').state, ics.states.ResourceStates.UNKNOWN)
+        self.assertIs(restarted.get_resource('proc-a3').state, ics.states.ResourceStates.UNKNOWN)
+
+        # Dependencies are probed first, restored states only order resources at the same dependency level
+        restarted.res_link('proc-a2', 'proc-a1')
+        order = [resource.name for _, resources in restarted.revalidation_order() for resource in resources]
+        self.assertEqual(sorted(order[:3]), ['proc-b1', 'proc-b2', 'proc-b3'])
+        self.assertEqual(order[3:6], ['proc-a3', 'proc-a1', 'proc-a2'])
+
+    def test_changes_since(self):
+        self.setup_simple_group()
+        self.system.res_link('proc-a2', 'proc-a1')
+        seq = self.system.changes_since(0)['seq']
+        self.assertEqual(self.system.changes_since(seq), {'seq': seq, 'system': {'attributes': {}}, 'groups': {},
+                                                          'resources': {}, 'deleted': {'groups': [], 'resources': []}})
+
+        self.system.grp_modify('group-a', 'AutoStart', 'true')
+        self.system.res_modify('proc-b1', 'StartProgram', 'start')
+        self.system.res_delete('proc-a1')
+        self.system.res_add('proc-a4', 'group-a')
+        changes = self.system.changes_since(seq)
+        self.assertGreater(changes['seq'], seq)
+        self.assertEqual(changes['groups'], {'group-a': {'attributes': {'AutoStart': 'true'}}})
+        self.assertEqual(changes['resources'], {
+            'proc-a2': {'attributes': {}, 'dependencies': []},
+            'proc-a4': {'attributes': {'Group': 'group-a'}, 'dependencies': []},
+            'proc-b1': {'attributes': {'StartProgram': 'start'}}
+        })
+        self.assertEqual(changes['deleted'], {'groups': [], 'resources': ['proc-a1']})
+        self.assertEqual(self.system.changed_groups(seq), {'group-a', 'group-b'})
+        self.assertEqual(self.system.changes_since(changes['seq'])['resources'], {})
+
+        self.system.prune_deleted(changes['seq'])
+        self.assertEqual(self.system.deleted, {'groups': {}, 'resources': {}})
+        self.assertEqual(self.system.changes_since(changes['seq'])['deleted'], {'groups': [], 'resources': []})
+        with self.assertRaises(ics.errors.ICSError):
+            self.system.changes_since(seq)
+        self.assertIn('proc-a4', self.system.changes_since(0)['resources'])
+
+        # Changes since 0 are the full config, including groups and resources loaded from the config file
+        loaded = NodeSystem()
+        loaded.load_config(self.system.config_data())
+        changes = loaded.changes_since(0)
+        data = loaded.config_data()
+        self.assertEqual(changes['groups'], data['groups'])
+        self.assertEqual(changes['resources'], data['resources'])
+        self.assertEqual(changes['system'], data['system'])
+        loaded.res_delete('proc-a4')
+        self.assertEqual(loaded.changes_since(0)['deleted'], {'groups': [], 'resources': []})
+
+    def test_config_replication(self):
+        peer = NodeSystem()
+        self.system.remote_nodes['peer'] = peer
+        self.system.clus_grp_add('group-a')
+        self.system.clus_res_add('proc-a1', 'group-a')
+        self.system.clus_grp_modify('group-a', 'AutoStart', 'true')
+        self.assertEqual(peer.config_version, 3)
+        self.assertEqual(peer.config_data(), self.system.config_data())
+        peer.clus_grp_add('group-a', remote=True, version=1, origin=self.system.node_name)  # Already applied
+        self.assertEqual([mutation['method'] for mutation in peer.mutations_since(1)],
+                         ['clus_res_add', 'clus_grp_modify'])
+
+        # A node which missed mutations catches up from the mutation log, or a snapshot when too far behind
+        with mock.patch('ics.system.Pyro.Proxy') as proxy:
+            proxy.return_value.__enter__.return_value = self.system
+            rejoined = NodeSystem()
+            rejoined.remote_nodes['node'] = mock.Mock()
+            self.assertEqual(rejoined.catch_up(), 3)
+            self.assertEqual(rejoined.config_data(), self.system.config_data())
+
+            self.system.set_attr('MutationLogSize', '1')
+            self.system.clus_res_add('proc-a2', 'group-a')
+            self.assertIsNone(self.system.mutations_since(0))
+            rejoined = NodeSystem()
+            rejoined.remote_nodes['node'] = mock.Mock()
+            self.assertEqual(rejoined.catch_up(), 4)
+            self.assertEqual(rejoined.config_data()['resources'], self.system.config_data()['resources'])
+
+            # An invalid snapshot is logged and skipped
+            rejoined = NodeSystem()
+            rejoined.remote_nodes['node'] = mock.Mock()
+            with mock.patch.object(rejoined, 'apply_snapshot', side_effect=ics.errors.ICSError('invalid')):
+                self.assertEqual(rejoined.catch_up(), 0)
+
+    def test_config_conflicts(self):
+        # Nodes which were not able to reach each other both made config version 1
+        self.system.node_name = 'node1'
+        self.system.clus_grp_add('group-a')
+        self.system.clus_res_add('proc-a1', 'group-a')
+        peer = NodeSystem()
+        peer.node_name = 'node2'
+        peer.clus_grp_add('group-b')
+        with mock.patch('ics.system.Pyro.Proxy') as proxy:
+            proxy.return_value.__enter__.return_value = self.system
+            peer.remote_nodes['node1'] = mock.Mock()
+            with self.assertLogs('ics.system', level='WARNING') as logs:
+                self.assertEqual(peer.catch_up(), 2)
+        self.assertIn('Config version 1 from node1 conflicts with config version 1 from node2', logs.output[0])
+        self.assertEqual(sorted(peer.groups), ['group-a', 'group-b'])
+        self.assertIn('proc-a1', peer.resources)
+
+        # A config snapshot keeps the groups and resources which are only on this node
+        rejoined = NodeSystem()
+        rejoined.grp_add('group-c')
+        rejoined.res_add('proc-c1', 'group-c')
+        rejoined.res_add('proc-a1', 'group-c')
+        with self.assertLogs('ics.system', level='WARNING') as logs:
+            rejoined.apply_snapshot(self.system.config_snapshot())
+        self.assertEqual(logs.output, ['WARNING:ics.system:Keeping resource proc-c1 which is not in config snapshot '
+                                       'version 2', 'WARNING:ics.system:Keeping group group-c which is not in config '
+                                       'snapshot version 2'])
+        self.assertEqual(sorted(rejoined.groups), ['group-a', 'group-c'])
+        self.assertEqual(rejoined.get_resource('proc-a1').attr_value('Group'), 'group-a')
+        self.assertEqual(rejoined.get_resource('proc-c1').attr_value('Group'), 'group-c')
+        self.assertEqual(rejoined.config_version, 2)
+
+    def test_group_config_files(self):
+        self.setup_simple_group()
+        self.system.res_link('proc-a2', 'proc-a1')
+        config_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, config_dir)
+        for name, path in [('ICS_CONF_FILE', 'main.cf'), ('ICS_CONF_SNAPSHOT', 'main.cf.snapshot'),
+                           ('ICS_CONF_GROUPS', 'groups')]:
+            patcher = mock.patch('ics.system.' + name, os.path.join(config_dir, path))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.system.journal = ics.journal.ConfigJournal(os.path.join(config_dir, 'main.cf.journal'))
+        self.addCleanup(self.system.journal.close)
+
+        self.system.compact_config()
+        self.assertTrue(os.path.isfile(os.path.join(config_dir, 'main.cf.snapshot')))
+        self.system.set_attr('GroupConfigFiles', 'true')
+        self.assertEqual(len(self.system.compact_config()), 4)
+        self.assertEqual([os.path.basename(filename) for filename in self.system.group_config_files()],
+                         ['group-a.cf', 'group-b.cf', 'group-c.cf'])
+        self.assertFalse(os.path.isfile(os.path.join(config_dir, 'main.cf.snapshot')))
+
+        # Only changed groups are rewritten, files of deleted groups are removed
+        self.system.grp_modify('group-a', 'AutoStart', 'true')
+        self.system.res_delete('proc-c1')
+        self.system.res_delete('proc-c2')
+        self.system.res_delete('proc-c3')
+        self.system.grp_delete('group-c')
+        written = self.system.compact_config()
+        self.assertEqual([os.path.basename(filename) for filename in written], ['group-a.cf', 'main.cf'])
+        self.assertEqual(len(self.system.group_config_files()), 2)
+
+        # Backups of deleted groups are still covered by retention
+        with open(os.path.join(config_dir, 'groups', 'group-c.cf.210101_120000.gz'), 'w'):
+            pass
+        self.assertEqual(sorted(os.path.basename(policy.base_name) for policy in self.system.retention_policies()
+                                if policy.suffix == ics.retention.BACKUP_SUFFIX),
+                         ['group-a.cf', 'group-b.cf', 'group-c.cf', 'main.cf'])
+
+        restarted = NodeSystem()
+        restarted.load_config(restarted.read_startup_config())
+        self.assertEqual(restarted.config_data(), self.system.config_data())
+        self.assertEqual(restarted.group_configs, self.system.group_configs)
+
+        self.system.set_attr('GroupConfigFiles', 'false')
+        self.system.compact_config()
+        self.assertEqual(self.system.group_config_files(), [])
+        data = ics.utils.read_config(os.path.join(config_dir, 'main.cf'))
+        self.assertEqual(data.pop('version'), 0)
+        self.assertEqual(data, self.system.config_data())
+
     @unittest.skip
     def test_poll_updater(self):
         self.fail()
@@ -470,9 +805,17 @@ class TestNodeSystem(unittest.TestCase):
     def test_poll_count(self):
         self.fail()
 
-    @unittest.skip
     def test_startup_poll(self):
-        self.fail()
+        self.setup_simple_group()
+        self.system.grp_modify('group-c', 'AutoStart', 'true')
+        self.system.grp_modify('group-b', 'Priority', '10')
+        self.system.res_link('proc-a1', 'proc-a3')
+        probed = []
+        groups = []
+        with mock.patch('ics.resource.Resource.probe', lambda resource: probed.append(resource.name)):
+            self.system.startup_poll(group_probed=lambda group: groups.append(group.name))
+        self.assertEqual(groups, ['group-c', 'group-b', 'group-a'])
+        self.assertEqual(probed[6:], ['proc-a2', 'proc-a3', 'proc-a1'])
 
     @unittest.skip
     def test_start_event_handler(self):
@@ -0,0 +1,108 @@
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from ics.errors import ICSError
+from ics.utils import checksum_filename, read_config, write_config, read_snapshot, write_snapshot
+from ics.utils import restore_backup
+
+
+class TestConfigFile(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.filename = os.path.join(self.directory, 'main.cf')
+
+    def test_write_read(self):
+        write_config(self.filename, {'system': {'attributes': {}}})
+        write_config(self.filename, {'groups': {}})
+        self.assertEqual(read_config(self.filename), {'groups': {}})
+        with open(checksum_filename(self.filename)) as f:
+            self.assertEqual(len(f.read().split()), 1)
+        self.assertEqual(os.listdir(self.directory).count('main.cf.tmp'), 0)
+
+    @mock.patch('ics.utils.check_running', return_value=False)
+    def test_restore_backup(self, check_running):
+        write_config(self.filename, {'groups': {'group-a': {}}})
+        backup_file = self.filename + '.210101_120000.gz'
+        with open(self.filename, 'rb') as src, gzip.open(backup_file, 'wb') as dst:
+            dst.write(src.read())
+        write_config(self.filename, {'groups': {}})
+        with open(self.filename, 'a') as f:
+            f.write('\n')  # Corrupt
+        with open(self.filename + '.journal', 'w') as f:
+            f.write('{"op": "delete", "type": "groups", "name": "group-a"}\n')
+        self.assertEqual(restore_backup(backup_file), self.filename)
+        self.assertEqual(read_config(self.filename), {'groups': {'group-a': {}}})
+        self.assertFalse(os.path.exists(self.filename + '.journal'))
+        self.assertTrue(os.path.isfile(self.filename + '.journal.before_restore'))
+        with self.assertRaises(ICSError):
+            restore_backup(self.filename)
+
+        check_running.return_value = True
+        with self.assertRaises(ICSError):
+            restore_backup(backup_file)
+
+    @mock.patch('ics.utils.check_running', return_value=False)
+    def test_restore_group_backups(self, check_running):
+        groups_dir = os.path.join(self.directory, 'groups')
+        os.makedirs(groups_dir)
+        layout = {'system': {'attributes': {'GroupConfigFiles': 'true'}}, 'groups': {}, 'resources': {}}
+        for name, timestamp, data in [('main.cf', '210101_120000', dict(layout, group_names=['group-a'])),
+                                      ('groups/group-a.cf', '210101_110000', {'name': 'group-a', 'version': 1}),
+                                      ('groups/group-a.cf', '210101_120000', {'name': 'group-a', 'version': 2}),
+                                      ('groups/group-a.cf', '210101_130000', {'name': 'group-a', 'version': 3}),
+                                      ('groups/group-b.cf', '210101_100000', {'name': 'group-b'})]:
+            with open(os.path.join(self.directory, name + '.' + timestamp), 'w') as f:
+                json.dump(data, f)
+        write_config(os.path.join(groups_dir, 'group-c.cf'), {'name': 'group-c'})
+
+        restore_backup(self.filename + '.210101_120000')
+        self.assertEqual(read_config(os.path.join(groups_dir, 'group-a.cf')), {'name': 'group-a', 'version': 2})
+        self.assertFalse(os.path.exists(os.path.join(groups_dir, 'group-b.cf')))  # Deleted before the backup
+        self.assertFalse(os.path.exists(os.path.join(groups_dir, 'group-c.cf')))  # Added after the backup
+        with self.assertRaises(ICSError):
+            restore_backup(os.path.join(groups_dir, 'group-a.cf.210101_130000'))
+
+    def test_checksum_mismatch(self):
+        write_config(self.filename, {'groups': {}})
+        with open(self.filename, 'a') as f:
+            f.write('\n')
+        with self.assertRaises(ICSError):
+            read_config(self.filename)
+
+    def test_invalid_without_checksum(self):
+        with open(self.filename, 'w') as f:
+            f.write('{"groups": ')
+        with self.assertRaises(ICSError):
+            read_config(self.filename)
+
+    def test_interrupted_write(self):
+        write_config(self.filename, {'groups': {}})
+        with open(self.filename, 'rb') as f:
+            old_checksum = hashlib.sha256(f.read()).hexdigest()
+        # Checksum file written with the new checksum, config file not yet replaced
+        with open(checksum_filename(self.filename), 'w') as f:
+            f.write('0' * 64 + '\n' + old_checksum + '\n')
+        self.assertEqual(read_config(self.filename), {'groups': {}})
+
+    def test_snapshot(self):
+        data = {'groups': {'group-a': {'attributes': {'SystemList': ['node1']}}}}
+        checksum = write_config(self.filename, data)
+        write_snapshot(self.filename + '.snapshot', data, checksum)
+        self.assertEqual(read_snapshot(self.filename + '.snapshot'), (checksum, data))
+
+        with open(self.filename + '.snapshot', 'ab') as f:
+            f.write(b'0')
+        with self.assertRaises(ICSError):
+            read_snapshot(self.filename + '.snapshot')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+from ics.command_line import command_icsconfig
+from ics.validation import check_config
+
+
+class TestConfigChecker(unittest.TestCase):
+
+    def config(self):
+        return {
+            'system': {'attributes': {'ClusterName': 'test', 'NodeList': ['node1']}},
+            'groups': {'group-a': {'attributes': {'Enabled': 'true'}}, 'group-b': {'attributes': {}}},
+            'resources': {
+                'proc-a1': {'attributes': {'Group': 'group-a', 'MonitorInterval': '30'}, 'dependencies': []},
+                'proc-a2': {'attributes': {'Group': 'group-a'}, 'dependencies': ['proc-a1']},
+                'proc-b1': {'attributes': {'Group': 'group-b'}, 'dependencies': []}
+            }
+        }
+
+    def test_valid(self):
+        self.assertEqual(check_config(self.config()), [])
+
+    def test_attributes(self):
+        data = self.config()
+        data['system']['attributes']['AlertLevel'] = 'LOUD'
+        data['groups']['group-a']['attributes']['AutoStart'] = 'yes'
+        data['resources']['proc-a1']['attributes']['MonitorInterval'] = 'abc'
+        data['resources']['proc-a1']['attributes']['Colour'] = 'red'
+        data['resources']['proc-b1']['attributes']['Group'] = 'group-c'
+        self.assertEqual(sorted(check_config(data)), [
+            ('groups.group-a.AutoStart', "value 'yes' is not true or false"),
+            ('resources.proc-a1.Colour', 'unknown attribute'),
+            ('resources.proc-a1.MonitorInterval', "value 'abc' is not an integer"),
+            ('resources.proc-b1.Group', 'group group-c does not exist'),
+            ('system.AlertLevel', "value 'LOUD' is not one of CRITICAL, ERROR, WARNING, INFO, NOTSET")
+        ])
+
+    def test_dependencies(self):
+        data = self.config()
+        data['resources']['proc-a1']['dependencies'] = ['proc-a2', 'proc-b1', 'proc-x']
+        del data['resources']['proc-b1']['dependencies']
+        self.assertEqual(check_config(data), [
+            ('resources.proc-a1.dependencies', 'dependency proc-b1 is not in the same group'),
+            ('resources.proc-a1.dependencies', 'dependency proc-x does not exist'),
+            ('resources.proc-b1.dependencies', 'missing'),
+            ('resources.proc-a1.dependencies', 'dependency cycle proc-a1 -> proc-a2 -> proc-a1')
+        ])
+
+    def test_structure_and_limits(self):
+        data = self.config()
+        data['system']['attributes']['GroupLimit'] = '1'
+        del data['resources']
+        self.assertEqual(check_config(data), [('groups', '2 exceeds GroupLimit of 1'), ('resources', 'missing')])
+
+
+class TestCommandIcsconfig(unittest.TestCase):
+
+    def setUp(self):
+        self.config_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.config_dir)
+        self.filename = os.path.join(self.config_dir, 'main.cf')
+
+    def check(self, content=None):
+        if content is not None:
+            with open(self.filename, 'w') as f:
+                f.write(content)
+        output = io.StringIO()
+        with mock.patch('sys.argv', ['icsconfig', '-check', self.filename]), \
+                mock.patch('ics.command_line.setup_signal_handler'), redirect_stdout(output):
+            with self.assertRaises(SystemExit) as context:
+                command_icsconfig()
+        return context.exception.code, output.getvalue()
+
+    def test_missing_file(self):
+        self.assertEqual(self.check(), (1, '{}: file not found\n'.format(self.filename)))
+
+    def test_invalid_json(self):
+        code, output = self.check('{"groups":')
+        self.assertEqual(code, 1)
+        self.assertTrue(output.startswith('{}: '.format(self.filename)))
+
+    def test_not_object(self):
+        self.assertEqual(self.check(json.dumps([])), (1, '{}: top level is not an object\n'.format(self.filename)))
+
+
+if __name__ == '__main__':
+    unittest.main()
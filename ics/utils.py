@@ -1,23 +1,42 @@
+import hashlib
 import json
 import logging
+import logging.handlers
+import marshal
 import os
+import re
 import signal
 import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from socket import gethostname
+from urllib.parse import quote
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue  # Python2 version
 
 import Pyro4 as Pyro
 
+from ics import retention
 from ics.environment import ICS_ALERT_LOG
 from ics.environment import ICS_ALERT_PORT
+from ics.environment import ICS_ALERT_UDS_FILE
+from ics.environment import ICS_CONF_GROUPS
 from ics.environment import ICS_DAEMON_PORT
 from ics.environment import ICS_ENGINE_PORT
 from ics.environment import ICS_RES_LOG
+from ics.environment import ICS_UDS_FILE
 from ics.environment import ICS_VAR
 from ics.errors import ICSError
 
 logger = logging.getLogger(__name__)
 
+SNAPSHOT_MAGIC = b'ICSSNAP1'
+GROUP_CONFIG_WORKERS = 8  # Threads reading group config files
+
 
 def hostname():
     """Return current system hostname.
@@ -124,43 +143,389 @@ def setup_signal_handler():
     signal.signal(signal.SIGINT, cli_signal_handler)
 
 
-def read_config(filename):
+def checksum_filename(filename):
+    """Checksum file name for a config file."""
+    return filename + '.sha256'
+
+
+def fsync_directory(directory):
+    """Sync directory to disk, so renames of files in the directory are durable.
+
+    Args:
+        directory (str): Directory name.
+
+    """
+    fd = os.open(directory or '.', os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write(filename, content):
+    """Replace file content so the file has either the old or the new content after a crash.
+
+    The content is written and synced to a temporary file, which is renamed over the file. The directory is synced
+    so the rename is durable.
+
+    Args:
+        filename (str): Filename.
+        content (bytes): New file content.
+
+    """
+    tmp_filename = filename + '.tmp'
+    with open(tmp_filename, 'wb') as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_filename, filename)
+    fsync_directory(os.path.dirname(filename))
+
+
+def read_config(filename, verify=True):
     """Read configuration file.
 
+    When a checksum file exists, the configuration is only used when its checksum matches.
+
     Args:
         filename (str): Configuration filename.
+        verify (bool, opt): Verify checksum, disabled for files which may have been edited by hand.
 
     Returns:
         dict: Configuration data.
 
+    Raises:
+        FileNotFoundError: When configuration file does not exist.
+        ICSError: When configuration file is corrupt.
+
     """
     logger.info('Reading configuration file...')
     try:
-        with open(filename, 'r') as f:
-            data = json.load(f)
-        return data
+        with open(filename, 'rb') as f:
+            content = f.read()
     except FileNotFoundError:
         logging.info('No configuration file found')
         raise
-    except (ValueError, IOError) as error:
-        logging.error('Error occurred while loading config: {}'.format(str(error)))
-        return {}
+    except IOError as error:
+        raise ICSError('Unable to read config file {}: {}'.format(filename, error))
+
+    try:
+        with open(checksum_filename(filename), 'r') as f:
+            checksums = f.read().split() if verify else None
+    except FileNotFoundError:
+        checksums = None  # Written before checksums were added
+    if checksums is not None and hashlib.sha256(content).hexdigest() not in checksums:
+        raise ICSError('Config file {} does not match its checksum'.format(filename))
+
+    try:
+        return json.loads(content.decode('utf-8'))
+    except ValueError as error:
+        raise ICSError('Config file {} is not valid: {}'.format(filename, error))
 
 
 def write_config(filename, data):
-    """Write configuration to file.
+    """Write configuration to file atomically, with a checksum file used to validate it when it is read.
+
+    While the configuration file is replaced, the checksum file holds the checksums of both the new and the previous
+    configuration, so the configuration file is valid whether or not the replace completed.
 
     Args:
         filename (str): Configuration filename.
         data (dict): Configuration data.
 
+    Returns:
+        str: Checksum of the written configuration file.
+
     """
+    content = json.dumps(data, indent=4, sort_keys=True).encode('utf-8')
+    checksum = hashlib.sha256(content).hexdigest()
     try:
-        with open(filename, 'w') as file:
-            json.dump(data, file, indent=4, sort_keys=True)
+        checksums = [checksum]
+        if os.path.isfile(filename):
+            with open(filename, 'rb') as f:
+                checksums.append(hashlib.sha256(f.read()).hexdigest())
+        atomic_write(checksum_filename(filename), '\n'.join(checksums).encode() + b'\n')
+        atomic_write(filename, content)
+        atomic_write(checksum_filename(filename), checksum.encode() + b'\n')
     except IOError as error:
         logger.exception('Error occurred while writing file: {}'.format(str(error)))
         raise
+    return checksum
+
+
+def read_backup(backup_file):
+    """Read a config backup, which may have been compressed by the retention.
+
+    Args:
+        backup_file (str): Backup filename.
+
+    Returns:
+        dict: Configuration data.
+
+    Raises:
+        ICSError: When the backup can not be read or does not contain a config.
+
+    """
+    try:
+        with retention.open_file(backup_file) as f:
+            data = json.loads(f.read().decode('utf-8'))
+    except (IOError, OSError, ValueError) as error:
+        raise ICSError('Unable to read config backup {}: {}'.format(backup_file, error))
+    if not isinstance(data, dict):
+        raise ICSError('Config backup {} does not contain a config'.format(backup_file))
+    return data
+
+
+def restore_backup(backup_file):
+    """Restore a main.cf backup, writing the config files with new checksum files while the ICS server is stopped.
+
+    Backups are copies of config files without their checksum file, which may have been compressed by the retention,
+    so they can not be copied back to be used at startup. With the group layout the group config files are restored
+    from their newest backups taken with or before the main.cf backup. The config journal is moved aside, as its
+    changes were made after the backup and would be replayed over it at startup.
+
+    Args:
+        backup_file (str): Backup filename, the config filename followed by the backup timestamp and optionally .gz.
+
+    Returns:
+        str: Restored config filename.
+
+    Raises:
+        ICSError: When the ICS server is running, or the file is not a main.cf backup or can not be read.
+
+    """
+    if check_running('icsserver'):
+        raise ICSError('ICS server is running, stop it before restoring a config backup')
+    match = re.match(r'(.+)\.(' + retention.BACKUP_SUFFIX + r')(\.gz)?$', backup_file)
+    if match is None:
+        raise ICSError('{} is not a config backup'.format(backup_file))
+    filename, timestamp = match.group(1), match.group(2)
+    if os.path.basename(os.path.dirname(os.path.abspath(filename))) == os.path.basename(ICS_CONF_GROUPS):
+        raise ICSError('{} is a group config backup, group config files are restored with main.cf'.format(
+            backup_file))
+    data = read_backup(backup_file)
+    if group_layout(data):
+        groups_dir = os.path.join(os.path.dirname(os.path.abspath(filename)), os.path.basename(ICS_CONF_GROUPS))
+        restore_group_backups(groups_dir, timestamp, data.get('group_names'))
+    write_config(filename, data)
+    for journal_file in [filename + '.journal', filename + '.journal.rotated']:
+        if os.path.isfile(journal_file):
+            os.replace(journal_file, journal_file + '.before_restore')
+            logger.info('Moved config journal {} aside to {}.before_restore'.format(journal_file, journal_file))
+    logger.info('Restored config file {} from backup {}'.format(filename, backup_file))
+    return filename
+
+
+def restore_group_backups(directory, timestamp, group_names=None):
+    """Restore group config files from their newest backups taken at or before a main.cf backup.
+
+    Group config files of other groups are removed.
+
+    Args:
+        directory (str): Group config directory.
+        timestamp (str): Backup timestamp of the main.cf backup.
+        group_names (list, opt): Groups in the main.cf backup, defaults to every group with a backup at or before the
+            timestamp for backups which do not list their groups.
+
+    Returns:
+        list: Restored group config filenames.
+
+    Raises:
+        ICSError: When a group has no backup at or before the timestamp.
+
+    """
+    pattern = re.compile(r'(.+\.cf)\.(' + retention.BACKUP_SUFFIX + r')(\.gz)?$')
+    backups = {}
+    for name in os.listdir(directory) if os.path.isdir(directory) else []:
+        match = pattern.match(name)
+        if match is None or match.group(2) > timestamp:
+            continue
+        filename = os.path.join(directory, match.group(1))
+        if filename not in backups or match.group(2) > backups[filename][0]:
+            backups[filename] = (match.group(2), os.path.join(directory, name))
+
+    if group_names is None:
+        filenames = sorted(backups)
+    else:
+        filenames = [group_config_filename(directory, group_name) for group_name in group_names]
+    missing = [filename for filename in filenames if filename not in backups]
+    if missing:
+        raise ICSError('No backup of group config files {} at or before {}'.format(', '.join(missing), timestamp))
+
+    data = {filename: read_backup(backups[filename][1]) for filename in filenames}
+    for filename, group_config in data.items():
+        write_config(filename, group_config)
+    for filename in list_group_configs(directory):
+        if filename not in data:
+            for path in [filename, checksum_filename(filename)]:
+                if os.path.isfile(path):
+                    os.remove(path)
+    logger.info('Restored {} group config files from backups'.format(len(filenames)))
+    return filenames
+
+
+def group_layout(data):
+    """Determine whether config data uses one config file per group.
+
+    Args:
+        data (dict): Main configuration data.
+
+    Returns:
+        bool: True when the groups are in group config files.
+
+    """
+    return data.get('system', {}).get('attributes', {}).get('GroupConfigFiles') == 'true'
+
+
+def group_config_filename(directory, group_name):
+    """Config filename of a group.
+
+    Args:
+        directory (str): Group config directory.
+        group_name (str): Group name.
+
+    Returns:
+        str: Group config filename.
+
+    """
+    return os.path.join(directory, quote(group_name, safe='') + '.cf')
+
+
+def list_group_configs(directory):
+    """Find group config files.
+
+    Args:
+        directory (str): Group config directory.
+
+    Returns:
+        list: Group config filenames.
+
+    """
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    return sorted(os.path.join(directory, name) for name in names if name.endswith('.cf'))
+
+
+def list_group_backups(directory):
+    """Find group config filenames which have backups, including groups which have been deleted.
+
+    Args:
+        directory (str): Group config directory.
+
+    Returns:
+        list: Group config filenames.
+
+    """
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    pattern = re.compile(r'(.+\.cf)\.' + retention.BACKUP_SUFFIX + r'(\.gz)?$')
+    matches = [pattern.match(name) for name in names]
+    return sorted(set(os.path.join(directory, match.group(1)) for match in matches if match is not None))
+
+
+def read_group_configs(directory, data, verify=True):
+    """Add the groups and resources of the group config files to config data.
+
+    The group config files are read and parsed in parallel.
+
+    Args:
+        directory (str): Group config directory.
+        data (dict): Main configuration data, holding the system attributes.
+        verify (bool, opt): Verify checksums, disabled for files which may have been edited by hand.
+
+    Returns:
+        dict: Group config data read from each group config file.
+
+    Raises:
+        ICSError: When a group config file is corrupt or holds a group or resource which already exists.
+
+    """
+    filenames = list_group_configs(directory)
+    with ThreadPoolExecutor(max_workers=GROUP_CONFIG_WORKERS) as executor:
+        group_configs = list(executor.map(lambda filename: read_config(filename, verify=verify), filenames))
+
+    result = {}
+    for filename, group_config in zip(filenames, group_configs):
+        try:
+            group_name = group_config['name']
+            if group_name in data['groups']:
+                raise ICSError('Group {} already exists'.format(group_name))
+            data['groups'][group_name] = {'attributes': group_config['attributes']}
+            for resource_name, resource_data in group_config['resources'].items():
+                if resource_name in data['resources']:
+                    raise ICSError('Resource {} already exists'.format(resource_name))
+                data['resources'][resource_name] = resource_data
+        except (KeyError, TypeError, AttributeError) as err:
+            raise ICSError('Group config file {} is not valid: {} {}'.format(filename, err.__class__.__name__, err))
+        result[group_name] = group_config
+    logger.info('Read {} group config files'.format(len(result)))
+    return result
+
+
+def file_checksum(filename):
+    """Checksum of a file, as used for config files.
+
+    Args:
+        filename (str): Filename.
+
+    Returns:
+        str: SHA-256 hex digest.
+
+    """
+    with open(filename, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def write_snapshot(filename, data, config_checksum):
+    """Write binary config snapshot atomically.
+
+    The snapshot starts with a magic string, the checksum of the config file it was written with and the checksum of
+    the marshalled data.
+
+    Args:
+        filename (str): Snapshot filename.
+        data (dict): Configuration data.
+        config_checksum (str): Checksum of the config file with the same data.
+
+    """
+    payload = marshal.dumps(data)
+    atomic_write(filename, SNAPSHOT_MAGIC + config_checksum.encode() + hashlib.sha256(payload).digest() + payload)
+
+
+def read_snapshot(filename):
+    """Read binary config snapshot.
+
+    Args:
+        filename (str): Snapshot filename.
+
+    Returns:
+        tuple: Checksum of the config file the snapshot was written with and configuration data.
+
+    Raises:
+        ICSError: When the snapshot can not be read or is corrupt.
+
+    """
+    try:
+        with open(filename, 'rb') as f:
+            content = f.read()
+    except IOError as error:
+        raise ICSError('Unable to read config snapshot {}: {}'.format(filename, error))
+
+    header_size = len(SNAPSHOT_MAGIC) + 64 + 32
+    if len(content) < header_size or not content.startswith(SNAPSHOT_MAGIC):
+        raise ICSError('Config snapshot {} is not valid'.format(filename))
+    config_checksum = content[len(SNAPSHOT_MAGIC):len(SNAPSHOT_MAGIC) + 64].decode()
+    payload = content[header_size:]
+    if hashlib.sha256(payload).digest() != content[header_size - 32:header_size]:
+        raise ICSError('Config snapshot {} does not match its checksum'.format(filename))
+    try:
+        return config_checksum, marshal.loads(payload)
+    except (EOFError, ValueError, TypeError) as error:
+        raise ICSError('Config snapshot {} is not valid: {}'.format(filename, error))
 
 
 def set_log_level(level):
@@ -192,6 +557,45 @@ def set_log_level(level):
     logging.critical('Log level set: ' + level)
 
 
+class QueueFileHandler(logging.handlers.QueueHandler):
+    """Hourly rotating log file handler which writes records from a separate thread.
+
+    Records are added to a queue by the logging thread and formatted and written to the log file by a queue listener
+    thread, so logging does not wait on file writes. Can be used in logging config files in place of
+    TimedRotatingFileHandler with the same arguments.
+
+    Attributes:
+        target (obj): Rotating file handler records are written to.
+        listener (obj): Queue listener writing records to the file handler.
+
+    """
+
+    def __init__(self, filename, when='h', interval=1, backupCount=0):
+        super(QueueFileHandler, self).__init__(queue.Queue(-1))
+        self.target = logging.handlers.TimedRotatingFileHandler(filename, when, interval, backupCount)
+        self.listener = logging.handlers.QueueListener(self.queue, self.target)
+        self.listener.start()
+
+    def setFormatter(self, fmt):
+        # Format records in the listener thread
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Merge arguments into the message so later changes to them are not logged, the record is not copied as it
+        # does not leave this process
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def close(self):
+        # Write queued records before closing, called by logging at exit
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+            self.target.close()
+        super(QueueFileHandler, self).close()
+
+
 def ics_version():
     """Retrieve ICS version from version file"""
     try:
@@ -212,16 +616,164 @@ def alert_log_name():
     return ICS_ALERT_LOG + '.' + datetime.now().strftime('%Y-%m-%d_%H')
 
 
+def uds_conn(name, uds_file):
+    """Connect to a local server using its Unix domain socket.
+
+    Args:
+        name (str): Pyro object name.
+        uds_file (str): Unix domain socket filename.
+
+    Returns:
+        obj: Connected Pyro proxy or None if the socket is not available.
+
+    """
+    if not os.path.exists(uds_file):
+        return None
+
+    proxy = Pyro.Proxy('PYRO:' + name + '@./u:' + uds_file)
+    try:
+        proxy._pyroBind()
+    except Pyro.errors.CommunicationError as err:
+        logger.debug('Unable to connect to {}, {}'.format(uds_file, str(err)))
+        proxy._pyroRelease()
+        return None
+    return proxy
+
+
 def daemon_conn():
     uri = 'PYRO:sub_server_control@' + gethostname() + ':' + str(ICS_DAEMON_PORT)
     return Pyro.Proxy(uri)
 
 
 def engine_conn():
+    """Connect to the local engine, preferring the Unix domain socket over TCP."""
+    proxy = uds_conn('system', ICS_UDS_FILE)
+    if proxy is not None:
+        return proxy
     uri = 'PYRO:system@' + gethostname() + ':' + str(ICS_ENGINE_PORT)
     return Pyro.Proxy(uri)
 
 
 def alert_conn():
+    """Connect to the local alert server, preferring the Unix domain socket over TCP."""
+    proxy = uds_conn('alert_handler', ICS_ALERT_UDS_FILE)
+    if proxy is not None:
+        return proxy
     uri = 'PYRO:alert_handler@' + gethostname() + ':' + str(ICS_ALERT_PORT)
     return Pyro.Proxy(uri)
+
+
+class OperationBatch:
+    """Collect engine operations and run them in a single round trip.
+
+    Operations are recorded by calling them on the batch as they would be called on the engine connection. For example:
+        batch = OperationBatch(engine_conn())
+        batch.res_value('proc-a1', 'Group')
+        batch.grp_state('group-a')
+        results = batch.execute()
+
+    Attributes:
+        conn (obj): Engine Pyro connection.
+        operations (list): Recorded operations.
+
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.operations = []
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def record(*args, **kwargs):
+            self.operations.append([name, list(args), kwargs])
+        return record
+
+    def __len__(self):
+        return len(self.operations)
+
+    def execute(self, stop_on_error=False):
+        """Run recorded operations on the engine.
+
+        Args:
+            stop_on_error (bool, opt): Stop running operations after the first error.
+
+        Returns:
+            list: Result of each operation run, as a dict with either a 'result' or an 'error' key.
+
+        """
+        operations = self.operations
+        self.operations = []
+        return self.conn.execute(operations, stop_on_error=stop_on_error)
+
+    def results(self):
+        """Run recorded operations on the engine and return their results.
+
+        Returns:
+            list: Operation results.
+
+        Raises:
+            ICSError: When an operation fails.
+
+        """
+        results = []
+        for result in self.execute(stop_on_error=True):
+            if 'error' in result:
+                raise ICSError(result['error'])
+            results.append(result['result'])
+        return results
+
+
+def create_uds_daemon(uds_file):
+    """Create Pyro daemon listening on a Unix domain socket.
+
+    Args:
+        uds_file (str): Unix domain socket filename.
+
+    Returns:
+        obj: Pyro daemon.
+
+    """
+    uds_dir = os.path.dirname(uds_file)
+    if not os.path.isdir(uds_dir):
+        os.makedirs(uds_dir)
+
+    # Remove socket left behind by a previous server
+    if os.path.exists(uds_file):
+        os.remove(uds_file)
+
+    daemon = Pyro.Daemon(unixsocket=uds_file)
+    os.chmod(uds_file, 0o660)
+    return daemon
+
+
+def serve(objects, host, port, uds_file):
+    """Serve Pyro objects on both TCP and a Unix domain socket.
+
+    The Unix domain socket daemon runs in a separate thread, this function blocks while serving TCP requests.
+
+    Args:
+        objects (dict): Objects to serve as keys, and their Pyro object names as values.
+        host (str): TCP hostname.
+        port (int): TCP port.
+        uds_file (str): Unix domain socket filename.
+
+    """
+    daemon = Pyro.Daemon(host=host, port=port)
+    for obj, name in objects.items():
+        daemon.register(obj, name)
+
+    try:
+        uds_daemon = create_uds_daemon(uds_file)
+    except OSError as err:
+        logger.error('Unable to create Unix domain socket {}: {}'.format(uds_file, str(err)))
+    else:
+        for obj, name in objects.items():
+            uds_daemon.register(obj, name, force=True)  # Object is already registered with the TCP daemon
+        thread_uds = threading.Thread(name='uds daemon', target=uds_daemon.requestLoop)
+        thread_uds.daemon = True
+        thread_uds.start()
+
+    with daemon:
+        daemon.requestLoop()
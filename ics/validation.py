@@ -0,0 +1,163 @@
+from ics.attributes import compile_validators, group_attributes, resource_attributes, system_attributes
+
+
+class ConfigChecker:
+    """Check configuration data without loading it, reporting every error with its location.
+
+    Locations are the path of the item in the configuration data, such as resources.proc-a.MonitorInterval.
+
+    Attributes:
+        errors (list): Location and message pairs of the errors found.
+
+    """
+
+    def __init__(self):
+        self.errors = []
+        self.system_validators = compile_validators(system_attributes)
+        self.group_validators = compile_validators(group_attributes)
+        self.resource_validators = compile_validators(resource_attributes)
+
+    def error(self, location, message):
+        self.errors.append((location, message))
+
+    def check_section(self, data, key, location, expected_type):
+        """Check that a section of the config data exists and has the expected type.
+
+        Returns:
+            obj: Section data, None when it is missing or of another type.
+
+        """
+        if not isinstance(data, dict) or key not in data:
+            self.error(location, 'missing')
+            return None
+        value = data[key]
+        if not isinstance(value, expected_type):
+            self.error(location, 'is not a {}'.format('list' if expected_type is list else 'dictionary'))
+            return None
+        return value
+
+    def check_attributes(self, attributes, validators, location):
+        for attr_name, value in attributes.items():
+            validator = validators.get(attr_name)
+            if validator is None:
+                self.error(location + '.' + attr_name, 'unknown attribute')
+                continue
+            error = validator(value)
+            if error is not None:
+                self.error(location + '.' + attr_name, 'value {!r} {}'.format(value, error))
+
+    def check_limit(self, attributes, attr_name, count, location):
+        try:
+            limit = int(attributes.get(attr_name, system_attributes[attr_name]['default']))
+        except (TypeError, ValueError):
+            return  # Reported as an invalid attribute value
+        if count > limit:
+            self.error(location, '{} exceeds {} of {}'.format(count, attr_name, limit))
+
+    def check_cycles(self, dependencies):
+        """Report dependency cycles, once for each cycle.
+
+        Args:
+            dependencies (dict): Names of the existing dependencies of each resource.
+
+        """
+        done = set()
+        for start in sorted(dependencies):
+            if start in done:
+                continue
+            path = [start]
+            on_path = {start}
+            stack = [iter(dependencies[start])]
+            while stack:
+                dep_name = next(stack[-1], None)
+                if dep_name is None:
+                    stack.pop()
+                    resource_name = path.pop()
+                    on_path.discard(resource_name)
+                    done.add(resource_name)
+                    continue
+                if dep_name in on_path:
+                    cycle = path[path.index(dep_name):] + [dep_name]
+                    self.error('resources.{}.dependencies'.format(dep_name),
+                               'dependency cycle {}'.format(' -> '.join(cycle)))
+                elif dep_name not in done:
+                    path.append(dep_name)
+                    on_path.add(dep_name)
+                    stack.append(iter(dependencies[dep_name]))
+
+    def check(self, data):
+        """Check configuration data.
+
+        Args:
+            data (dict): Configuration data, in the format of NodeSystem.config_data().
+
+        Returns:
+            list: Location and message pairs of the errors found, empty for a valid config.
+
+        """
+        system = self.check_section(data, 'system', 'system', dict)
+        system_attributes_data = {}
+        if system is not None:
+            system_attributes_data = self.check_section(system, 'attributes', 'system.attributes', dict) or {}
+            self.check_attributes(system_attributes_data, self.system_validators, 'system')
+
+        groups = self.check_section(data, 'groups', 'groups', dict) or {}
+        for group_name, group_data in groups.items():
+            location = 'groups.' + group_name
+            attributes = self.check_section(group_data, 'attributes', location + '.attributes', dict)
+            if attributes is not None:
+                self.check_attributes(attributes, self.group_validators, location)
+        self.check_limit(system_attributes_data, 'GroupLimit', len(groups), 'groups')
+
+        resources = self.check_section(data, 'resources', 'resources', dict) or {}
+        resource_groups = {}
+        for resource_name, resource_data in resources.items():
+            location = 'resources.' + resource_name
+            attributes = self.check_section(resource_data, 'attributes', location + '.attributes', dict)
+            if attributes is None:
+                continue
+            self.check_attributes(attributes, self.resource_validators, location)
+            group_name = attributes.get('Group')
+            if group_name is None:
+                self.error(location + '.Group', 'missing')
+            elif isinstance(group_name, str) and group_name not in groups:
+                self.error(location + '.Group', 'group {} does not exist'.format(group_name))
+            resource_groups[resource_name] = group_name
+        self.check_limit(system_attributes_data, 'ResourceLimit', len(resources), 'resources')
+
+        dependencies = {}
+        for resource_name, resource_data in resources.items():
+            if resource_name not in resource_groups:
+                continue
+            location = 'resources.{}.dependencies'.format(resource_name)
+            dep_names = self.check_section(resource_data, 'dependencies', location, list) or []
+            dependencies[resource_name] = []
+            for dep_name in dep_names:
+                if dep_name == resource_name:
+                    self.error(location, 'resource depends on itself')
+                elif dep_name not in resources:
+                    self.error(location, 'dependency {} does not exist'.format(dep_name))
+                elif dep_name in dependencies[resource_name]:
+                    self.error(location, 'dependency {} is given more than once'.format(dep_name))
+                elif resource_groups.get(dep_name) != resource_groups[resource_name]:
+                    self.error(location, 'dependency {} is not in the same group'.format(dep_name))
+                else:
+                    dependencies[resource_name].append(dep_name)
+        for resource_name in dependencies:
+            dependencies[resource_name] = [dep_name for dep_name in dependencies[resource_name]
+                                           if dep_name in dependencies]
+        self.check_cycles(dependencies)
+        return self.errors
+
+
+def check_config(data):
+    """Check configuration data, see ConfigChecker.
+
+    Args:
+        data (dict): Configuration data.
+
+    Returns:
+        list: Location and message pairs of the errors found, empty for a valid config.
+
+    """
+    return ConfigChecker().check(data)
@@ -41,6 +41,7 @@ setup(
             'icsres = ics.command_line:icsres',
             'icsalert = ics.command_line:icsalert',
             'icsdump = ics.command_line:icsdump',
+            'icsconfig = ics.command_line:icsconfig',
         ]
     }
 )
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark command line round trip latency to the engine over TCP and Unix domain socket.
+
+Each iteration does what a single command line invocation does: resolve the connection, connect, call a method and
+disconnect. The engine is served in process on a temporary socket and port.
+
+Usage:
+    python3 test/bench_cli_latency.py [-count 500]
+
+"""
+import argparse
+import atexit
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+ICS_HOME = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ICS_HOME)
+
+WORK_DIR = tempfile.mkdtemp(prefix='ics_bench_')
+atexit.register(shutil.rmtree, WORK_DIR, ignore_errors=True)
+os.environ['ICS_UDS'] = os.path.join(WORK_DIR, 'uds')
+os.environ['ICS_ENGINE_PORT'] = '19191'
+
+import Pyro4 as Pyro  # noqa: E402
+
+from ics import utils  # noqa: E402
+from ics.environment import ICS_ENGINE_PORT, ICS_UDS_FILE  # noqa: E402
+from ics.system import NodeSystem  # noqa: E402
+
+
+def tcp_call():
+    conn = Pyro.Proxy('PYRO:system@' + socket.gethostname() + ':' + str(ICS_ENGINE_PORT))
+    conn.node_state()
+    conn._pyroRelease()
+
+
+def uds_call():
+    conn = utils.uds_conn('system', ICS_UDS_FILE)
+    conn.node_state()
+    conn._pyroRelease()
+
+
+def bench(name, func, count):
+    func()  # Warm up
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    print('{:<4} mean {:7.3f} ms   p50 {:7.3f} ms   p99 {:7.3f} ms'.format(
+        name, 1000 * sum(samples) / count, 1000 * samples[count // 2], 1000 * samples[int(count * 0.99)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ICS command line latency benchmark')
+    parser.add_argument('-count', type=int, default=500, help='number of round trips per transport')
+    args = parser.parse_args()
+
+    system = NodeSystem()
+    thread = threading.Thread(target=utils.serve, args=({system: 'system'}, socket.gethostname(),
+                                                         ICS_ENGINE_PORT, ICS_UDS_FILE))
+    thread.daemon = True
+    thread.start()
+    while not os.path.exists(ICS_UDS_FILE):
+        time.sleep(0.1)
+    time.sleep(0.5)
+
+    bench('TCP', tcp_call, args.count)
+    bench('UDS', uds_call, args.count)
+
+
+if __name__ == '__main__':
+    main()
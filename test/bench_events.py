@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark event processing throughput with engine logging enabled.
+
+A chain of online resources is repeatedly propagated online, which runs the event, state change and dependency
+readiness code paths without running resource commands. Logging is configured from ics/logging.conf (or a
+synchronous TimedRotatingFileHandler with -sync) writing to a temporary directory.
+
+Usage:
+    python3 test/bench_events.py [-level INFO|DEBUG] [-resources 50] [-rounds 200] [-sync]
+
+"""
+import argparse
+import logging
+import logging.config
+import logging.handlers
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ICS_HOME = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ICS_HOME)
+
+from ics import events  # noqa: E402
+from ics.resource import Resource  # noqa: E402
+from ics.states import ResourceStates  # noqa: E402
+
+ENGINE_LOGGERS = ['ics.events', 'ics.resource', 'ics.system']
+
+
+def setup_logging(log_dir, level, sync):
+    log_file = os.path.join(log_dir, 'icsserver.log')
+    if sync:
+        handler = logging.handlers.TimedRotatingFileHandler(log_file, 'H', 1, 72)
+        handler.setFormatter(logging.Formatter('%(asctime)s  %(levelname)-8s <%(name)s> %(message)s'))
+        for logger_name in ENGINE_LOGGERS:
+            logger = logging.getLogger(logger_name)
+            logger.handlers = [handler]
+            logger.propagate = False
+    else:
+        logging.logFilename = log_file
+        logging.config.fileConfig(os.path.join(ICS_HOME, 'ics', 'logging.conf'), disable_existing_loggers=False)
+    for logger_name in ENGINE_LOGGERS:
+        logging.getLogger(logger_name).setLevel(level)
+
+
+def create_chain(count):
+    resources = [Resource('proc-{}'.format(index), 'group-bench', ResourceStates.ONLINE) for index in range(count)]
+    for parent, child in zip(resources, resources[1:]):
+        child.add_parent(parent)
+        parent.add_child(child)
+    return resources
+
+
+def run_events():
+    count = 0
+    while not events.event_queue.empty():
+        event = events.event_queue.get()
+        events.logger.debug('Running event (%s)', event)
+        event.run()
+        count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ICS event throughput benchmark')
+    parser.add_argument('-level', default='INFO', choices=['INFO', 'DEBUG'], help='engine logging level')
+    parser.add_argument('-resources', type=int, default=50, help='number of resources in the dependency chain')
+    parser.add_argument('-rounds', type=int, default=200, help='number of online propagations')
+    parser.add_argument('-sync', action='store_true', help='write log records synchronously')
+    args = parser.parse_args()
+
+    log_dir = tempfile.mkdtemp(prefix='ics_bench_')
+    try:
+        setup_logging(log_dir, args.level, args.sync)
+        resources = create_chain(args.resources)
+
+        event_count = 0
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            resources[0].propagate = True
+            resources[0].change_state(ResourceStates.ONLINE, force=True)
+            event_count += run_events()
+        elapsed = time.perf_counter() - start
+
+        logging.shutdown()
+        print('{} {:<5} {:>8} events {:>7.2f}s {:>10.0f} events/s'.format(
+            'sync ' if args.sync else 'queue', args.level, event_count, elapsed, event_count / elapsed))
+    finally:
+        shutil.rmtree(log_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
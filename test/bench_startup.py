@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark engine config loading at startup.
+
+A config with groups of chained resources is written as main.cf and as a binary snapshot in a temporary directory.
+Loading is timed for the JSON config file and the snapshot with the bulk loader, and for the JSON config file with
+the previous loader which added groups and resources one at a time and set each attribute with set_attr. Engine
+logging goes to a log file at INFO level, as in the server. The fastest of several loads is reported.
+
+Usage:
+    python3 test/bench_startup.py [-resources 5000] [-group-size 50] [-repeat 5]
+
+"""
+import argparse
+import atexit
+import logging
+import logging.config
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ICS_HOME = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ICS_HOME)
+
+WORK_DIR = tempfile.mkdtemp(prefix='ics_bench_')
+atexit.register(shutil.rmtree, WORK_DIR, ignore_errors=True)
+
+from ics.states import ResourceStates  # noqa: E402
+from ics.system import NodeSystem  # noqa: E402
+from ics.utils import file_checksum, read_config, read_snapshot, write_config, write_snapshot  # noqa: E402
+
+CONF_FILE = os.path.join(WORK_DIR, 'main.cf')
+SNAPSHOT_FILE = os.path.join(WORK_DIR, 'main.cf.snapshot')
+
+
+def create_config(resource_count, group_size):
+    data = {'system': {'attributes': {'ClusterName': 'bench'}}, 'groups': {}, 'resources': {}}
+    for index in range(resource_count):
+        group_name = 'group-{}'.format(index // group_size)
+        resource_name = 'proc-{}'.format(index)
+        if group_name not in data['groups']:
+            data['groups'][group_name] = {'attributes': {'Enabled': 'true', 'SystemList': ['node1', 'node2']}}
+            dependencies = []
+        else:
+            dependencies = ['proc-{}'.format(index - 1)]
+        data['resources'][resource_name] = {
+            'attributes': {
+                'Group': group_name,
+                'Enabled': 'true',
+                'StartProgram': '/opt/app/bin/start ' + resource_name,
+                'StopProgram': '/opt/app/bin/stop ' + resource_name,
+                'MonitorProgram': '/opt/app/bin/monitor ' + resource_name
+            },
+            'dependencies': dependencies
+        }
+    return data
+
+
+def legacy_load_config(system, data):
+    """Config loader used before the bulk loader, kept here for comparison."""
+    for attr_name, value in data['system']['attributes'].items():
+        system.set_attr(attr_name, value)
+    for group_name, group_data in data['groups'].items():
+        system.grp_add(group_name)
+        for attr_name, value in group_data['attributes'].items():
+            system.groups[group_name].set_attr(attr_name, value)
+    for resource_name, resource_data in data['resources'].items():
+        system.res_add(resource_name, resource_data['attributes']['Group'], init_state=ResourceStates.UNKNOWN)
+        for attr_name, value in resource_data['attributes'].items():
+            system.resources[resource_name].set_attr(attr_name, value)
+    for resource_name, resource_data in data['resources'].items():
+        for dep_name in resource_data['dependencies']:
+            system.res_link(resource_name, dep_name)
+
+
+def read_json():
+    return read_config(CONF_FILE)
+
+
+def read_binary_snapshot():
+    checksum, data = read_snapshot(SNAPSHOT_FILE)
+    assert checksum == file_checksum(CONF_FILE)
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ICS startup config load benchmark')
+    parser.add_argument('-resources', type=int, default=5000, help='number of resources')
+    parser.add_argument('-group-size', type=int, default=50, help='number of resources in each group')
+    parser.add_argument('-repeat', type=int, default=5, help='number of loads, the fastest is reported')
+    args = parser.parse_args()
+
+    logging.logFilename = os.path.join(WORK_DIR, 'icsserver.log')
+    logging.config.fileConfig(os.path.join(ICS_HOME, 'ics', 'logging.conf'), disable_existing_loggers=False)
+
+    data = create_config(args.resources, args.group_size)
+    checksum = write_config(CONF_FILE, data)
+    write_snapshot(SNAPSHOT_FILE, data, checksum)
+    print('{} resources, main.cf {} KB, snapshot {} KB'.format(
+        args.resources, os.path.getsize(CONF_FILE) // 1024, os.path.getsize(SNAPSHOT_FILE) // 1024))
+
+    expected = None
+    print('{:<24} {:>8} {:>8} {:>8}'.format('', 'read', 'load', 'total'))
+    for name, read, load in [('json + set_attr', read_json, legacy_load_config),
+                             ('json + bulk', read_json, NodeSystem.load_config),
+                             ('snapshot + bulk', read_binary_snapshot, NodeSystem.load_config)]:
+        read_time = load_time = float('inf')
+        for _ in range(args.repeat):
+            system = NodeSystem()
+            start = time.perf_counter()
+            config = read()
+            read_end = time.perf_counter()
+            load(system, config)
+            read_time = min(read_time, read_end - start)
+            load_time = min(load_time, time.perf_counter() - read_end)
+
+        config_data = system.config_data()
+        if expected is None:
+            expected = config_data
+        assert config_data == expected, name
+        print('{:<24} {:>7.3f}s {:>7.3f}s {:>7.3f}s'.format(name, read_time, load_time, read_time + load_time))
+
+    logging.shutdown()
+
+
+if __name__ == '__main__':
+    main()
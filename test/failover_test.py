@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Multi-engine failover test harness.
+
+Starts several ICS engines on localhost, each with its own port and config directory, brings a group online on one
+engine, kills that engine and measures how long it takes for the group to become online on a surviving engine.
+
+Usage:
+    python3 test/failover_test.py [-nodes 3] [-timeout 10]
+
+"""
+import argparse
+import json
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import Pyro4 as Pyro
+
+ICS_HOME = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ICS_SERVER = os.path.join(ICS_HOME, 'ics', 'icsserver.py')
+BASE_PORT = 19091
+GROUP_NAME = 'group-failover'
+
+RES_SCRIPT = """#!/bin/sh
+state_file="{res_dir}/$(echo ${{ICS_NODE_NAME}} | tr ':' '_')_$2"
+case $1 in
+    start) echo 1 > ${{state_file}}; exit 0;;
+    stop) rm -f ${{state_file}}; exit 0;;
+    monitor) [ -f ${{state_file}} ] && exit 110 || exit 100;;
+esac
+exit 1
+"""
+
+
+def node_names(count):
+    host = socket.gethostname()
+    return ['{}:{}'.format(host, BASE_PORT + i) for i in range(count)]
+
+
+def create_config(work_dir, nodes):
+    """Write a config for every node with a single group containing two linked resources."""
+    res_dir = os.path.join(work_dir, 'resources')
+    os.makedirs(res_dir)
+    res_script = os.path.join(work_dir, 'res.sh')
+    with open(res_script, 'w') as f:
+        f.write(RES_SCRIPT.format(res_dir=res_dir))
+    os.chmod(res_script, 0o755)
+
+    resources = {}
+    for resource_name, dependencies in [('proc-1', []), ('proc-2', ['proc-1'])]:
+        resources[resource_name] = {
+            'attributes': {
+                'Group': GROUP_NAME,
+                'Enabled': 'true',
+                'StartProgram': '{} start {}'.format(res_script, resource_name),
+                'StopProgram': '{} stop {}'.format(res_script, resource_name),
+                'MonitorProgram': '{} monitor {}'.format(res_script, resource_name),
+                'MonitorInterval': '1',
+                'OfflineMonitorInterval': '5'
+            },
+            'dependencies': dependencies
+        }
+
+    config = {
+        'system': {'attributes': {'NodeList': nodes, 'HeartbeatTimeout': '3'}},
+        'groups': {GROUP_NAME: {'attributes': {'Enabled': 'true', 'SystemList': nodes}}},
+        'resources': resources
+    }
+
+    for node in nodes:
+        conf_dir = os.path.join(work_dir, node.replace(':', '_'), 'config')
+        os.makedirs(conf_dir)
+        with open(os.path.join(conf_dir, 'main.cf'), 'w') as f:
+            json.dump(config, f, indent=4)
+
+
+def start_engine(work_dir, node):
+    node_dir = os.path.join(work_dir, node.replace(':', '_'))
+    env = dict(os.environ)
+    env.update({
+        'PYTHONPATH': ICS_HOME,
+        'ICS_NODE_NAME': node,
+        'ICS_ENGINE_PORT': node.rsplit(':', 1)[1],
+        'ICS_ALERT_PORT': str(BASE_PORT - 1),
+        'ICS_CONF': os.path.join(node_dir, 'config'),
+        'ICS_LOG': os.path.join(node_dir, 'log'),
+        'ICS_VAR': node_dir,
+        'ICS_UDS': os.path.join(node_dir, 'uds'),
+    })
+    return subprocess.Popen([sys.executable, ICS_SERVER], env=env, cwd=node_dir,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def engine_conn(node):
+    conn = Pyro.Proxy('PYRO:system@' + node)
+    conn._pyroTimeout = 5
+    return conn
+
+
+def wait_for(condition, timeout, interval=0.1):
+    end_time = time.time() + timeout
+    while time.time() < end_time:
+        try:
+            if condition():
+                return True
+        except Pyro.errors.CommunicationError:
+            pass
+        time.sleep(interval)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ICS multi-engine failover test')
+    parser.add_argument('-nodes', type=int, default=3, help='number of engines to start')
+    parser.add_argument('-timeout', type=float, default=10, help='maximum allowed failover time in seconds')
+    parser.add_argument('-keep', action='store_true', help='keep working directory')
+    args = parser.parse_args()
+
+    nodes = node_names(args.nodes)
+    work_dir = tempfile.mkdtemp(prefix='ics_failover_')
+    create_config(work_dir, nodes)
+    engines = {node: start_engine(work_dir, node) for node in nodes}
+
+    try:
+        for node in nodes:
+            if not wait_for(lambda: engine_conn(node).ping(), 60):
+                print('FAIL: engine {} did not start'.format(node))
+                return 1
+
+        primary = nodes[-1]  # Last node so it is never the failover coordinator
+        engine_conn(primary).clus_grp_online(GROUP_NAME, primary)
+        if not wait_for(lambda: engine_conn(primary).grp_state(GROUP_NAME) == 'ONLINE', 30):
+            print('FAIL: group did not come online on {}'.format(primary))
+            return 1
+        print('Group {} online on {}'.format(GROUP_NAME, primary))
+        time.sleep(2)  # Allow heartbeats to report the online group
+
+        kill_time = time.time()
+        engines[primary].send_signal(signal.SIGKILL)
+        engines[primary].wait()
+        print('Killed engine {}'.format(primary))
+
+        survivors = [node for node in nodes if node != primary]
+
+        def failed_over():
+            for node in survivors:
+                if engine_conn(node).grp_state(GROUP_NAME) == 'ONLINE':
+                    return True
+            return False
+
+        if not wait_for(failed_over, 60):
+            print('FAIL: group did not fail over')
+            return 1
+        observed_time = time.time() - kill_time
+
+        failover_records = []
+
+        def failover_recorded():
+            for node in survivors:
+                for record in engine_conn(node).failover_stats():
+                    if record['group'] == GROUP_NAME:
+                        failover_records.append(record)
+            return failover_records
+
+        failover_time = None
+        if wait_for(failover_recorded, 10):
+            record = failover_records[0]
+            failover_time = record['failover_time']
+            print('Failover {from_node} -> {to_node}: {failover_time:.2f}s '
+                  'from last heartbeat to group ONLINE'.format(**record))
+
+        print('Observed failover time from engine kill: {:.2f}s'.format(observed_time))
+        if failover_time is None or failover_time > args.timeout:
+            print('FAIL')
+            return 1
+        print('PASS')
+        return 0
+    finally:
+        for process in engines.values():
+            if process.poll() is None:
+                process.terminate()
+                process.wait()
+        if args.keep:
+            print('Working directory: ' + work_dir)
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -17,22 +17,19 @@ for letter in {a..g}; do
 	echo "Creating group ${group_name}"
 	${ICSGRP} -add ${group_name}
 	for resource in ${resource_id}; do
-		resource_name=proc-${letter}${resource}
-		echo "Creating resource ${resource_name}" 
-		create_resource_file ${resource_name}
-		${ICSRES} -add ${resource_name} ${group_name}
-                ${ICSRES} -modify ${resource_name} StartProgram "${RES_SCRIPT} start ${resource_name}"
-                ${ICSRES} -modify ${resource_name} StopProgram "${RES_SCRIPT} stop ${resource_name}"
-                ${ICSRES} -modify ${resource_name} MonitorProgram "${RES_SCRIPT}  monitor ${resource_name}"
-		#sleep 0.5
+		create_resource_file proc-${letter}${resource}
 	done
+	{
+		# Adds and modifies are listed separately so they are sent as bulk changes
+		for resource in ${resource_id}; do
+			echo "-add proc-${letter}${resource} ${group_name}"
+		done
+		for resource in ${resource_id}; do
+			resource_name=proc-${letter}${resource}
+			echo "-modify ${resource_name} StartProgram \"${RES_SCRIPT} start ${resource_name}\""
+			echo "-modify ${resource_name} StopProgram \"${RES_SCRIPT} stop ${resource_name}\""
+			echo "-modify ${resource_name} MonitorProgram \"${RES_SCRIPT} monitor ${resource_name}\""
+		done
+	} | ${ICSRES} -f -
 	${ICSGRP} -enable ${group_name}
 done
-
-
-
-
-
-
-
- 